@@ -2,19 +2,16 @@
     - 包括：区域名称、区域级别、赛事名称（简繁英）、赛事ID、赛事类型、类型编码。
     - 生成了以[编码类型]+[赛事ID]的HTTP访问链接，并验证URL有效性。 
     - 输出：原始JS、EXCEL、存储数据库表 'areas'、'events'
+    - 写入数据库的新增/更新同时追加到变更流（utils/change_feed.py），源数据中已不存在的区域/赛事记为删除
+      （数据库中的行保留），下游按序号增量读取。
 '''
-import pandas as pd
 import json
-import requests
+import logging
 from requests.exceptions import RequestException
 import os
 import sys
 import time
 import random
-    # 在文件开头添加必要的导入
-import asyncio
-import aiohttp
-from concurrent.futures import ThreadPoolExecutor
 
 
 # 导入全局配置
@@ -23,7 +20,23 @@ from Global_cfg import AREAS_URL,SOURCE_URL
 
 # 数据库相关的导入
 sys.path.append(os.path.join(os.path.dirname(__file__), 'sql'))
-from db_utils import DBUtils
+from db_utils import DBUtils, DatabaseUnavailableError
+from bulk_load import BulkLoader
+from catalogue_cache import CatalogueCache
+
+# 运行指标
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from metrics import Metrics
+from log_utils import clear_console, setup_logging
+from excel_utils import ExcelExport
+from file_utils import atomic_write
+from url_resolver import UrlPathResolver
+from dead_urls import DeadUrlCache
+from http_client import HttpClient
+from snapshot_store import SnapshotStore, content_hash
+from change_feed import ChangeFeed, change
+
+logger = logging.getLogger(__name__)
 
 # 数据源配置
 class Config:
@@ -60,14 +73,20 @@ class Config:
             0: 'SubLeague'     # type_code 为 0 时使用 SubLeague
         }
     }
-# 清空终端输出
-os.system('cls' if os.name == 'nt' else 'clear')
 
 
 class DataFetcher:
     # 添加类变量用于URL缓存
     _url_cache = {}  # 格式: {url: {'valid': bool, 'timestamp': float}}
     _cache_timeout = 3600  # 缓存有效期(秒)，默认1小时
+    _resolver = None  # 赛事ID -> 实际可用的URL路径（持久化）
+
+    @staticmethod
+    def url_resolver():
+        """URL路径解析器（首次使用时加载本地记录）"""
+        if DataFetcher._resolver is None:
+            DataFetcher._resolver = UrlPathResolver()
+        return DataFetcher._resolver
 
     @staticmethod
     def check_db_has_data():
@@ -76,13 +95,18 @@ class DataFetcher:
             # 检查 areas 和 events 表是否都有数据
             areas_count = DBUtils.execute_query("SELECT COUNT(*) as count FROM areas")
             events_count = DBUtils.execute_query("SELECT COUNT(*) as count FROM events")
+            if areas_count is None or events_count is None:
+                # 查询失败不能当作空库处理，否则会触发完整的首次获取流程
+                raise DatabaseUnavailableError("无法查询数据库数据状态")
             
             has_areas = areas_count and areas_count[0]['count'] > 0
             has_events = events_count and events_count[0]['count'] > 0
             
             return has_areas and has_events
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
-            print(f"检查数据库数据失败: {str(e)}")
+            logger.error("检查数据库数据失败: %s", e)
             return False
 
     @staticmethod
@@ -94,12 +118,18 @@ class DataFetcher:
         return js_exists, excel_exists
 
     @staticmethod
-    def compare_js_content(new_content, old_content):
-        """比较新旧JS内容是否一致"""
-        # 移除空白字符和换行符后比较
-        new_content = ''.join(new_content.split())
-        old_content = ''.join(old_content.split())
-        return new_content == old_content
+    def js_unchanged(url, js_content, js_file):
+        """保存快照并按内容哈希判断JS是否与上次一致
+        快照库中没有该URL的历史时（首次使用快照库），与本地JS文件的哈希比较。
+        """
+        store = SnapshotStore.get()
+        previous = store.latest(url)
+        if previous is None and os.path.exists(js_file):
+            with open(js_file, 'rb') as f:
+                previous = content_hash(f.read())
+        digest, _ = store.put(url, js_content)
+        store.save()
+        return digest == previous
         
     @staticmethod
     def get_area_names(all_arrays):
@@ -122,7 +152,7 @@ class DataFetcher:
                         area[3]     # level
                     ])
                 else:
-                    print(f"警告: 区域数据格式不正确 - {area}")
+                    logger.warning("区域数据格式不正确 - %s", area)
         
         if not area_names:
             raise Exception("未能获取有效的区域数据")
@@ -137,24 +167,29 @@ class DataFetcher:
         }
         
         try:
-            print(f"\n请求URL: {url}")  # 打印完整的URL请求
-            response = requests.get(url, headers=headers, timeout=10)
+            logger.debug("请求URL: %s", url)  # 打印完整的URL请求
+            start = time.perf_counter()
+            response = HttpClient.get(url, headers=headers, timeout=10)
+            Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status_code)
+            Metrics.inc('http_requests_total', status=response.status_code)
+            Metrics.inc('http_bytes_total', len(response.content))
             response.raise_for_status()  # 如果状态码不是200，抛出异常
             # 检查请求状态码并提供详细信息
             if response.status_code == 200:
-                print(f"请求成功 - 状态码: {response.status_code}")
+                logger.debug("请求成功 - 状态码: %s", response.status_code)
             else:
-                print(f"请求异常 - 状态码: {response.status_code}")
-                print(f"响应内容: {response.text[:200]}...")  # 打印部分响应内容        
+                logger.warning("请求异常 - 状态码: %s", response.status_code)
+                logger.warning("响应内容: %s...", response.content[:200])  # 打印部分响应内容        
             
-            # 确保响应的编码方式正确
-            response.encoding = response.apparent_encoding
-            return response.text
+            # 按接口缓存的编码直接解码（不对整个正文做字符集检测）
+            return HttpClient.text(response)
         except RequestException as e:
-            print(f"获取数据失败: {str(e)}")
+            Metrics.inc('http_errors_total')
+            logger.error("获取数据失败: %s", e)
             raise
 
     @staticmethod
+    @Metrics.timed('parse', stage='load_area_data')
     def load_area_data(js_content):
         """从JavaScript内容中提取数据"""
         arrays = []
@@ -179,11 +214,12 @@ class DataFetcher:
                         array = eval(array_data)
                         arrays.append(array)
                     except Exception as e:
-                        print(f"解析错误: {str(e)}")
+                        logger.error("解析错误: %s", e)
                         arrays.append([])
         return arrays
 
     @staticmethod
+    @Metrics.timed('parse', stage='extract_area_data')
     def extract_area_data(area_data):
         """解析区域数据为结构化格式"""
         areas = []
@@ -237,6 +273,33 @@ class DataFetcher:
         
         return f"{Config.BASE_URL}/{url_path}/{event_id}.html"
 
+    @staticmethod
+    def event_paths(event_type, type_code):
+        """赛事可能使用的URL路径，按默认尝试顺序（联赛首选路径在前，另一种联赛路径为备用）"""
+        if event_type == '杯赛':
+            return [Config.EVENT_TYPE_MAPPING['杯赛']]
+        preferred = Config.EVENT_TYPE_MAPPING['联赛'].get(type_code, 'League')
+        return [preferred] + [path for path in Config.EVENT_TYPE_MAPPING['联赛'].values() if path != preferred]
+
+    @staticmethod
+    def resolve_event_url(event_type, event_id, type_code):
+        """按已知路径/先验顺序验证赛事URL，记录实际可用的路径
+        先验只影响尝试顺序；所有路径都失效时固定返回默认路径的链接（不随尝试顺序变化，避免无效赛事的链接来回变动）
+        Returns:
+            tuple: (访问链接, 是否有效, 首个失效的链接或None)
+        """
+        resolver = DataFetcher.url_resolver()
+        failed_url = None
+        for path in resolver.candidates(event_id, type_code, DataFetcher.event_paths(event_type, type_code)):
+            event_url = f"{Config.BASE_URL}/{path}/{event_id}.html"
+            if DataFetcher.verify_url(event_url):
+                resolver.record(event_id, type_code, path)
+                return event_url, True, failed_url
+            Metrics.inc('url_path_misses_total')
+            failed_url = failed_url or event_url
+        default_url = DataFetcher.generate_event_url(event_type, event_id, type_code)
+        return default_url, False, default_url
+
     @staticmethod
     def print_url_statistics(events_data, invalid_urls):
         """打印URL验证统计信息"""
@@ -244,18 +307,18 @@ class DataFetcher:
         valid_urls = sum(1 for event in events_data if event['URL有效'])
         invalid_count = len(invalid_urls)
         
-        print("\nURL验证统计:")
-        print(f"总URL数量: {total_urls}")
-        print(f"有效URL数量: {valid_urls}")
-        print(f"无效URL数量: {total_urls - valid_urls}")
+        logger.info("URL验证统计:")
+        logger.info("总URL数量: %s", total_urls)
+        logger.info("有效URL数量: %s", valid_urls)
+        logger.info("无效URL数量: %s", total_urls - valid_urls)
         
         if invalid_urls:
-            print("\n无效URL列表:")
+            logger.info("无效URL列表:")
             for url_info in invalid_urls:
-                print(f"区域: {url_info['区域']}")
-                print(f"赛事: {url_info['赛事']}")
-                print(f"URL: {url_info['URL']}")
-                print("---")
+                logger.info("区域: %s", url_info['区域'])
+                logger.info("赛事: %s", url_info['赛事'])
+                logger.info("URL: %s", url_info['URL'])
+                logger.info("---")
 
     # 添加类变量用于URL缓存
     _url_cache = {}  # 格式: {url: {'valid': bool, 'timestamp': float}}
@@ -270,26 +333,35 @@ class DataFetcher:
             cache_data = DataFetcher._url_cache[url]
             # 如果缓存未过期,直接返回缓存的结果
             if now - cache_data['timestamp'] < DataFetcher._cache_timeout:
+                Metrics.inc('url_cache_hits_total')
                 return cache_data['valid']
+        Metrics.inc('url_cache_misses_total')
+        # 已确定失效的URL在复查时间之前不再请求
+        if DeadUrlCache.get().should_skip(url):
+            return False
 
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
-            print(f"\n验证URL: {url}")
-            print(f"状态码: {response.status_code}")
+            start = time.perf_counter()
+            response = HttpClient.get(url, headers=headers, timeout=10)
+            Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status_code)
+            Metrics.inc('http_requests_total', status=response.status_code)
+            Metrics.inc('http_bytes_total', len(response.content))
+            logger.debug("验证URL: %s 状态码: %s", url, response.status_code)
             
             is_valid = False
             if response.status_code == 200:
-                content = response.text
-                print(f"页面内容长度: {len(content)}")
+                content = HttpClient.text(response)
+                logger.debug("页面内容长度: %s", len(content))
                 
                 if '<title>404</title>' in content or 'error404' in content:
-                    print("页面包含404标记")
+                    logger.debug("页面包含404标记: %s", url)
                 else:
                     is_valid = len(content) > 1000
+            DeadUrlCache.get().record(url, is_valid, response.status_code)
             
             # 更新缓存
             DataFetcher._url_cache[url] = {
@@ -299,7 +371,8 @@ class DataFetcher:
             
             return is_valid
         except Exception as e:
-            print(f"验证URL失败 {url}: {str(e)}")
+            Metrics.inc('http_errors_total')
+            logger.error("验证URL失败 %s: %s", url, e)
             # 缓存失败结果
             DataFetcher._url_cache[url] = {
                 'valid': False,
@@ -310,33 +383,43 @@ class DataFetcher:
     @staticmethod
     async def verify_url_async(url, session):
         """异步验证URL是否可访问"""
+        if DeadUrlCache.get().should_skip(url):
+            return url, False
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            async with session.get(url, headers=headers, timeout=10) as response:
-                print(f"\n验证URL: {url}")
-                print(f"状态码: {response.status}")
+            start = time.perf_counter()
+            async with HttpClient.aget(session, url, headers=headers, timeout=10) as response:
+                logger.debug("验证URL: %s 状态码: %s", url, response.status)
                 
                 is_valid = False
                 if response.status == 200:
-                    content = await response.text()
-                    print(f"页面内容长度: {len(content)}")
+                    content = await HttpClient.atext(response)
+                    Metrics.inc('http_bytes_total', len(content))
+                    logger.debug("页面内容长度: %s", len(content))
                     
                     if '<title>404</title>' in content or 'error404' in content:
-                        print("页面包含404标记")
+                        logger.debug("页面包含404标记: %s", url)
                     else:
                         is_valid = len(content) > 1000
+                DeadUrlCache.get().record(url, is_valid, response.status)
                 
+                Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status)
+                Metrics.inc('http_requests_total', status=response.status)
                 return url, is_valid
         except Exception as e:
-            print(f"验证URL失败 {url}: {str(e)}")
+            Metrics.inc('http_errors_total')
+            logger.error("验证URL失败 %s: %s", url, e)
             return url, False
 
     @staticmethod
     async def verify_urls_batch(urls):
         """批量验证多个URL"""
+        import asyncio
+        import aiohttp  # 只在验证URL时导入
+
         async with aiohttp.ClientSession() as session:
             tasks = []
             for url in urls:
@@ -351,6 +434,8 @@ class DataFetcher:
     @staticmethod
     def verify_urls(urls):
         """并发验证多个URL的入口方法"""
+        import asyncio
+
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
@@ -358,6 +443,7 @@ class DataFetcher:
             return results
         finally:
             loop.close()
+            DeadUrlCache.get().save()
 
     @staticmethod
     def get_events_data(area_data):
@@ -367,6 +453,13 @@ class DataFetcher:
         """
         events_data = []
         invalid_urls = []
+
+        # 线程池并发验证全部赛事URL（共用 Session 连接池），结果按原顺序组装
+        tasks = [(event_type, event['id'], event['type'])
+                 for area in area_data
+                 for event_type, events in (('联赛', area['leagues']), ('杯赛', area['cups']))
+                 for event in events]
+        resolved = dict(zip(tasks, HttpClient.map(lambda task: DataFetcher.resolve_event_url(*task), tasks)))
         
         for area in area_data:
             area_name = area['area']['name_zh']      
@@ -374,18 +467,15 @@ class DataFetcher:
             
             # 处理联赛数据
             for league in area['leagues']:
-                event_url = DataFetcher.generate_event_url('联赛', league['id'], league['type'])
-                url_valid = DataFetcher.verify_url(event_url)
+                # 先请求记录中可用的路径，失效时再尝试另一种联赛路径
+                event_url, url_valid, failed_url = resolved[('联赛', league['id'], league['type'])]
                 
-                if not url_valid:
+                if failed_url:
                     invalid_urls.append({
                         '区域': area_name,
                         '赛事': league['name_zh'],
-                        'URL': event_url
+                        'URL': failed_url
                     })
-                    alternate_type = 1 if league['type'] == 0 else 0
-                    event_url = DataFetcher.generate_event_url('联赛', league['id'], alternate_type)
-                    url_valid = DataFetcher.verify_url(event_url)
                 
                 events_data.append({
                     '区域': area_name,
@@ -402,14 +492,13 @@ class DataFetcher:
             
             # 处理杯赛数据
             for cup in area['cups']:
-                event_url = DataFetcher.generate_event_url('杯赛', cup['id'], cup['type'])
-                url_valid = DataFetcher.verify_url(event_url)
+                event_url, url_valid, failed_url = resolved[('杯赛', cup['id'], cup['type'])]
                 
-                if not url_valid:
+                if failed_url:
                     invalid_urls.append({
                         '区域': area_name,
                         '赛事': cup['name_zh'],
-                        'URL': event_url
+                        'URL': failed_url
                     })
                 
                 events_data.append({
@@ -425,6 +514,9 @@ class DataFetcher:
                     'URL有效': url_valid
                 })
         
+        DataFetcher.url_resolver().save()
+        DeadUrlCache.get().save()
+
         # 打印统计信息
         DataFetcher.print_url_statistics(events_data, invalid_urls)
         return events_data
@@ -432,32 +524,40 @@ class DataFetcher:
 class ExcelExporter:
     """Excel导出类，负责数据导出到Excel文件"""
     @staticmethod
-    def export_to_excel(data_list, output_file):
-        """将数据导出到Excel文件，每个区域一个sheet"""
+    @Metrics.timed('export', target='excel')
+    def export_to_excel(data_list, output_file, split=False):
+        """将数据导出到Excel文件，每个区域一个sheet
+        Args:
+            split: True 时每个区域单独一个文件（并行写入），保存在与 output_file 同名的目录，并生成索引
+        """
         try:
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            
-            # 创建ExcelWriter对象
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                for area_name, events_data in data_list:
-                    if events_data:
-                        df = pd.DataFrame(events_data)
-                        df.to_excel(writer, sheet_name=area_name, index=False)
+            if split:
+                output_file = ExcelExport.write_split(data_list, os.path.splitext(output_file)[0])
+            else:
+                ExcelExport.write_workbook(data_list, output_file)
             
-            print(f"Excel文件已保存到: {output_file}")
+            logger.info("Excel文件已保存到: %s", output_file)
             return True
         except Exception as e:
-            print(f"导出Excel失败: {str(e)}")
+            logger.error("导出Excel失败: %s", e)
             return False
 
 class DBManager:
     """数据库管理类，负责数据持久化"""
+    EVENT_COLUMNS = ('event_id', 'levelid', 'name_zh', 'name_zht', 'name_en',
+                     'event_type', 'type_code', 'access_url', 'url_status')
+
     @staticmethod
-    def compare_area_data(new_areas, existing_areas):
-        """比较区域数据的变化"""
+    @Metrics.timed('diff', table='areas')
+    def compare_area_data(new_areas, existing_areas, changelog=None):
+        """比较区域数据的变化
+        Args:
+            changelog: 传入列表时，追加变更流记录（新增/更新/删除，含变更前后的整行），由调用方写入成功后提交
+        """
         changes = []
-        stats = {'updated': 0, 'added': 0, 'total': len(new_areas)}
+        stats = {'updated': 0, 'added': 0, 'deleted': 0, 'total': len(new_areas)}
+        # 已记录为删除的区域（数据库中的行保留，不重复记录；重新出现时作为新增）
+        deleted = ChangeFeed.get().deleted_keys('areas')
         
         for new_area in new_areas:
             matching_area = next(
@@ -465,7 +565,8 @@ class DBManager:
                  if area['level'] == new_area[3]),
                 None
             )
-            if matching_area:
+            after = DBManager._area_row(new_area)
+            if matching_area and str(new_area[3]) not in deleted:
                 # 检查每个字段的变化
                 field_changes = []
                 if matching_area['name_zh'] != new_area[0]:
@@ -494,6 +595,9 @@ class DBManager:
                         'changes': field_changes
                     })
                     stats['updated'] += 1
+                    if changelog is not None:
+                        before = {column: matching_area[column] for column in after}
+                        changelog.append(change('areas', 'update', new_area[3], before, after))
             else:
                 changes.append({
                     'level': new_area[3],
@@ -505,129 +609,176 @@ class DBManager:
                     }
                 })
                 stats['added'] += 1
+                if changelog is not None:
+                    changelog.append(change('areas', 'insert', new_area[3], after=after))
+        
+        # 数据库中有、新数据中已不存在的区域作为删除（只记录到变更流，不删除数据库中的行）
+        new_levels = {area[3] for area in new_areas}
+        for area in existing_areas or ():
+            if area['level'] not in new_levels and str(area['level']) not in deleted:
+                before = {column: area[column] for column in ('level', 'name_zh', 'name_zht', 'name_en')}
+                changes.append({'level': area['level'], 'type': 'delete', 'data': before})
+                stats['deleted'] += 1
+                if changelog is not None:
+                    changelog.append(change('areas', 'delete', area['level'], before))
         
         if changes:
-            print("\n区域数据变化统计:")
-            print(f"总数据量: {stats['total']}")
-            print(f"更新数量: {stats['updated']}")
-            print(f"新增数量: {stats['added']}")
+            logger.info("区域数据变化统计:")
+            logger.info("总数据量: %s", stats['total'])
+            logger.info("更新数量: %s", stats['updated'])
+            logger.info("新增数量: %s", stats['added'])
+            logger.info("删除数量: %s", stats['deleted'])
             
-            print("\n变化明细:")
-            for change in changes:
-                if change['type'] == 'update':
-                    print(f"\n级别 {change['level']} 的数据更新:")
-                    for field_change in change['changes']:
-                        print(f"  字段 {field_change['field']}:")
-                        print(f"    原值: {field_change['old']}")
-                        print(f"    新值: {field_change['new']}")
-                else:
-                    print(f"\n级别 {change['level']} 新增数据:")
-                    for field, value in change['data'].items():
-                        print(f"  {field}: {value}")
+            # 逐条明细仅在DEBUG级别输出
+            if logger.isEnabledFor(logging.DEBUG):
+                for item in changes:
+                    if item['type'] == 'update':
+                        for field_change in item['changes']:
+                            logger.debug("级别 %s 字段 %s: %s -> %s", item['level'],
+                                         field_change['field'], field_change['old'], field_change['new'])
+                    elif item['type'] == 'delete':
+                        logger.debug("级别 %s 已删除: %s", item['level'], item['data'])
+                    else:
+                        logger.debug("级别 %s 新增数据: %s", item['level'], item['data'])
             return True
         return False
 
     @staticmethod
-    def compare_events_data(new_events, existing_events):
-        """比较赛事数据的变化"""
+    def _area_row(area):
+        """get_area_names 的区域 -> areas 表的列"""
+        return {'level': area[3], 'name_zh': area[0], 'name_zht': area[1], 'name_en': area[2]}
+
+    @staticmethod
+    def _event_row(event):
+        """get_events_data 的赛事 -> events 表的列"""
+        return {
+            'event_id': int(event['赛事ID']),
+            'levelid': int(event['区域级别']),
+            'name_zh': event['赛事简休名'],
+            'name_zht': event['赛事繁体名'],
+            'name_en': event['赛事英文名'],
+            'event_type': event['赛事类型'],
+            'type_code': int(event['类型编码']),
+            'access_url': event['访问链接'],
+            'url_status': 1 if event['URL有效'] else 0
+        }
+
+    @staticmethod
+    @Metrics.timed('diff', table='events')
+    def compare_events_data(new_events, existing_events, changelog=None):
+        """比较赛事数据的变化
+        Args:
+            new_events: 新获取的赛事列表（一个或多个区域的全部赛事）
+            existing_events: 数据库中的赛事行（列表或 DBUtils.stream_query 迭代器），只遍历一次
+            changelog: 传入列表时，追加变更流记录（新增/更新/删除，含变更前后的整行），由调用方写入成功后提交
+        """
         changes = []
-        stats = {'updated': 0, 'added': 0, 'total': len(new_events)}
+        stats = {'updated': 0, 'added': 0, 'deleted': 0, 'total': len(new_events)}
         
-        # 处理现有数据为空的情况
-        if not existing_events:
-            print("数据库中无现有数据，所有数据将作为新增处理")
-            for new_event in new_events:
-                changes.append({
-                    'event_id': new_event['赛事ID'],
-                    'type': 'add',
-                    'data': new_event
-                })
-                stats['added'] += 1
-            
-            # 打印统计信息并返回
-            DBManager._print_event_changes(changes, stats)
-            return True
-            
-        # 将现有数据转换为字典格式，方便查找
-        existing_dict = {
-            str(event['event_id']): event 
-            for event in existing_events
+        # 以新数据建索引，数据库数据逐行比较，无需将整表读入内存
+        pending = {str(event['赛事ID']): event for event in new_events}
+        # 只有新数据覆盖的区域内的赛事才可能被判定为删除
+        new_levels = {int(event['区域级别']) for event in new_events}
+        # 已记录为删除的赛事（数据库中的行保留，不重复记录；重新出现时作为新增）
+        deleted = ChangeFeed.get().deleted_keys('events')
+        field_mappings = {
+            'name_zh': '赛事简休名',
+            'name_zht': '赛事繁体名',
+            'name_en': '赛事英文名',
+            'event_type': '赛事类型',
+            'type_code': '类型编码',
+            'access_url': '访问链接',
+            'url_status': 'URL有效'
         }
+        existing_count = 0
         
-        for new_event in new_events:
-            event_id = str(new_event['赛事ID'])
-            if event_id in existing_dict:
-                field_changes = []
-                matching_event = existing_dict[event_id]
-                
-                # 检查每个字段的变化
-                field_mappings = {
-                    'name_zh': '赛事简休名',
-                    'name_zht': '赛事繁体名',
-                    'name_en': '赛事英文名',
-                    'event_type': '赛事类型',
-                    'type_code': '类型编码',
-                    'access_url': '访问链接',
-                    'url_status': 'URL有效'
-                }
-                
-                for db_field, new_field in field_mappings.items():
-                    old_value = matching_event[db_field]
-                    new_value = new_event[new_field]
-                    if db_field == 'url_status':
-                        new_value = 1 if new_value else 0
-                    
-                    if str(old_value) != str(new_value):
-                        field_changes.append({
-                            'field': db_field,
-                            'old': old_value,
-                            'new': new_value
-                        })
+        for matching_event in existing_events or ():
+            existing_count += 1
+            event_id = str(matching_event['event_id'])
+            if event_id in deleted:
+                continue    # 重新出现时留在 pending 中作为新增
+            new_event = pending.pop(event_id, None)
+            if new_event is None:
+                if matching_event['levelid'] is not None and int(matching_event['levelid']) in new_levels:
+                    before = {column: matching_event[column] for column in DBManager.EVENT_COLUMNS}
+                    changes.append({'event_id': event_id, 'type': 'delete', 'data': before})
+                    stats['deleted'] += 1
+                    if changelog is not None:
+                        changelog.append(change('events', 'delete', event_id, before))
+                continue
+            
+            # 检查每个字段的变化
+            field_changes = []
+            for db_field, new_field in field_mappings.items():
+                old_value = matching_event[db_field]
+                new_value = new_event[new_field]
+                if db_field == 'url_status':
+                    new_value = 1 if new_value else 0
                 
-                if field_changes:
-                    changes.append({
-                        'event_id': event_id,
-                        'type': 'update',
-                        'changes': field_changes
+                if str(old_value) != str(new_value):
+                    field_changes.append({
+                        'field': db_field,
+                        'old': old_value,
+                        'new': new_value
                     })
-                    stats['updated'] += 1
-            else:
+            
+            if field_changes:
                 changes.append({
                     'event_id': event_id,
-                    'type': 'add',
-                    'data': new_event
+                    'type': 'update',
+                    'changes': field_changes
                 })
-                stats['added'] += 1
+                stats['updated'] += 1
+                if changelog is not None:
+                    before = {column: matching_event[column] for column in DBManager.EVENT_COLUMNS}
+                    changelog.append(change('events', 'update', event_id, before, DBManager._event_row(new_event)))
+        
+        # 处理现有数据为空的情况
+        if not existing_count:
+            logger.info("数据库中无现有数据，所有数据将作为新增处理")
+        logger.info("现有数据条数: %s", existing_count)
+        
+        # 数据库中不存在的赛事作为新增
+        for event_id, new_event in pending.items():
+            changes.append({
+                'event_id': event_id,
+                'type': 'add',
+                'data': new_event
+            })
+            stats['added'] += 1
+            if changelog is not None:
+                changelog.append(change('events', 'insert', event_id, after=DBManager._event_row(new_event)))
         
         # 打印统计信息并返回
         DBManager._print_event_changes(changes, stats)
-        return bool(changes)
+        return bool(changes) or not existing_count
 
     @staticmethod
     def _print_event_changes(changes, stats):
         """打印赛事数据变化统计信息"""
         if changes:
-            print("\n赛事数据变化统计:")
-            print(f"总数据量: {stats['total']}")
-            print(f"更新数量: {stats['updated']}")
-            print(f"新增数量: {stats['added']}")
+            logger.info("赛事数据变化统计:")
+            logger.info("总数据量: %s", stats['total'])
+            logger.info("更新数量: %s", stats['updated'])
+            logger.info("新增数量: %s", stats['added'])
+            logger.info("删除数量: %s", stats['deleted'])
             
-            print("\n变化明细:")
-            for change in changes:
-                if change['type'] == 'update':
-                    print(f"\n赛事ID {change['event_id']} 的数据更新:")
-                    for field_change in change['changes']:
-                        print(f"  字段 {field_change['field']}:")
-                        print(f"    原值: {field_change['old']}")
-                        print(f"    新值: {field_change['new']}")
-                else:
-                    print(f"\n新增赛事ID {change['event_id']}:")
-                    for field, value in change['data'].items():
-                        print(f"  {field}: {value}")
+            # 逐条明细仅在DEBUG级别输出
+            if logger.isEnabledFor(logging.DEBUG):
+                for item in changes:
+                    if item['type'] == 'update':
+                        for field_change in item['changes']:
+                            logger.debug("赛事ID %s 字段 %s: %s -> %s", item['event_id'],
+                                         field_change['field'], field_change['old'], field_change['new'])
+                    elif item['type'] == 'delete':
+                        logger.debug("已删除赛事ID %s: %s", item['event_id'], item['data'])
+                    else:
+                        logger.debug("新增赛事ID %s: %s", item['event_id'], item['data'])
             return True
         return False
 
     @staticmethod
+    @Metrics.timed('db_batch', table='areas')
     def save_areas_to_db(area_names):
         """保存区域数据到数据库"""
         try:
@@ -637,12 +788,13 @@ class DBManager:
             )
             
             # 比较数据变化
-            if not DBManager.compare_area_data(area_names, existing_data):
-                print("区域数据无变化，无需更新")
+            changelog = []
+            if not DBManager.compare_area_data(area_names, existing_data, changelog):
+                logger.info("区域数据无变化，无需更新")
                 return True
             
             # 如果变化，执行更新
-            print("\n开始更新区域数据...")
+            logger.info("开始更新区域数据...")
             for i, area in enumerate(area_names):
                 sql = """
                     INSERT INTO areas (name_zh, name_zht, name_en, level, sys_update_time)
@@ -654,7 +806,7 @@ class DBManager:
                     sys_update_time = NOW()
                 """
                 params = (area[0], area[1], area[2], i)
-                DBUtils.execute_update(sql, params)
+                DBUtils.execute_update(sql, params, prepared=True)
                 
             # 验证数据是否正确保存
             verify_sql = "SELECT level FROM areas ORDER BY level"
@@ -662,13 +814,16 @@ class DBManager:
             if not result:
                 raise Exception("区域数据保存验证失败")
                 
-            print("区域数据保存成功")
+            logger.info("区域数据保存成功")
+            CatalogueCache.invalidate()
+            ChangeFeed.get().emit(changelog)
             return True
         except Exception as e:
-            print(f"保存区域数据失败: {str(e)}")
+            logger.error("保存区域数据失败: %s", e)
             return False
 
     @staticmethod
+    @Metrics.timed('db_batch', table='events')
     def save_events_to_db(events_data):
         """保存赛事数据到数据库
         
@@ -685,35 +840,36 @@ class DBManager:
             # 获取可用的区域级别 
             query_result = DBUtils.execute_query("SELECT level FROM areas")
             if not query_result:
-                print("警告: 未找到区域级别数据")
+                logger.warning("未找到区域级别数据")
                 return False
                 
             # 从字典列表中提取 level 值，并转换为字符串以便比较
             available_levels = [str(item['level']) for item in query_result]
-            print(f"可用区域级别: {available_levels}")
+            logger.info("可用区域级别: %s", available_levels)
             
             # 先获取现有数据，用于后续比较
-            existing_data = DBUtils.execute_query("""
+            existing_data = DBUtils.stream_query("""
                 SELECT event_id, name_zh, name_zht, name_en, 
                        event_type, type_code, levelid,
                        access_url, url_status
                 FROM events
-            """)
-            print(f"现有数据条数: {len(existing_data) if existing_data else 0}")
+            """, named=True)
             
             # 比较数据变化，如果没有变化则无需更新
-            if not DBManager.compare_events_data(events_data, existing_data):
-                print("赛事数据无变化，无需更新")
+            changelog = []
+            if not DBManager.compare_events_data(events_data, existing_data, changelog):
+                logger.info("赛事数据无变化，无需更新")
                 return True
             
             # 如果有变化，执行更新
-            print(f"\n开始更新赛事数据，总数据量: {len(events_data)}")
+            logger.info("开始更新赛事数据，总数据量: %s", len(events_data))
+            saved_ids = set()
             for event in events_data:
                 try:
                     # 确保区域级别是字符串类型进行比较
                     event_level = str(event['区域级别'])
                     if event_level not in available_levels:
-                        print(f"跳过无效的区域级别: {event_level}")
+                        logger.warning("跳过无效的区域级别: %s", event_level)
                         continue
                     
                     # SQL语句：插入或更新赛事数据
@@ -753,50 +909,108 @@ class DBManager:
                         url_status
                     )
                     
-                    # 打印处理信息，便于调试
-                    print(f"\n处理赛事: {event['赛事简休名']}")
-                    print(f"区域级别: {event['区域级别']}")
-                    print(f"URL状态: {url_status}")
-                    print(f"类型编码: {event['类型编码']}")
+                    # 调试信息（仅在DEBUG级别输出）
+                    logger.debug("处理赛事: %s 区域级别: %s URL状态: %s 类型编码: %s",
+                                 event['赛事简休名'], event['区域级别'], url_status, event['类型编码'])
                     
                     # 执行SQL更新
-                    result = DBUtils.execute_update(sql, params)
+                    result = DBUtils.execute_update(sql, params, prepared=True)
                     if result:
                         success_count += 1
-                        print(f"赛事ID {event['赛事ID']} 更新成功")
+                        saved_ids.add(str(event['赛事ID']))
+                        logger.debug("赛事ID %s 更新成功", event['赛事ID'])
                     else:
                         error_count += 1
-                        print(f"赛事ID {event['赛事ID']} 更新失败")
+                        logger.error("赛事ID %s 更新失败", event['赛事ID'])
                         
+                except DatabaseUnavailableError:
+                    # 数据库不可用时停止处理，避免逐条重试
+                    raise
                 except Exception as e:
                     # 单条记录处理失败不影响其他记录
                     error_count += 1
-                    print(f"处理赛事ID {event['赛事ID']} 时发生错误: {str(e)}")
+                    logger.error("处理赛事ID %s 时发生错误: %s", event['赛事ID'], e)
                     # 打印详细的参数信息以便调试
-                    print(f"参数详情: {event}")
+                    logger.error("参数详情: %s", event)
                     continue  # 继续处理下一条数据
             
             # 打印更新统计信息
-            print(f"\n数据更新统计:")
-            print(f"成功: {success_count}")
-            print(f"失败: {error_count}")
-            print(f"总计: {len(events_data)}")
+            logger.info("数据更新统计:")
+            logger.info("成功: %s", success_count)
+            logger.info("失败: %s", error_count)
+            logger.info("总计: %s", len(events_data))
+            
+            # 变更流只提交实际写入的记录（删除只记录，数据库中的行保留）
+            CatalogueCache.invalidate()
+            ChangeFeed.get().emit(item for item in changelog if item['op'] == 'delete' or item['key'] in saved_ids)
             
             # 只要有成功的数据就返回 True
             return success_count > 0
             
         except Exception as e:
             # 处理整体异常
-            print(f"保存赛事数据失败，详细错误: {str(e)}")
-            import traceback
-            traceback.print_exc()  # 打印完整的堆栈跟踪
+            logger.exception("保存赛事数据失败，详细错误: %s", e)  # 包含完整的堆栈跟踪
             return False
 
+    @staticmethod
+    @Metrics.timed('db_batch', table='bulk')
+    def bulk_load(area_names, events_data):
+        """空库首次导入：区域、赛事各一次批量写入（同一事务），不做逐行比较
+        Args:
+            area_names: get_area_names 返回的区域列表，下标即区域级别
+            events_data: 所有区域的赛事列表
+        """
+        try:
+            area_rows = [(i, area[0], area[1], area[2]) for i, area in enumerate(area_names)]
+            available_levels = {row[0] for row in area_rows}
+            event_rows = [
+                (
+                    event['赛事ID'],
+                    int(event['区域级别']),
+                    event['赛事简休名'],
+                    event['赛事繁体名'],
+                    event['赛事英文名'],
+                    event['赛事类型'],
+                    int(event['类型编码']),
+                    event['访问链接'],
+                    int(1 if event['URL有效'] else 0)
+                )
+                for event in events_data if int(event['区域级别']) in available_levels
+            ]
+            skipped = len(events_data) - len(event_rows)
+            if skipped:
+                logger.warning("跳过无效区域级别的赛事: %s 条", skipped)
 
-def main():
+            with BulkLoader() as loader:
+                loader.load('areas', ['level', 'name_zh', 'name_zht', 'name_en'], area_rows,
+                            set_sql='sys_update_time = NOW()')
+                loader.load('events', ['event_id', 'levelid', 'name_zh', 'name_zht', 'name_en',
+                                       'event_type', 'type_code', 'access_url', 'url_status'],
+                            event_rows, set_sql='sys_update_time = NOW()')
+            logger.info("批量导入完成：区域 %s 条，赛事 %s 条", len(area_rows), len(event_rows))
+            CatalogueCache.invalidate()
+            # 空库首次导入：全部作为新增写入变更流，下游从 seq 0 开始读取即可得到完整数据
+            ChangeFeed.get().emit(
+                [change('areas', 'insert', i, after=DBManager._area_row(area)) for i, area in enumerate(area_names)]
+                + [change('events', 'insert', event['赛事ID'], after=DBManager._event_row(event))
+                   for event in events_data if int(event['区域级别']) in available_levels])
+            return True
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.exception("批量导入失败: %s", e)
+            return False
+
+
+def main(js_content=None):
+    """执行一次完整流程
+    Args:
+        js_content: 已获取的区域JS内容（常驻模式轮询时传入），为 None 时从 AREAS_URL 获取
+    """
     try:
-        print("正在从URL获取数据...")
-        js_content = DataFetcher.get_js_content(Config.AREAS_URL)
+        if js_content is None:
+            logger.info("正在从URL获取数据...")
+            js_content = DataFetcher.get_js_content(Config.AREAS_URL)
         
         # 检查数据库和文件状态
         db_has_data = DataFetcher.check_db_has_data()
@@ -808,46 +1022,42 @@ def main():
         
         # 情况1：首次获取（数据库无数据）
         if not db_has_data:
-            print("数据库中无数据，执行首次数据获取流程...")
-            process_full_data(js_content)
+            logger.info("数据库中无数据，执行首次数据获取流程（批量导入）...")
+            process_full_data(js_content, bulk=True)
             return
         
         # 情况2：数据库有数据，检查文件存在性
         if not js_exists or not excel_exists:
-            print("本地文件不完整，需要重新生成...")
+            logger.info("本地文件不完整，需要重新生成...")
             if compare_with_db(js_content):
-                print("数据与数据库一致，仅更新本地文件...")
+                logger.info("数据与数据库一致，仅更新本地文件...")
                 save_local_files(js_content)
             else:
-                print("数据与数据库不一致，执行完整更新...")
+                logger.info("数据与数据库不一致，执行完整更新...")
                 process_full_data(js_content)
             return
         
-        # 情况3：数据库和文件都存在，比较内容
-        with open(js_file_path, 'r', encoding='utf-8') as f:
-            local_js_content = f.read()
-            
-        if DataFetcher.compare_js_content(js_content, local_js_content):
+        # 情况3：数据库和文件都存在，比较内容哈希
+        if DataFetcher.js_unchanged(Config.AREAS_URL, js_content, js_file_path):
             if compare_with_db(js_content):
-                print("数据无变化，程序退出")
+                logger.info("数据无变化，程序退出")
                 return
         
-        print("检测到数据变化，执行更新...")
+        logger.info("检测到数据变化，执行更新...")
         process_full_data(js_content)
 
     except Exception as e:
-        print(f"程序执行出错: {str(e)}")
+        logger.error("程序执行出错: %s", e)
         raise
 
-def process_full_data(js_content):
-    """执行完整的数据处理流程"""
-    # 保存JS文件
-    js_file_path = os.path.join(Config.JS_OUTPUT_DIR, 'leftData.js')
-    with open(js_file_path, 'w', encoding='utf-8') as f:
-        f.write(js_content)
-    print(f"JS文件已保存到: {js_file_path}")
+def process_full_data(js_content, bulk=False):
+    """执行完整的数据处理流程
+    Args:
+        bulk: 空库首次导入时为 True，先解析全部赛事，再一次批量写入数据库
+    """
+    save_js_file(js_content)
     
-    print("正在解析数据...")
+    logger.info("正在解析数据...")
     all_arrays = DataFetcher.load_area_data(js_content)
     
     # 从获取的数据中提取区域名称
@@ -856,40 +1066,53 @@ def process_full_data(js_content):
         raise Exception("未能获取区域数据")
     
     # 数据库操作
-    print("正在保存区域数据到数据库...")
-    if not DBManager.save_areas_to_db(area_names):
-        raise Exception("保存区域数据失败")
+    if not bulk:
+        logger.info("正在保存区域数据到数据库...")
+        if not DBManager.save_areas_to_db(area_names):
+            raise Exception("保存区域数据失败")
     
     # 处理数据
     data_for_excel = []
     for i, array in enumerate(all_arrays):
         if array:
             area_name = area_names[i][0]
-            print(f"正在处理 {area_name} ...")
+            logger.info("正在处理 %s ...", area_name)
             area_data = DataFetcher.extract_area_data(array)
             events_data = DataFetcher.get_events_data(area_data)
             
             if events_data:
-                if not DBManager.save_events_to_db(events_data):
+                if not bulk and not DBManager.save_events_to_db(events_data):
                     raise Exception(f"保存 {area_name} 赛事数据失败")
                 data_for_excel.append((area_name, events_data))
-                print(f"{area_name} 处理完成")
+                logger.info("%s 处理完成", area_name)
             else:
-                print(f"{area_name} 无数据")
+                logger.info("%s 无数据", area_name)
+    
+    if bulk:
+        logger.info("正在批量导入区域和赛事数据...")
+        all_events = [event for _, events_data in data_for_excel for event in events_data]
+        if not DBManager.bulk_load(area_names, all_events):
+            raise Exception("批量导入数据失败")
     
     # 导出Excel
     if data_for_excel and not ExcelExporter.export_to_excel(data_for_excel, Config.EXCEL_EVENTS_EXCEL):
         raise Exception("导出Excel失败")
     
-    print("所有数据处理完成")
+    logger.info("所有数据处理完成")
 
-def save_local_files(js_content):
-    """仅保存本地文件，不进行数据验证和更新"""
-    # 保存JS文件
+def save_js_file(js_content):
+    """保存JS文件，并记录快照（之后按内容哈希判断是否变化）"""
     js_file_path = os.path.join(Config.JS_OUTPUT_DIR, 'leftData.js')
-    with open(js_file_path, 'w', encoding='utf-8') as f:
+    with atomic_write(js_file_path) as f:
         f.write(js_content)
-    print(f"JS文件已保存到: {js_file_path}")
+    store = SnapshotStore.get()
+    store.put(Config.AREAS_URL, js_content)
+    store.save()
+    logger.info("JS文件已保存到: %s", js_file_path)
+
+def save_local_files(js_content):
+    """仅保存本地文件，不进行数据验证和更新"""
+    save_js_file(js_content)
     
     # 解析数据并导出Excel
     all_arrays = DataFetcher.load_area_data(js_content)
@@ -927,12 +1150,12 @@ def compare_with_db(js_content):
             area_data = DataFetcher.extract_area_data(array)
             events_data = DataFetcher.get_events_data(area_data)
             if events_data:
-                existing_events = DBUtils.execute_query("""
+                existing_events = DBUtils.stream_query("""
                     SELECT event_id, name_zh, name_zht, name_en, 
                            event_type, type_code, levelid,
                            access_url, url_status
                     FROM events
-                """)
+                """, named=True)
                 if DBManager.compare_events_data(events_data, existing_events):
                     return False
     
@@ -940,11 +1163,13 @@ def compare_with_db(js_content):
 
 
 if __name__ == "__main__":
+    setup_logging()
+    clear_console()
     try:
         main()
     except Exception as e:
-        print(f"程序执行出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("程序执行出错: %s", e)
+    finally:
+        Metrics.report()
 
 
@@ -1,11 +1,9 @@
-import pandas as pd
-import requests
+import logging
 import re
 import json
 import os
 import sys
 import time
-import random
 from datetime import datetime
 
 # 导入全局配置
@@ -14,7 +12,18 @@ from Global_cfg import SOURCE_URL
 
 # 数据库相关的导入
 sys.path.append(os.path.join(os.path.dirname(__file__), 'sql'))
-from db_utils import DBUtils
+from catalogue_cache import CatalogueCache
+
+# 运行指标
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from metrics import Metrics
+from log_utils import setup_logging
+from excel_utils import ExcelExport
+from dead_urls import DeadUrlCache
+from http_client import HttpClient
+from snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
 
 class LeagueSeasonFetcher:
     def __init__(self):
@@ -25,46 +34,15 @@ class LeagueSeasonFetcher:
         self.output_file = os.path.join(self.output_dir, 'league_seasons.xlsx')
 
     def get_events_by_level(self):
-        """按区域级别获取赛事数据"""
-        events_by_level = {}
-        
-        # 先分别检查两个表的数据
-        check_tables_sql = """
-            SELECT 
-                (SELECT COUNT(*) FROM events) as events_count,
-                (SELECT COUNT(*) FROM areas) as areas_count
-        """
-        tables_count = DBUtils.execute_query(check_tables_sql)
-        print("\n=== 表数据检查 ===")
-        print(f"events表记录数: {tables_count[0]['events_count']}")
-        print(f"areas表记录数: {tables_count[0]['areas_count']}")
-        
-        # 检查JOIN条件
-        check_join_sql = """
-            SELECT e.levelid, a.level, COUNT(*) as match_count
-            FROM events e
-            JOIN areas a ON e.levelid = a.level
-            GROUP BY e.levelid, a.level
-            ORDER BY e.levelid
-        """
-        join_result = DBUtils.execute_query(check_join_sql)
-        print("\n=== JOIN条件检查 ===")
-        for row in join_result:
-            print(f"levelid: {row['levelid']}, level: {row['level']}, 匹配数: {row['match_count']}")
-        
-        # 修改分级别查询
-        for level in range(6):
-            sql = """
-                SELECT e.event_id, e.name_zh, e.type_code, e.access_url, a.name_zh as area_name
-                FROM events e
-                JOIN areas a ON e.levelid = a.level
-                WHERE e.levelid = %s
-                ORDER BY e.event_id
-            """
-            events = DBUtils.execute_query(sql, (level,))
-            if events:
-                events_by_level[level] = events
-            
+        """按区域级别获取赛事数据（读取进程内目录缓存，常驻模式下不再每次查询数据库）"""
+        catalogue = CatalogueCache.get()
+        try:
+            levels = catalogue.levels()
+        except RuntimeError as e:
+            logger.error("无法读取赛事数据，请检查数据库连接: %s", e)
+            return {}
+        events_by_level = {level: catalogue.events_by_level(level) for level in levels}
+        logger.info("赛事数据: %s", ', '.join(f"级别{level} {len(events)}条" for level, events in events_by_level.items()))
         return events_by_level
 
     def generate_season_url(self, event_id):
@@ -72,34 +50,52 @@ class LeagueSeasonFetcher:
         return f"{SOURCE_URL}jsData/LeagueSeason/sea{event_id}.js"
 
     def verify_url(self, url):
-        """验证URL是否可访问"""
+        """验证URL是否可访问（已确定失效的URL在复查时间之前直接返回，不请求也不等待）"""
+        dead = DeadUrlCache.get()
+        if dead.should_skip(url):
+            return False, None
         try:
-            time.sleep(random.uniform(0.5, 1))
-            response = requests.get(url, headers=self.headers, timeout=10)
+            # 请求间隔由 HttpClient 按主机统一限速（并发验证时总速率不变）
+            start = time.perf_counter()
+            response = HttpClient.get(url, headers=self.headers, timeout=10)
+            Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status_code)
+            Metrics.inc('http_requests_total', status=response.status_code)
+            Metrics.inc('http_bytes_total', len(response.content))
             
-            print(f"\n验证URL: {url}")
-            print(f"状态码: {response.status_code}")
+            logger.debug("验证URL: %s 状态码: %s", url, response.status_code)
             
             if response.status_code == 200:
-                content = response.text
-                print(f"页面内容长度: {len(content)}")
+                content = HttpClient.text(response)
+                logger.debug("页面内容长度: %s", len(content))
                 
                 if '<title>404</title>' in content or 'error404' in content:
-                    print("页面包含404标记")
+                    logger.debug("页面包含404标记: %s", url)
+                    dead.record_failure(url)
                     return False, None
                 
                 # 检查是否包含赛季数据
-                if 'var arrSeason' in content and '[' in content and ']' in content:
+                if self.has_seasons(content):
+                    dead.record_success(url)
+                    SnapshotStore.get().put(url, content)
                     return True, content
                 else:
-                    print("页面不包含赛季数据")
+                    logger.debug("页面不包含赛季数据: %s", url)
+                    dead.record_failure(url)
                     return False, None
                     
+            dead.record(url, False, response.status_code)
             return False, None
         except Exception as e:
-            print(f"验证URL失败: {str(e)}")
+            Metrics.inc('http_errors_total')
+            logger.error("验证URL失败: %s", e)
             return False, None
 
+    @staticmethod
+    def has_seasons(content):
+        """内容是否为有效的赛季数据"""
+        return bool(content) and 'var arrSeason' in content and '[' in content and ']' in content
+
+    @Metrics.timed('parse', stage='extract_seasons')
     def extract_seasons(self, js_content):
         """提取赛季数据"""
         pattern = r'var\s+arrSeason\s*=\s*(\[.*?\]);'
@@ -127,7 +123,7 @@ class LeagueSeasonFetcher:
                 
                 return processed_seasons
             except json.JSONDecodeError as e:
-                print(f"解析赛季数据失败: {e}")
+                logger.error("解析赛季数据失败: %s", e)
         return None
 
     def process_events(self):
@@ -139,13 +135,14 @@ class LeagueSeasonFetcher:
         valid_urls = 0
 
         for level, events in events_by_level.items():
-            print(f"\n处理区域级别 {level} 的赛事...")
+            logger.info("处理区域级别 %s 的赛事...", level)
             level_data = []
+            # 同一级别的赛季链接由线程池并发验证（共用连接池），结果按赛事顺序处理
+            season_urls = [self.generate_season_url(event['event_id']) for event in events]
+            responses = HttpClient.map(self.verify_url, season_urls)
             
-            for event in events:
+            for event, season_url, (is_valid, content) in zip(events, season_urls, responses):
                 total_urls += 1
-                season_url = self.generate_season_url(event['event_id'])
-                is_valid, content = self.verify_url(season_url)
                 
                 if is_valid:
                     valid_urls += 1
@@ -158,58 +155,95 @@ class LeagueSeasonFetcher:
                         'URL': season_url
                     })
 
-                level_data.append({
-                    '赛事ID': event['event_id'],
-                    '赛事名称': event['name_zh'],
-                    '类型编码': event['type_code'],
-                    '访问链接': event['access_url'],
-                    '赛季数据链接': season_url,
-                    '赛季数据': json.dumps(seasons, ensure_ascii=False) if seasons else '无数据'
-                })
+                level_data.append(self.event_row(event, season_url, seasons))
             
             if level_data:
                 all_data.append((events[0]['area_name'], level_data))
 
+        DeadUrlCache.get().save()
+        SnapshotStore.get().save()
+
         # 打印统计信息
         self.print_statistics(total_urls, valid_urls, invalid_urls)
         
         # 导出数据
         self.export_to_excel(all_data)
 
+    def process_changed(self, contents):
+        """只处理内容有变化的赛事（常驻模式）
+        Args:
+            contents: {赛季数据URL: 已获取的内容}，内容已保存快照
+        其余赛事使用最新快照，不再逐个验证URL；Excel 按工作表指纹增量写入，只重写有变化的区域。
+        """
+        dead = DeadUrlCache.get()
+        store = SnapshotStore.get()
+        for url, content in contents.items():
+            if self.has_seasons(content):
+                dead.record_success(url)
+            else:
+                dead.record_failure(url)
+
+        all_data = []
+        for level, events in self.get_events_by_level().items():
+            level_data = []
+            for event in events:
+                season_url = self.generate_season_url(event['event_id'])
+                content = contents.get(season_url)
+                if content is None and not dead.should_skip(season_url):
+                    content = store.load(season_url)
+                seasons = self.extract_seasons(content) if self.has_seasons(content) else None
+                level_data.append(self.event_row(event, season_url, seasons))
+            if level_data:
+                all_data.append((events[0]['area_name'], level_data))
+
+        dead.save()
+        store.save()
+        logger.info("重新处理 %s 个赛事的赛季数据", len(contents))
+        self.export_to_excel(all_data)
+
+    @staticmethod
+    def event_row(event, season_url, seasons):
+        """导出到Excel的一行赛事数据"""
+        return {
+            '赛事ID': event['event_id'],
+            '赛事名称': event['name_zh'],
+            '类型编码': event['type_code'],
+            '访问链接': event['access_url'],
+            '赛季数据链接': season_url,
+            '赛季数据': json.dumps(seasons, ensure_ascii=False) if seasons else '无数据'
+        }
+
     def print_statistics(self, total_urls, valid_urls, invalid_urls):
         """打印URL统计信息"""
-        print("\n=== URL统计信息 ===")
-        print(f"总URL数量: {total_urls}")
-        print(f"有效URL数量: {valid_urls}")
-        print(f"无效URL数量: {len(invalid_urls)}")
+        logger.info("=== URL统计信息 ===")
+        logger.info("总URL数量: %s", total_urls)
+        logger.info("有效URL数量: %s", valid_urls)
+        logger.info("无效URL数量: %s", len(invalid_urls))
         
         if invalid_urls:
-            print("\n无效URL明细:")
+            logger.info("无效URL明细:")
             for item in invalid_urls:
-                print(f"\n区域: {item['区域']}")
-                print(f"赛事: {item['赛事']}")
-                print(f"URL: {item['URL']}")
+                logger.info("区域: %s", item['区域'])
+                logger.info("赛事: %s", item['赛事'])
+                logger.info("URL: %s", item['URL'])
 
+    @Metrics.timed('export', target='excel')
     def export_to_excel(self, data_list):
         """导出数据到Excel"""
         try:
-            os.makedirs(self.output_dir, exist_ok=True)
-            
-            with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-                for area_name, events_data in data_list:
-                    if events_data:
-                        df = pd.DataFrame(events_data)
-                        df.to_excel(writer, sheet_name=area_name, index=False)
+            ExcelExport.write_workbook(data_list, self.output_file)
             
-            print(f"\nExcel文件已保存到: {self.output_file}")
+            logger.info("Excel文件已保存到: %s", self.output_file)
             return True
         except Exception as e:
-            print(f"导出Excel失败: {str(e)}")
+            logger.error("导出Excel失败: %s", e)
             return False
 
 def main():
+    setup_logging()
     fetcher = LeagueSeasonFetcher()
     fetcher.process_events()
+    Metrics.report()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,5 +1,3 @@
-import pandas as pd
-import requests
 import re
 import json
 import os
@@ -16,6 +14,10 @@ from Global_cfg import SOURCE_URL
 sys.path.append(os.path.join(os.path.dirname(__file__), 'sql'))
 from db_utils import DBUtils
 
+# 共用连接池的HTTP请求
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from http_client import HttpClient
+
 class LeagueSeasonFetcher:
     def __init__(self):
         self.headers = {
@@ -75,7 +77,7 @@ class LeagueSeasonFetcher:
         """验证URL是否可访问"""
         try:
             time.sleep(random.uniform(0.5, 1))
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = HttpClient.get(url, headers=self.headers, timeout=10)
             
             print(f"\n验证URL: {url}")
             print(f"状态码: {response.status_code}")
@@ -192,6 +194,9 @@ class LeagueSeasonFetcher:
 
     def export_to_excel(self, data_list):
         """导出数据到Excel"""
+        # pandas 只在导出时导入
+        import pandas as pd
+
         try:
             os.makedirs(self.output_dir, exist_ok=True)
             
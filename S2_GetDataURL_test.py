@@ -1,5 +1,4 @@
-import pandas as pd
-import requests
+import logging
 import re
 import json
 import os
@@ -8,7 +7,6 @@ import time
 import random
 from datetime import datetime
 import asyncio
-import aiohttp
 from typing import Dict, List, Tuple, Optional
 
 # 导入全局配置
@@ -17,7 +15,16 @@ from Global_cfg import SOURCE_URL
 
 # 数据库相关的导入
 sys.path.append(os.path.join(os.path.dirname(__file__), 'sql'))
-from db_utils import DBUtils
+from db_utils import DBUtils, DatabaseUnavailableError
+
+# 运行指标
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from metrics import Metrics
+from log_utils import clear_console, setup_logging
+from excel_utils import ExcelExport
+from http_client import HttpClient
+
+logger = logging.getLogger(__name__)
 
 class LeagueSeasonFetcher:
     def __init__(self):
@@ -39,36 +46,43 @@ class LeagueSeasonFetcher:
                 (SELECT COUNT(*) FROM events) as events_count,
                 (SELECT COUNT(*) FROM areas) as areas_count
         """
-        tables_count = DBUtils.execute_query(check_tables_sql)
-        print("\n=== 表数据检查 ===")
-        print(f"events表记录数: {tables_count[0]['events_count']}")
-        print(f"areas表记录数: {tables_count[0]['areas_count']}")
-        
-        # 检查JOIN条件
-        check_join_sql = """
-            SELECT e.levelid, a.level, COUNT(*) as match_count
-            FROM events e
-            JOIN areas a ON e.levelid = a.level
-            GROUP BY e.levelid, a.level
-            ORDER BY e.levelid
-        """
-        join_result = DBUtils.execute_query(check_join_sql)
-        print("\n=== JOIN条件检查 ===")
-        for row in join_result:
-            print(f"levelid: {row['levelid']}, level: {row['level']}, 匹配数: {row['match_count']}")
+        try:
+            tables_count = DBUtils.execute_query(check_tables_sql)
+            if not tables_count:
+                logger.error("无法读取赛事数据，请检查数据库连接")
+                return events_by_level
+            logger.info("=== 表数据检查 ===")
+            logger.info("events表记录数: %s", tables_count[0]['events_count'])
+            logger.info("areas表记录数: %s", tables_count[0]['areas_count'])
         
-        # 修改分级别查询
-        for level in range(6):
-            sql = """
-                SELECT e.event_id, e.name_zh, e.type_code, e.access_url, a.name_zh as area_name
+            # 检查JOIN条件
+            check_join_sql = """
+                SELECT e.levelid, a.level, COUNT(*) as match_count
                 FROM events e
                 JOIN areas a ON e.levelid = a.level
-                WHERE e.levelid = %s
-                ORDER BY e.event_id
+                GROUP BY e.levelid, a.level
+                ORDER BY e.levelid
             """
-            events = DBUtils.execute_query(sql, (level,))
-            if events:
-                events_by_level[level] = events
+            join_result = DBUtils.execute_query(check_join_sql)
+            logger.info("=== JOIN条件检查 ===")
+            for row in join_result or []:
+                logger.info("levelid: %s, level: %s, 匹配数: %s", row['levelid'], row['level'], row['match_count'])
+        
+            # 修改分级别查询
+            for level in range(6):
+                sql = """
+                    SELECT e.event_id, e.name_zh, e.type_code, e.access_url, a.name_zh as area_name
+                    FROM events e
+                    JOIN areas a ON e.levelid = a.level
+                    WHERE e.levelid = %s
+                    ORDER BY e.event_id
+                """
+                events = DBUtils.execute_query(sql, (level,))
+                if events:
+                    events_by_level[level] = events
+        except DatabaseUnavailableError as e:
+            logger.error("数据库不可用: %s", e)
+            return {}
             
         return events_by_level
 
@@ -78,30 +92,37 @@ class LeagueSeasonFetcher:
 
     async def verify_url_async(self, url: str) -> Tuple[bool, Optional[str]]:
         """异步验证URL是否可访问"""
+        import aiohttp  # 只在验证URL时导入
+
         async with self.semaphore:  # 使用信号量控制并发
             try:
                 async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=self.headers, timeout=10) as response:
-                        print(f"\n验证URL: {url}")
-                        print(f"状态码: {response.status}")
+                    start = time.perf_counter()
+                    async with HttpClient.aget(session, url, headers=self.headers, timeout=10) as response:
+                        logger.debug("验证URL: %s 状态码: %s", url, response.status)
+                        Metrics.inc('http_requests_total', status=response.status)
                         
                         if response.status == 200:
-                            content = await response.text()
-                            print(f"页面内容长度: {len(content)}")
+                            content = await HttpClient.atext(response)
+                            Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status)
+                            Metrics.inc('http_bytes_total', len(content))
+                            logger.debug("页面内容长度: %s", len(content))
                             
                             if '<title>404</title>' in content or 'error404' in content:
-                                print("页面包含404标记")
+                                logger.debug("页面包含404标记: %s", url)
                                 return False, None
                             
                             if 'var arrSeason' in content and '[' in content and ']' in content:
                                 return True, content
                             else:
-                                print("页面不包含赛季数据")
+                                logger.debug("页面不包含赛季数据: %s", url)
                                 return False, None
                                 
+                        Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status)
                         return False, None
             except Exception as e:
-                print(f"验证URL失败: {str(e)}")
+                Metrics.inc('http_errors_total')
+                logger.error("验证URL失败: %s", e)
                 return False, None
 
     async def process_event_async(self, event: Dict) -> Tuple[Dict, Optional[Dict]]:
@@ -140,7 +161,7 @@ class LeagueSeasonFetcher:
         valid_urls = 0
 
         for level, events in events_by_level.items():
-            print(f"\n处理区域级别 {level} 的赛事...")
+            logger.info("处理区域级别 %s 的赛事...", level)
             level_data = []
             
             # 创建异步任务列表
@@ -172,35 +193,31 @@ class LeagueSeasonFetcher:
 
     def print_statistics(self, total_urls, valid_urls, invalid_urls):
         """打印URL统计信息"""
-        print("\n=== URL统计信息 ===")
-        print(f"总URL数量: {total_urls}")
-        print(f"有效URL数量: {valid_urls}")
-        print(f"无效URL数量: {len(invalid_urls)}")
+        logger.info("=== URL统计信息 ===")
+        logger.info("总URL数量: %s", total_urls)
+        logger.info("有效URL数量: %s", valid_urls)
+        logger.info("无效URL数量: %s", len(invalid_urls))
         
         if invalid_urls:
-            print("\n无效URL明细:")
+            logger.info("无效URL明细:")
             for item in invalid_urls:
-                print(f"\n区域: {item['区域']}")
-                print(f"赛事: {item['赛事']}")
-                print(f"URL: {item['URL']}")
+                logger.info("区域: %s", item['区域'])
+                logger.info("赛事: %s", item['赛事'])
+                logger.info("URL: %s", item['URL'])
 
+    @Metrics.timed('export', target='excel')
     def export_to_excel(self, data_list):
         """导出数据到Excel"""
         try:
-            os.makedirs(self.output_dir, exist_ok=True)
-            
-            with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-                for area_name, events_data in data_list:
-                    if events_data:
-                        df = pd.DataFrame(events_data)
-                        df.to_excel(writer, sheet_name=area_name, index=False)
+            ExcelExport.write_workbook(data_list, self.output_file)
             
-            print(f"\nExcel文件已保存到: {self.output_file}")
+            logger.info("Excel文件已保存到: %s", self.output_file)
             return True
         except Exception as e:
-            print(f"导出Excel失败: {str(e)}")
+            logger.error("导出Excel失败: %s", e)
             return False
 
+    @Metrics.timed('parse', stage='extract_seasons')
     def extract_seasons(self, js_content):
         """提取赛季数据"""
         pattern = r'var\s+arrSeason\s*=\s*(\[.*?\]);'
@@ -228,17 +245,16 @@ class LeagueSeasonFetcher:
                 
                 return processed_seasons
             except json.JSONDecodeError as e:
-                print(f"解析赛季数据失败: {e}")
+                logger.error("解析赛季数据失败: %s", e)
         return None
 
 
-# 清空终端输出
-os.system('cls' if os.name == 'nt' else 'clear')
-
-
 def main():
+    setup_logging()
+    clear_console()
     fetcher = LeagueSeasonFetcher()
     fetcher.process_events()
+    Metrics.report()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,472 @@
+''' 3. 获取联赛赛季比赛结果（按轮次增量更新）
+    - 基于S2的赛季数据链接(sea{赛事ID}.js)获取赛季列表，再按 联赛+赛季 获取比赛数据(jh["R_N"])。
+    - 每个联赛赛季维护轮次水位：轮次内比赛全部结束(状态返回值=-1)即视为完结，之后直接使用本地数据。
+    - 只有存在未完结轮次(或从未获取过)的赛季才会重新请求，且只解析未完结的轮次。
+    - 赛季列表的最近N个赛季都已完结时直接使用 sea{赛事ID}.js 的本地快照（S2/常驻模式会更新快照），不再请求；
+      新赛季在快照更新后才会发现，--force 时总是重新请求。
+    - 输出：LocalOutputFiles/Matches/{赛季}_{赛事ID}_Matches.json、{赛季}_{赛事ID}_Team.json、轮次水位文件
+      （均为原子写入；--jsonl 时比赛数据为 *_Matches.jsonl，只追加新增或变化的比赛）
+    - 比赛中球队只保存整数ID（主队ID/客队ID），名称保存在 *_Team.json，通过 utils/team_registry.py 解析。
+    - 有数据更新时重建列式比赛存储（utils/match_store.py）
+    - 请求到的比赛JS按内容哈希保存快照（utils/snapshot_store.py），--offline 时从快照重新解析，不请求网络。
+    - 新增或变化的比赛写入变更流（utils/change_feed.py）。
+'''
+import ast
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import requests
+
+# 导入全局配置
+sys.path.append(os.path.dirname(__file__))
+from Global_cfg import SOURCE_URL
+from S2_GetAll_LeagueSeasons import LeagueSeasonFetcher
+
+# 列式比赛存储
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from metrics import Metrics
+from log_utils import setup_logging
+from file_utils import append_jsonl, read_jsonl, write_json, write_jsonl
+from dead_urls import DeadUrlCache
+from http_client import HttpClient
+from snapshot_store import SnapshotStore
+from change_feed import ChangeFeed, change
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """比赛数据配置
+    属性说明：
+        MATCH_URL: 联赛赛季比赛数据链接模板
+        OUTPUT_DIR: 比赛数据本地存储目录
+        WATERMARK_FILE: 轮次水位文件，记录每个 联赛|赛季 各轮次是否已完结
+        FINISHED_STATE: 已结束比赛的状态返回值
+        MATCH_FIELDS: jh["R_N"] 每行比赛数组的字段位置（负数表示从末尾取）
+        TEAM_FIELDS: arrTeam 每行球队数组的字段位置
+        JSONL_COMPACT_RATIO: JSONL 行数超过比赛数的该倍数时压缩重写
+    """
+    MATCH_URL = SOURCE_URL + 'jsData/matchResult/{season}/s{event_id}.js'
+
+    OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'LocalOutputFiles', 'Matches')
+    WATERMARK_FILE = os.path.join(OUTPUT_DIR, 'round_watermark.json')
+
+    FINISHED_STATE = -1
+
+    MATCH_FIELDS = {
+        '比赛ID': 0,
+        '联赛ID': 1,
+        '状态返回值': 2,
+        '比赛时间': 3,
+        '主队ID': 4,        # 整数球队ID(qtid)，名称保存在 *_Team.json，通过 utils/team_registry.py 解析
+        '客队ID': 5,
+        '全场比分': 6,
+        '半场比分': 7,
+        '主队排名': 8,
+        '客队排名': 9,
+        '让球': 10,
+        '总进球': 12,
+        '主队排名显示': -2,
+        '客队排名显示': -1
+    }
+
+    TEAM_FIELDS = ['qtid', 'name_zh', 'name_zht', 'name_en', 'extra_info', 'logo', 'status']
+
+    JSONL_COMPACT_RATIO = 2
+
+
+class RoundWatermark:
+    """轮次水位，格式:
+        {'36|2024-2025': {'rounds': {'1': {'complete': True, 'matches': 10}}, 'complete': False, 'last_fetch': '...'}}
+    """
+
+    def __init__(self, path=Config.WATERMARK_FILE):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    @staticmethod
+    def key(event_id, season):
+        return f"{event_id}|{season}"
+
+    def get(self, event_id, season):
+        return self.data.get(self.key(event_id, season))
+
+    def open_rounds(self, event_id, season):
+        """返回未完结的轮次编号集合；从未获取过时返回 None（表示需要解析全部轮次）"""
+        state = self.get(event_id, season)
+        if not state:
+            return None
+        return {int(r) for r, info in state['rounds'].items() if not info['complete']}
+
+    def is_complete(self, event_id, season):
+        state = self.get(event_id, season)
+        return bool(state and state['complete'])
+
+    def update(self, event_id, season, rounds):
+        """根据最新的轮次数据重新计算水位"""
+        round_states = {
+            str(round_no): {
+                'complete': MatchResultFetcher.is_round_complete(matches),
+                'matches': len(matches)
+            }
+            for round_no, matches in sorted(rounds.items())
+        }
+        self.data[self.key(event_id, season)] = {
+            'rounds': round_states,
+            'complete': bool(round_states) and all(r['complete'] for r in round_states.values()),
+            'last_fetch': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def save(self):
+        write_json(self.path, self.data)
+
+
+class MatchResultFetcher:
+    def __init__(self, output_dir=Config.OUTPUT_DIR, jsonl=False, offline=False):
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        self.output_dir = output_dir
+        self.season_fetcher = LeagueSeasonFetcher()
+        self.watermark = RoundWatermark(os.path.join(output_dir, os.path.basename(Config.WATERMARK_FILE)))
+        self.request_count = 0
+        self.jsonl = jsonl
+        self.jsonl_lines = {}   # JSONL 文件 -> 当前行数（用于判断是否需要压缩）
+        self.offline = offline  # True 时从本地快照读取赛季/比赛JS，不请求网络
+        self.snapshots = SnapshotStore.get()
+
+    # ---------- 赛季列表 ----------
+    def get_seasons(self, event_id):
+        """通过S2的赛季链接获取赛季名称列表，如 ['2024-2025', '2023-2024']"""
+        season_url = self.season_fetcher.generate_season_url(event_id)
+        if self.offline:
+            content = self.snapshots.load(season_url)
+            is_valid = content is not None
+        else:
+            self.request_count += 1
+            is_valid, content = self.season_fetcher.verify_url(season_url)
+        if not is_valid:
+            return []
+        return self.season_names(content)
+
+    def cached_seasons(self, event_id, latest=1):
+        """赛季快照中最近 latest 个赛季都已完结时返回赛季列表，否则返回 None（需要重新请求）"""
+        content = self.snapshots.load(self.season_fetcher.generate_season_url(event_id))
+        if not self.season_fetcher.has_seasons(content):
+            return None
+        seasons = self.season_names(content)
+        recent = seasons[:latest] if latest else seasons
+        if not recent or not all(self.watermark.is_complete(event_id, season) for season in recent):
+            return None
+        return seasons
+
+    def season_names(self, content):
+        """赛季JS内容 -> 赛季名称列表"""
+        seasons = self.season_fetcher.extract_seasons(content) or []
+        return [
+            s['start_year'] if s['start_year'] == s['end_year'] else f"{s['start_year']}-{s['end_year']}"
+            for s in seasons
+        ]
+
+    # ---------- 请求与解析 ----------
+    def generate_match_url(self, event_id, season):
+        """生成联赛赛季比赛数据URL"""
+        return Config.MATCH_URL.format(season=season, event_id=event_id)
+
+    def get_match_js(self, event_id, season):
+        """获取联赛赛季比赛JS内容"""
+        url = self.generate_match_url(event_id, season)
+        if self.offline:
+            content = self.snapshots.load(url)
+            if content is None:
+                logger.warning("没有本地快照: %s", url)
+            return content
+        self.request_count += 1
+        try:
+            logger.debug("请求URL: %s", url)
+            start = time.perf_counter()
+            response = HttpClient.get(url, headers=self.headers, timeout=10)
+            Metrics.observe('http_request_seconds', time.perf_counter() - start, status=response.status_code)
+            Metrics.inc('http_requests_total', status=response.status_code)
+            Metrics.inc('http_bytes_total', len(response.content))
+            response.raise_for_status()
+            content = HttpClient.text(response)
+            self.snapshots.put(url, content)
+            return content
+        except requests.RequestException as e:
+            Metrics.inc('http_errors_total')
+            logger.error("获取比赛数据失败: %s", e)
+            return None
+
+    @staticmethod
+    def parse_js_array(array_str):
+        """将JS数组字面量转换为Python列表（空位补 None）"""
+        array_str = re.sub(r'(?<=,)\s*(?=[,\]])', 'None', array_str)
+        array_str = re.sub(r'(?<=\[)\s*(?=,)', 'None', array_str)
+        return ast.literal_eval(array_str)
+
+    @staticmethod
+    def extract_teams(js_content):
+        """提取 arrTeam 球队数据"""
+        match = re.search(r'var\s+arrTeam\s*=\s*(\[.*?\]);', js_content, re.DOTALL)
+        if not match:
+            return []
+        try:
+            rows = MatchResultFetcher.parse_js_array(match.group(1))
+        except (ValueError, SyntaxError) as e:
+            logger.error("解析球队数据失败: %s", e)
+            return []
+        return [dict(zip(Config.TEAM_FIELDS, row)) for row in rows if row]
+
+    @staticmethod
+    @Metrics.timed('parse', stage='extract_rounds')
+    def extract_rounds(js_content, round_numbers=None):
+        """提取 jh["R_N"] 轮次数据
+        Args:
+            js_content: 比赛JS内容
+            round_numbers: 需要解析的轮次编号集合，None 表示全部
+        Returns:
+            dict: {轮次编号: [比赛数组, ...]}
+        """
+        rounds = {}
+        for match in re.finditer(r'jh\["R_(\d+)"\]\s*=\s*(\[.*?\]);', js_content, re.DOTALL):
+            round_no = int(match.group(1))
+            if round_numbers is not None and round_no not in round_numbers:
+                continue
+            try:
+                rounds[round_no] = MatchResultFetcher.parse_js_array(match.group(2))
+            except (ValueError, SyntaxError) as e:
+                logger.error("解析第%s轮数据失败: %s", round_no, e)
+        return rounds
+
+    @staticmethod
+    def format_goal_line(value):
+        """将盘口数值格式化为 '3/3.5'、'2.5' 形式，字符串原样返回"""
+        if value is None or isinstance(value, str):
+            return value
+        if value * 4 % 2 == 1:  # 四分之一盘，如 3.25 -> 3/3.5
+            low, high = value - 0.25, value + 0.25
+            return f"{low:g}/{high:g}"
+        return f"{value:g}"
+
+    @staticmethod
+    def convert_match(row):
+        """将比赛数组转换为 *_Matches.json 的字段（球队只保存 主队ID/客队ID，不重复保存名称）"""
+        match = {}
+        for field, index in Config.MATCH_FIELDS.items():
+            match[field] = row[index] if -len(row) <= index < len(row) else None
+        match['总进球'] = MatchResultFetcher.format_goal_line(match['总进球'])
+        for field in ('全场比分', '半场比分', '主队排名', '客队排名', '主队排名显示', '客队排名显示'):
+            if match[field] == '':
+                match[field] = None
+        return match
+
+    @staticmethod
+    def is_round_complete(matches):
+        """轮次内所有比赛都已结束才视为完结"""
+        return bool(matches) and all(m['状态返回值'] == Config.FINISHED_STATE for m in matches)
+
+    # ---------- 本地存储 ----------
+    def matches_file(self, event_id, season):
+        suffix = 'jsonl' if self.jsonl else 'json'
+        return os.path.join(self.output_dir, f"{season}_{event_id}_Matches.{suffix}")
+
+    def teams_file(self, event_id, season):
+        return os.path.join(self.output_dir, f"{season}_{event_id}_Team.json")
+
+    @staticmethod
+    def group_matches(rounds):
+        """按 已结束比赛/未开始比赛 分组输出，与现有 *_Matches.json 结构保持一致"""
+        result = {'已结束比赛': {}, '未开始比赛': {}}
+        for round_no in sorted(rounds):
+            for match in rounds[round_no]:
+                group = '已结束比赛' if match['状态返回值'] == Config.FINISHED_STATE else '未开始比赛'
+                result[group].setdefault(f"Round_{round_no}", []).append(match)
+        return result
+
+    @staticmethod
+    def flatten_matches(grouped):
+        """*_Matches.json 结构 -> {轮次编号: [比赛, ...]}（按比赛时间排序）"""
+        rounds = {}
+        for group in grouped.values():
+            for round_name, matches in group.items():
+                rounds.setdefault(int(round_name.split('_')[1]), []).extend(matches)
+        for matches in rounds.values():
+            matches.sort(key=lambda m: (m['比赛时间'] or '', m['比赛ID']))
+        return rounds
+
+    @staticmethod
+    def latest_records(records):
+        """JSONL 记录 -> {轮次编号: [比赛, ...]}，同一比赛ID以最后一行为准"""
+        latest = {}
+        for record in records:
+            latest[record['比赛ID']] = record
+        rounds = {}
+        for record in latest.values():
+            match = dict(record)
+            rounds.setdefault(match.pop('轮次'), []).append(match)
+        for matches in rounds.values():
+            matches.sort(key=lambda m: (m['比赛时间'] or '', m['比赛ID']))
+        return rounds
+
+    @staticmethod
+    def to_records(rounds):
+        return [dict(match, 轮次=round_no) for round_no in sorted(rounds) for match in rounds[round_no]]
+
+    def load_local_rounds(self, event_id, season):
+        path = self.matches_file(event_id, season)
+        if not os.path.exists(path):
+            return {}
+        if self.jsonl:
+            records = read_jsonl(path)
+            self.jsonl_lines[path] = len(records)
+            return self.latest_records(records)
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.flatten_matches(json.load(f))
+
+    def save_rounds(self, event_id, season, rounds, teams=None, previous=None):
+        """保存比赛数据（原子写入）
+        Args:
+            previous: JSONL 模式下本次更新前的比赛 {比赛ID: 比赛}，只追加新增或变化的比赛
+        """
+        path = self.matches_file(event_id, season)
+        if self.jsonl:
+            records = self.to_records(rounds)
+            lines = self.jsonl_lines.get(path, 0)
+            changed = records if previous is None else [
+                record for record in records
+                if previous.get(record['比赛ID']) != {k: v for k, v in record.items() if k != '轮次'}
+            ]
+            if previous is None or lines + len(changed) > Config.JSONL_COMPACT_RATIO * len(records):
+                # 首次写入，或重复记录过多时压缩重写
+                write_jsonl(path, records)
+                self.jsonl_lines[path] = len(records)
+            else:
+                self.jsonl_lines[path] = lines + append_jsonl(path, changed)
+        else:
+            write_json(path, self.group_matches(rounds))
+        if teams:
+            write_json(self.teams_file(event_id, season), teams)
+
+    @staticmethod
+    def match_changes(event_id, season, rounds, previous):
+        """本次更新相对 previous 新增或变化的比赛 -> 变更流记录（整行附带赛事ID、赛季）"""
+        changes = []
+        for record in MatchResultFetcher.to_records(rounds):
+            before = previous.get(record['比赛ID'])
+            if before == {k: v for k, v in record.items() if k != '轮次'}:
+                continue
+            after = dict(record, 赛事ID=event_id, 赛季=season)
+            if before is None:
+                changes.append(change('matches', 'insert', record['比赛ID'], after=after))
+            else:
+                changes.append(change('matches', 'update', record['比赛ID'],
+                                      dict(before, 赛事ID=event_id, 赛季=season), after))
+        return changes
+
+    # ---------- 增量更新 ----------
+    def update_season(self, event_id, season, force=False):
+        """增量更新单个联赛赛季
+        Returns:
+            str: 'skipped'（已完结，使用本地数据）/ 'updated' / 'failed'
+        """
+        local_rounds = self.load_local_rounds(event_id, season)
+        if not force and local_rounds and self.watermark.is_complete(event_id, season):
+            logger.info("赛事 %s 赛季 %s 已全部完结，使用本地数据", event_id, season)
+            return 'skipped'
+
+        # 本地数据缺失时视为从未获取，解析全部轮次（JSONL 模式下整体重写，不在旧文件上追加）
+        first = not local_rounds
+        open_rounds = None if force or first else self.watermark.open_rounds(event_id, season)
+
+        js_content = self.get_match_js(event_id, season)
+        if not js_content:
+            return 'failed'
+
+        teams = self.extract_teams(js_content)
+
+        # 新出现的轮次（水位中没有记录）同样需要解析
+        if open_rounds is not None:
+            known_rounds = set(local_rounds)
+            all_rounds = {int(n) for n in re.findall(r'jh\["R_(\d+)"\]', js_content)}
+            open_rounds |= all_rounds - known_rounds
+
+        fetched = self.extract_rounds(js_content, open_rounds)
+        previous = {m['比赛ID']: m for matches in local_rounds.values() for m in matches}
+        for round_no, rows in fetched.items():
+            local_rounds[round_no] = [self.convert_match(row) for row in rows if row]
+
+        self.save_rounds(event_id, season, local_rounds, teams, None if first else previous)
+        ChangeFeed.get().emit(self.match_changes(event_id, season, local_rounds, previous))
+        self.watermark.update(event_id, season, local_rounds)
+        self.watermark.save()
+
+        completed = sum(1 for r in fetched if self.is_round_complete(local_rounds[r]))
+        logger.info("赛事 %s 赛季 %s: 解析 %s 轮，其中 %s 轮已完结", event_id, season, len(fetched), completed)
+        return 'updated'
+
+    def update_event(self, event_id, latest=1, force=False):
+        """更新赛事最近 latest 个赛季的比赛数据（latest=0 表示全部赛季）"""
+        seasons = None if force or self.offline else self.cached_seasons(event_id, latest)
+        if seasons is not None:
+            logger.info("赛事 %s 最近的赛季均已完结，使用赛季快照", event_id)
+        else:
+            seasons = self.get_seasons(event_id)
+        if not seasons:
+            logger.info("赛事 %s 无赛季数据", event_id)
+            return {}
+        if latest:
+            seasons = seasons[:latest]
+
+        results = {}
+        for season in seasons:
+            results[season] = self.update_season(event_id, season, force=force)
+        return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='按轮次增量获取联赛比赛结果')
+    parser.add_argument('event_ids', nargs='+', type=int, help='赛事ID（联赛）')
+    parser.add_argument('--latest', type=int, default=1, help='更新最近N个赛季，0表示全部')
+    parser.add_argument('--force', action='store_true', help='忽略轮次水位，重新解析全部轮次')
+    parser.add_argument('--jsonl', action='store_true', help='比赛数据使用JSONL格式，只追加变化的比赛')
+    parser.add_argument('--recheck-dead', action='store_true', help='忽略失效URL的复查时间，重新请求')
+    parser.add_argument('--offline', action='store_true', help='从本地快照重新解析赛季/比赛JS，不请求网络')
+    args = parser.parse_args()
+    setup_logging()
+    if args.recheck_dead:
+        DeadUrlCache.get().force = True
+
+    start = time.time()
+    fetcher = MatchResultFetcher(jsonl=args.jsonl, offline=args.offline)
+    updated = False
+    for event_id in args.event_ids:
+        results = fetcher.update_event(event_id, latest=args.latest, force=args.force)
+        updated = updated or 'updated' in results.values()
+    DeadUrlCache.get().save()
+    SnapshotStore.get().save()
+
+    # 有赛季数据更新时重建列式存储
+    if updated:
+        # numpy/pandas 只在需要重建时导入
+        from match_store import MatchStore
+        from team_registry import TeamRegistry
+
+        TeamRegistry.reset()
+        MatchStore.build()
+
+    logger.info("请求次数: %s，耗时: %.2f秒", fetcher.request_count, time.time() - start)
+    Metrics.report()
+
+
+if __name__ == '__main__':
+    main()
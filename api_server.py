@@ -0,0 +1,417 @@
+''' 本地只读查询服务（HTTP/JSON）
+    - 数据全部来自内存：区域/赛事来自目录缓存(sql/catalogue_cache.py)，赛季列表来自赛季JS快照
+      (utils/snapshot_store.py)，比赛来自列式比赛存储(utils/match_store.py，内存映射)；请求不执行SQL、不读Excel。
+    - 数据版本：目录缓存版本 + 快照索引修改时间 + 比赛存储版本，每 CHECK_INTERVAL 秒检查一次，有变化时重新加载。
+    - 比赛存储只加载已生成的存储（meta.json 更新时重新加载），不在请求中构建；
+      由 S3_GetMatchResults.py 或 python utils/match_store.py --build 生成。
+    - 响应缓存：按 路径+查询参数 缓存序列化后的响应（LRU），数据版本变化后失效；
+      ETag 为响应内容哈希，请求带 If-None-Match 且未变化时返回 304。
+    - 热点查询（HOT_QUERIES 及每个区域级别的 /events?level=）在启动和数据变化后预先生成。
+    - 数据版本只在 ReadModel.refresh 中检查；查询直接读取已加载的目录数据，不触发目录缓存的版本检查。
+    接口（列表接口支持 page、page_size 分页）：
+        GET /areas
+        GET /events?level=1&type_code=1&event_type=联赛&q=英超
+        GET /events/{赛事ID}
+        GET /events/{赛事ID}/seasons
+        GET /matches?league=36&team=阿森纳&season=2024-2025&date=2024-08-17&start=&end=
+        GET /matches/{比赛ID}
+        GET /health
+    用法：
+        python api_server.py --port 8765
+'''
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit, urlencode
+
+sys.path.append(os.path.dirname(__file__))
+from S2_GetAll_LeagueSeasons import LeagueSeasonFetcher
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'sql'))
+from db_utils import DatabaseUnavailableError
+from catalogue_cache import CatalogueCache
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from metrics import Metrics
+from log_utils import setup_logging
+from snapshot_store import Config as SnapshotConfig, SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """查询服务配置
+    属性说明：
+        HOST / PORT: 监听地址（默认只监听本机）
+        PAGE_SIZE / MAX_PAGE_SIZE: 列表接口默认每页条数 / 最大每页条数
+        CHECK_INTERVAL: 检查数据版本的最小间隔(秒)
+        CACHE_SIZE: 响应缓存条数
+        HOT_QUERIES: 预先生成响应的查询（另外按目录中的区域级别预生成 /events?level=）
+    """
+    HOST = os.environ.get('QT_API_HOST', '127.0.0.1')
+    PORT = int(os.environ.get('QT_API_PORT', 8765))
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+    CHECK_INTERVAL = 10
+    CACHE_SIZE = 1024
+    HOT_QUERIES = ['/areas']
+
+
+class ApiError(Exception):
+    """返回给客户端的错误（状态码 + 消息）"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def int_param(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, f"参数 {name} 应为整数: {value}")
+
+
+def paginate(items, params, total=None):
+    """分页：items 为列表或支持切片的数组，返回 (当前页数据, 分页信息)"""
+    page = max(1, int_param(params, 'page', 1))
+    page_size = min(max(1, int_param(params, 'page_size', Config.PAGE_SIZE)), Config.MAX_PAGE_SIZE)
+    start = (page - 1) * page_size
+    total = len(items) if total is None else total
+    return items[start:start + page_size], {'total': total, 'page': page, 'page_size': page_size}
+
+
+class ReadModel:
+    """查询服务的数据（全部在内存中），按数据版本刷新"""
+
+    def __init__(self, catalogue=None, snapshots_dir=None, match_store_dir=None):
+        self.catalogue = catalogue or CatalogueCache.get()
+        self.season_fetcher = LeagueSeasonFetcher()
+        self.snapshots_dir = snapshots_dir
+        self.match_store_dir = match_store_dir
+        self.snapshots = None
+        self.snapshots_mtime = None
+        self.seasons_cache = {}       # 赛事ID -> (快照哈希, 赛季列表)，快照未变化时不重新解析
+        self.matches = None
+        self.matches_mtime = None
+        self.matches_version = 0
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    # ---------- 刷新 ----------
+    def refresh(self, force=False):
+        """距上次检查超过 CHECK_INTERVAL 秒时检查各数据源，有变化的重新加载
+        Returns:
+            tuple: 当前数据版本
+        """
+        if force or self.checked_at is None or time.monotonic() - self.checked_at >= Config.CHECK_INTERVAL:
+            with self._lock:
+                self.catalogue.refresh()
+                self.refresh_snapshots()
+                self.refresh_matches()
+                self.checked_at = time.monotonic()
+        return self.version()
+
+    def version(self):
+        return (self.catalogue.version, self.snapshots_mtime, self.matches_version)
+
+    def refresh_snapshots(self):
+        """快照索引文件有更新（S2/S3 追加了新快照）时重新读取索引"""
+        index_file = os.path.join(self.snapshots_dir or SnapshotConfig.STORE_DIR, 'index.jsonl')
+        mtime = os.path.getmtime(index_file) if os.path.exists(index_file) else None
+        if self.snapshots is None or mtime != self.snapshots_mtime:
+            self.snapshots = SnapshotStore(self.snapshots_dir)
+            self.snapshots_mtime = mtime
+
+    def refresh_matches(self):
+        """列式存储有更新（meta.json 最后写入）时重新加载；尚未生成存储时保持为空，不在此构建"""
+        # match_store 依赖 numpy，首次刷新时才导入
+        from match_store import Config as MatchStoreConfig, MatchStore
+        store_dir = self.match_store_dir or MatchStoreConfig.STORE_DIR
+        meta_file = os.path.join(store_dir, 'meta.json')
+        if not os.path.exists(meta_file):
+            return
+        mtime = os.path.getmtime(meta_file)
+        if self.matches is not None and mtime == self.matches_mtime:
+            return
+        try:
+            matches = MatchStore.load(store_dir)
+        except (OSError, ValueError, KeyError) as e:
+            # 存储正在重建时可能读到不完整的文件，继续使用已加载的数据，下个周期再检查
+            logger.warning("比赛存储加载失败: %s", e)
+            return
+        self.matches, self.matches_mtime = matches, mtime
+        self.matches_version += 1
+        logger.info("比赛数据已加载: %s 场", len(self.matches))
+
+    # ---------- 查询 ----------
+    # 直接读取目录缓存的内存数据：版本检查(可能执行SQL)只在 refresh() 中、持有锁时进行
+    def areas(self, params):
+        return {'items': list(self.catalogue.areas.values())}
+
+    def events(self, params):
+        level = int_param(params, 'level')
+        type_code = int_param(params, 'type_code')
+        if level is not None:
+            events = self.catalogue.by_level.get(level, [])
+        elif type_code is not None:
+            events = self.catalogue.by_type.get(type_code, [])
+        else:
+            events = list(self.catalogue.events.values())
+        if type_code is not None:
+            events = [event for event in events if event['type_code'] == type_code]
+        if params.get('event_type'):
+            events = [event for event in events if event['event_type'] == params['event_type']]
+        if params.get('q'):
+            keyword = params['q'].lower()
+            events = [event for event in events
+                      if any(keyword in str(event[field]).lower() for field in ('name_zh', 'name_zht', 'name_en'))]
+        items, page = paginate(events, params)
+        return dict(page, items=items)
+
+    def event(self, params, event_id):
+        event = self.catalogue.events.get(int(event_id))
+        if event is None:
+            raise ApiError(404, f"赛事不存在: {event_id}")
+        return event
+
+    def seasons(self, params, event_id):
+        event = self.event(params, event_id)
+        url = self.season_fetcher.generate_season_url(event['event_id'])
+        digest = self.snapshots.latest(url)
+        if digest is None:
+            raise ApiError(404, f"赛事 {event_id} 尚无赛季数据")
+        cached = self.seasons_cache.get(event['event_id'])
+        if cached is None or cached[0] != digest:
+            seasons = self.season_fetcher.extract_seasons(self.snapshots.read(digest)) or []
+            cached = (digest, [
+                dict(season, season=season['start_year'] if season['start_year'] == season['end_year']
+                     else f"{season['start_year']}-{season['end_year']}")
+                for season in seasons
+            ])
+            self.seasons_cache[event['event_id']] = cached
+        return {'event_id': event['event_id'], 'items': cached[1]}
+
+    def match_store(self):
+        if self.matches is None:
+            raise ApiError(503, "比赛数据尚未生成（先运行 S3_GetMatchResults.py）")
+        return self.matches
+
+    def match_list(self, params):
+        store = self.match_store()
+        team = params.get('team') or None
+        if team and team.isdigit():
+            team = int(team)
+        start, end = params.get('start'), params.get('end')
+        if params.get('date'):
+            start = end = params['date']
+        try:
+            rows = store.query(int_param(params, 'league'), team, params.get('season') or None, start, end)
+        except ValueError as e:
+            raise ApiError(400, f"日期格式错误: {e}")
+        rows, page = paginate(rows, params)
+        return dict(page, items=store.records(rows))
+
+    def match(self, params, match_id):
+        match = self.match_store().get(int(match_id))
+        if match is None:
+            raise ApiError(404, f"比赛不存在: {match_id}")
+        return match
+
+    def health(self, params):
+        return {
+            'areas': len(self.catalogue.areas),
+            'events': len(self.catalogue.events),
+            'matches': len(self.matches) if self.matches is not None else None,
+            'version': [str(part) for part in self.version()]
+        }
+
+
+class ResponseCache:
+    """序列化后的响应（LRU），数据版本变化时整体失效"""
+
+    def __init__(self, size=Config.CACHE_SIZE):
+        self.size = size
+        self.version = None
+        self.entries = OrderedDict()   # 缓存键 -> (状态码, ETag, 响应体)
+        self._lock = threading.Lock()
+
+    def reset(self, version):
+        with self._lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+    def get(self, key, version):
+        self.reset(version)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, entry):
+        with self._lock:
+            if version != self.version:
+                return
+            self.entries[key] = entry
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+class ReadApi:
+    """路由、序列化与缓存（与 HTTP 处理分离，便于直接调用）"""
+    ROUTES = [
+        (re.compile(r'^/areas$'), 'areas'),
+        (re.compile(r'^/events$'), 'events'),
+        (re.compile(r'^/events/(\d+)$'), 'event'),
+        (re.compile(r'^/events/(\d+)/seasons$'), 'seasons'),
+        (re.compile(r'^/matches$'), 'match_list'),
+        (re.compile(r'^/matches/(\d+)$'), 'match'),
+        (re.compile(r'^/health$'), 'health')
+    ]
+
+    def __init__(self, model=None):
+        self.model = model or ReadModel()
+        self.cache = ResponseCache()
+        self.warmed_version = None
+
+    @staticmethod
+    def cache_key(path, query):
+        """查询参数排序后作为缓存键，参数顺序不同的相同查询共用缓存"""
+        return path.rstrip('/') or '/', urlencode(sorted(parse_qsl(query)))
+
+    def render(self, path, params):
+        """执行查询，返回 (状态码, 响应体)"""
+        for pattern, name in ReadApi.ROUTES:
+            matched = pattern.match(path)
+            if matched:
+                try:
+                    data = getattr(self.model, name)(params, *matched.groups())
+                    status = 200
+                except ApiError as e:
+                    status, data = e.status, {'error': e.message}
+                except Exception as e:
+                    logger.exception("查询出错 %s: %s", path, e)
+                    status, data = 500, {'error': str(e)}
+                break
+        else:
+            status, data = 404, {'error': f"未知接口: {path}"}
+        body = json.dumps(data, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8')
+        return status, body
+
+    def handle(self, path, query):
+        """返回 (状态码, ETag, 响应体)，相同数据版本内重复的查询直接使用缓存"""
+        try:
+            version = self.model.refresh()
+        except (DatabaseUnavailableError, RuntimeError, OSError) as e:
+            logger.warning("数据加载失败: %s", e)
+            body = json.dumps({'error': f"数据暂不可用: {e}"}, ensure_ascii=False).encode('utf-8')
+            return 503, None, body
+        if version != self.warmed_version:
+            self.warm(version)
+        key = self.cache_key(path, query)
+        entry = self.cache.get(key, version)
+        if entry is not None:
+            Metrics.inc('api_cache_hits_total')
+            return entry
+        Metrics.inc('api_cache_misses_total')
+        status, body = self.render(key[0], dict(parse_qsl(query)))
+        entry = (status, '"%s"' % hashlib.sha1(body).hexdigest(), body)
+        if status in (200, 404):
+            self.cache.put(key, version, entry)
+        return entry
+
+    def hot_queries(self):
+        """预生成的查询：HOT_QUERIES + 目录中每个区域级别的赛事列表"""
+        levels = sorted(self.model.catalogue.by_level)    # 同 catalogue.levels()，不再触发版本检查
+        return Config.HOT_QUERIES + [f'/events?level={level}' for level in levels]
+
+    def warm(self, version):
+        """数据版本变化后预先生成热点查询的响应（多个请求线程同时发现版本变化时只执行一次）"""
+        # 持有数据模型的锁：预生成期间数据不会被刷新替换
+        with self.model._lock:
+            if version == self.warmed_version:
+                return
+            self.cache.reset(version)
+            start = time.perf_counter()
+            queries = self.hot_queries()
+            for query in queries:
+                path, _, query = query.partition('?')
+                key = self.cache_key(path, query)
+                status, body = self.render(key[0], dict(parse_qsl(query)))
+                self.cache.put(key, version, (status, '"%s"' % hashlib.sha1(body).hexdigest(), body))
+            self.warmed_version = version
+        logger.info("热点查询已预生成: %s 条（%.3f 秒）", len(queries), time.perf_counter() - start)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    api = None   # 由 serve() 设置
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        status, etag, body = self.api.handle(url.path, url.query)
+        if etag and status == 200 and etag in self.headers.get('If-None-Match', ''):
+            status, body = 304, b''
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        Metrics.inc('api_requests_total', status=status)
+        Metrics.observe('api_request_seconds', time.perf_counter() - start, status=status)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(host=Config.HOST, port=Config.PORT, api=None):
+    """创建服务（调用方负责 serve_forever / shutdown）"""
+    handler = type('Handler', (RequestHandler,), {'api': api or ReadApi()})
+    return ApiServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地只读查询服务（区域/赛事/赛季/比赛）')
+    parser.add_argument('--host', default=Config.HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=Config.PORT, help='监听端口')
+    args = parser.parse_args()
+    setup_logging()
+
+    server = serve(args.host, args.port)
+    logger.info("查询服务已启动: http://%s:%s", args.host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        Metrics.report()
+
+
+if __name__ == '__main__':
+    main()
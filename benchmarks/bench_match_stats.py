@@ -0,0 +1,98 @@
+''' 比赛统计基准测试：向量化实现 vs 逐行循环实现
+    - 以 LocalOutputFiles/2024-2025EngLand_Matches.json 为模板，复制出 N 个联赛赛季（不同联赛ID）。
+    - 分别计时 积分榜、大小球、让球 的计算，并校验两种实现结果一致。
+    - “循环”为 MatchStats.loop_summary；“向量化”为端到端耗时（JSON展开为 DataFrame、比分解析、统计），与循环直接可比；
+      “仅计算”为解析一次后重复统计的耗时（已有 DataFrame 或列式存储的调用方）；
+      “自动”为 MatchStats.summary，按比赛数（Config.LOOP_MAX_MATCHES）选择实现。
+    - 端到端时小数据量下逐行循环更快（展开 DataFrame 的固定开销），约 2.5 万场（60~70 个赛季）时两者持平，
+      更多时向量化更快；“自动”在各规模下应不慢于两者中较快的一个。
+    用法：python benchmarks/bench_match_stats.py --seasons 1 10 100
+'''
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, 'utils'))
+from match_stats import MatchStats
+
+TEMPLATE_FILE = os.path.join(BASE_DIR, 'LocalOutputFiles', '2024-2025EngLand_Matches.json')
+
+
+def make_seasons(count):
+    """复制模板JSON，生成 count 个联赛赛季：{赛季标识: JSON字典}"""
+    with open(TEMPLATE_FILE, 'r', encoding='utf-8') as f:
+        template = json.load(f)
+    sources = {}
+    for i in range(count):
+        data = copy.deepcopy(template)
+        for group in data.values():
+            for matches in group.values():
+                for match in matches:
+                    match['比赛ID'] += i * 10_000_000
+                    match['联赛ID'] += i * 1000
+        sources[f"2024-2025#{i}"] = data
+    return sources
+
+
+def vectorized_stats(sources):
+    return MatchStats.summary(sources, vectorized=True)
+
+
+def loop_stats(sources):
+    return MatchStats.summary(sources, vectorized=False)
+
+
+def check_equal(loop, vectorized):
+    loop_points, loop_ou, loop_hc = loop
+    vec_points, vec_ou, vec_hc = vectorized
+    assert loop_points == vec_points, '积分榜结果不一致'
+    assert loop_ou == vec_ou, '大小球结果不一致'
+    assert loop_hc == vec_hc, '让球结果不一致'
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比赛统计基准测试')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[1, 10, 50], help='联赛赛季数量')
+    parser.add_argument('--repeat', type=int, default=3, help='每组重复次数，取最快一次')
+    parser.add_argument('--json', help='结果输出为JSON文件')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'赛季数':>8}{'比赛数':>10}{'循环(秒)':>12}{'向量化(秒)':>14}{'仅计算(秒)':>14}{'自动(秒)':>12}"
+          f"{'加速比(端到端)':>14}{'加速比(仅计算)':>14}{'加速比(自动)':>12}")
+    for count in args.seasons:
+        sources = make_seasons(count)
+        matches = sum(len(m) for data in sources.values() for g in data.values() for m in g.values())
+        loop_time, loop = timed(loop_stats, sources, repeat=args.repeat)
+        vec_time, vectorized = timed(vectorized_stats, sources, repeat=args.repeat)
+        check_equal(loop, vectorized)
+        compute_time, _ = timed(MatchStats.frame_summary, MatchStats.load_json(sources), repeat=args.repeat)
+        auto_time, _ = timed(MatchStats.summary, sources, repeat=args.repeat)
+        results.append({'seasons': count, 'matches': matches, 'loop_seconds': loop_time,
+                        'vectorized_seconds': vec_time, 'compute_seconds': compute_time, 'auto_seconds': auto_time,
+                        'speedup_end_to_end': loop_time / vec_time, 'speedup_compute': loop_time / compute_time,
+                        'speedup_auto': loop_time / auto_time})
+        print(f"{count:>8}{matches:>10}{loop_time:>12.4f}{vec_time:>14.4f}{compute_time:>14.4f}{auto_time:>12.4f}"
+              f"{loop_time / vec_time:>14.2f}{loop_time / compute_time:>14.2f}{loop_time / auto_time:>12.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+''' S1/S2/S3 数据流程基准测试（离线）
+    - 启动本地桩HTTP服务，回放固定数据：leftData.js（按倍数扩充赛事）、合成的 sea{id}.js、
+      由 *_Matches.json 反向生成的比赛JS。
+    - 分阶段计时：请求 -> load_area_data -> extract_area_data -> URL验证(冷/热) -> compare_events_data
+      -> save_events_to_db（需 --db，使用独立的基准数据库）-> export_to_excel，另含赛季/比赛JS解析。
+    - 支持 1~100 倍数据规模，结果输出为JSON（含提交号），可用 --compare 与历史结果对比发现性能回退。
+    - 启动耗时：在子进程中以 python -X importtime 导入各入口脚本，累计导入耗时超过 --import-budget
+      或导入时加载了重型模块（pandas/numpy/openpyxl/aiohttp 等，应在实际使用时才导入）记为失败。
+    用法：
+        python benchmarks/bench_pipeline.py --scale 1 10 --output bench_results.json
+        python benchmarks/bench_pipeline.py --scale 10 --compare bench_results.json
+'''
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEFT_DATA_JS = os.path.join(BASE_DIR, 'QtLocal_SourceJS', 'leftData', 'leftData.js')
+MATCHES_JSON = os.path.join(BASE_DIR, 'LocalOutputFiles', '2024-2025EngLand_Matches.json')
+TEAMS_JSON = os.path.join(BASE_DIR, 'LocalOutputFiles', '2024-2025EngLand_Team.json')
+
+# 赛事ID扩充时的偏移量，保证复制出的赛事ID不重复
+ID_OFFSET = 100000
+
+# 启动耗时检查的入口脚本，以及导入时不应加载的重型模块
+ENTRY_MODULES = ['S1_Areas', 'S2_GetAll_LeagueSeasons', 'S2_GetDataURL_test', 'S3_GetMatchResults']
+HEAVY_MODULES = {'pandas', 'numpy', 'openpyxl', 'xlsxwriter', 'aiohttp'}
+
+
+# ---------- 固定数据生成 ----------
+def scale_left_data(js_content, scale):
+    """将 leftData.js 中每个区域的联赛/杯赛列表扩充为 scale 倍（赛事ID加偏移）"""
+    if scale <= 1:
+        return js_content
+
+    def repeat_events(match):
+        events = match.group(0)
+        copies = [events]
+        for i in range(1, scale):
+            copies.append(re.sub(r'\[(\d+),', lambda m: f"[{int(m.group(1)) + i * ID_OFFSET},", events))
+        return ','.join(copies)
+
+    # 赛事条目形如 [75,'世界杯','世界盃','World Cup',2]
+    return re.sub(r"\[\d+,'[^']*','[^']*','[^']*',\d+\](?:,\[\d+,'[^']*','[^']*','[^']*',\d+\])*",
+                  repeat_events, js_content)
+
+
+def season_js(event_id):
+    """合成 sea{id}.js"""
+    seasons = [f"{year}-{year + 1}" for year in range(2024, 2024 - 5 - event_id % 5, -1)]
+    return "var arrSeason = [" + ','.join(f"'{s}'" for s in seasons) + "];\n"
+
+
+def js_literal(value):
+    return '' if value is None else repr(value)
+
+
+def match_js():
+    """由 *_Matches.json 反向生成比赛JS（arrTeam + jh["R_N"]），字段位置与 S3 Config.MATCH_FIELDS 一致"""
+    with open(MATCHES_JSON, 'r', encoding='utf-8') as f:
+        grouped = json.load(f)
+    with open(TEAMS_JSON, 'r', encoding='utf-8') as f:
+        teams = json.load(f)
+    team_ids = {team['name_zh']: team['qtid'] for team in teams}
+
+    lines = ["var arrTeam = [" + ','.join(
+        '[' + ','.join(js_literal(team[k]) for k in
+                       ('qtid', 'name_zh', 'name_zht', 'name_en', 'extra_info', 'logo', 'status')) + ']'
+        for team in teams) + "];", "var jh = new Array();"]
+    rounds = {}
+    for group in grouped.values():
+        for round_name, matches in group.items():
+            rounds.setdefault(int(round_name.split('_')[1]), []).extend(matches)
+    for round_no in sorted(rounds):
+        rows = []
+        for m in rounds[round_no]:
+            row = [m['比赛ID'], m['联赛ID'], m['状态返回值'], m['比赛时间'], team_ids.get(m['主队']),
+                   team_ids.get(m['客队']), m['全场比分'], m['半场比分'], m['主队排名'], m['客队排名'],
+                   m['让球'], None, m['总进球'], None, m['主队排名显示'], m['客队排名显示']]
+            rows.append('[' + ','.join(js_literal(v) for v in row) + ']')
+        lines.append(f'jh["R_{round_no}"] = [' + ','.join(rows) + '];')
+    return '\n'.join(lines) + '\n'
+
+
+# ---------- 本地桩HTTP服务 ----------
+class StubHandler(BaseHTTPRequestHandler):
+    """路由：
+        /jsData/leftData/leftData.js          扩充后的区域数据
+        /jsData/LeagueSeason/sea{id}.js        合成赛季数据
+        /jsData/matchResult/{season}/s{id}.js  比赛数据
+        /cn/{League|SubLeague|CupMatch}/{id}.html  赛事页面（部分ID返回404以覆盖备用路径逻辑）
+    """
+    protocol_version = 'HTTP/1.1'   # 保持连接，与真实数据源一致（响应均带 Content-Length）
+    disable_nagle_algorithm = True  # 响应头和正文分两次写入，保持连接时避免 Nagle + 延迟确认的约40ms等待
+    left_data = ''
+    match_data = ''
+    page = '<html><head><title>league</title></head><body>' + 'x' * 2000 + '</body></html>'
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, content_type='application/javascript; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.endswith('leftData.js'):
+            return self.send_body(200, self.left_data)
+        match = re.search(r'/LeagueSeason/sea(\d+)\.js$', path)
+        if match:
+            event_id = int(match.group(1))
+            if event_id % 11 == 0:
+                return self.send_body(404, '<title>404</title>')
+            return self.send_body(200, season_js(event_id))
+        if '/matchResult/' in path:
+            return self.send_body(200, self.match_data)
+        match = re.search(r'/cn/(League|SubLeague|CupMatch)/(\d+)\.html$', path)
+        if match:
+            kind, event_id = match.group(1), int(match.group(2))
+            # 约 1/7 的联赛首选路径失效，走备用路径
+            if kind == 'League' and event_id % 7 == 0:
+                return self.send_body(404, '<title>404</title>', 'text/html')
+            return self.send_body(200, self.page, 'text/html')
+        return self.send_body(404, '<title>404</title>', 'text/html')
+
+
+class StubServer(ThreadingHTTPServer):
+    # 默认监听队列只有5，并发请求时连接被丢弃会导致约1秒的SYN重传等待
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_stub_server():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def install_global_cfg(base_url):
+    """将 Global_cfg 指向桩服务（需在导入 S1/S2/S3 之前调用）"""
+    module = types.ModuleType('Global_cfg')
+    module.SOURCE_URL = base_url
+    module.AREAS_URL = base_url + 'jsData/leftData/leftData.js'
+    sys.modules['Global_cfg'] = module
+
+
+# ---------- 基准数据库 ----------
+BENCH_TABLES = [
+    """CREATE TABLE IF NOT EXISTS areas (
+        level INT PRIMARY KEY,
+        name_zh VARCHAR(50) NOT NULL,
+        name_zht VARCHAR(50) NOT NULL,
+        name_en VARCHAR(50) NOT NULL,
+        sys_update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS events (
+        event_id INT PRIMARY KEY,
+        levelid INT NOT NULL,
+        name_zh VARCHAR(100) NOT NULL,
+        name_zht VARCHAR(100) NOT NULL,
+        name_en VARCHAR(100) NOT NULL,
+        event_type VARCHAR(10) NOT NULL,
+        type_code INT NOT NULL,
+        access_url VARCHAR(255),
+        url_status TINYINT,
+        sys_update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"""
+]
+
+
+def prepare_bench_db(db_name):
+    """创建独立的基准数据库并清空表，DBUtils 之后的连接都指向该库"""
+    import mysql.connector
+    from db_config import DB_CONFIG
+
+    config = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
+    connection = mysql.connector.connect(**config)
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` DEFAULT CHARSET utf8mb4")
+    cursor.execute(f"USE `{db_name}`")
+    for ddl in BENCH_TABLES:
+        cursor.execute(ddl)
+    cursor.execute("TRUNCATE TABLE events")
+    cursor.execute("TRUNCATE TABLE areas")
+    connection.commit()
+    connection.close()
+    DB_CONFIG['database'] = db_name
+
+
+# ---------- 计时 ----------
+class StageTimer:
+    def __init__(self, scale, quiet=True):
+        self.scale = scale
+        self.quiet = quiet
+        self.results = []
+
+    @contextlib.contextmanager
+    def stage(self, name, items=None):
+        record = {'scale': self.scale, 'stage': name, 'items': items, 'seconds': None, 'status': 'ok'}
+        devnull = open(os.devnull, 'w', encoding='utf-8') if self.quiet else None
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(devnull) if devnull else contextlib.nullcontext():
+                yield record
+        except Exception as e:
+            record['status'] = f"error: {e}"
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if devnull:
+                devnull.close()
+            self.results.append(record)
+            print(f"  {name:<22}{record['seconds']:>10.4f}s  items={record['items']}  {record['status']}")
+
+    def skip(self, name, reason):
+        self.results.append({'scale': self.scale, 'stage': name, 'items': None,
+                             'seconds': None, 'status': f"skipped: {reason}"})
+        print(f"  {name:<22}{'-':>10}   {reason}")
+
+
+def counter_value(metrics, name):
+    return sum(c['value'] for c in metrics.snapshot()['counters'] if c['name'] == name)
+
+
+def verify_sample(S1, area_data, limit):
+    """验证前 limit 个赛事的URL（跨区域累计，最后一个区域截断到正好 limit 个），返回 (赛事数据, 验证数)"""
+    events_data = []
+    remaining = limit
+    for areas in area_data:
+        sample = []
+        for area in areas:
+            if remaining <= 0:
+                break
+            leagues = area['leagues'][:remaining]
+            cups = area['cups'][:remaining - len(leagues)]
+            sample.append(dict(area, leagues=leagues, cups=cups))
+            remaining -= len(leagues) + len(cups)
+        if sample:
+            events_data.append(S1.DataFetcher.get_events_data(sample))
+    return events_data, limit - remaining
+
+
+def run_scale(scale, base_url, args, modules):
+    S1, S2, S3 = modules
+    timer = StageTimer(scale, quiet=not args.verbose)
+    print(f"\n=== 规模 x{scale} ===")
+
+    with open(LEFT_DATA_JS, 'r', encoding='utf-8') as f:
+        StubHandler.left_data = scale_left_data(f.read(), scale)
+
+    with timer.stage('fetch') as r:
+        js_content = S1.DataFetcher.get_js_content(S1.Config.AREAS_URL)
+        r['items'] = len(js_content)
+
+    with timer.stage('load_area_data') as r:
+        all_arrays = S1.DataFetcher.load_area_data(js_content)
+        area_names = S1.DataFetcher.get_area_names(all_arrays)
+        r['items'] = len(all_arrays)
+
+    with timer.stage('extract_area_data') as r:
+        area_data = [S1.DataFetcher.extract_area_data(array) for array in all_arrays]
+        r['items'] = sum(len(a['leagues']) + len(a['cups']) for areas in area_data for a in areas)
+
+    # URL验证：逐个请求，数量按 --verify-limit 截断，避免大规模时耗时过长
+    # 首次（冷）验证从空的路径记录开始；再次（热）验证复用学到的路径，失效路径请求数应接近0
+    path_dir = tempfile.TemporaryDirectory()
+    S1.DataFetcher._resolver = S1.UrlPathResolver(os.path.join(path_dir.name, 'url_paths.json'))
+    S1.DeadUrlCache._instance = S1.DeadUrlCache(os.path.join(path_dir.name, 'dead_urls.json'))
+    events_data = []
+    for stage in ('verify_urls', 'verify_urls_warm'):
+        S1.DataFetcher._url_cache.clear()
+        misses = counter_value(S1.Metrics, 'url_path_misses_total')
+        with timer.stage(stage) as r:
+            events_data, r['items'] = verify_sample(S1, area_data, args.verify_limit)
+        r['path_misses'] = counter_value(S1.Metrics, 'url_path_misses_total') - misses
+        print(f"  {'':<22}失效路径请求: {r['path_misses']}")
+    path_dir.cleanup()
+
+    # 其余赛事不发请求，直接按首选路径生成数据，用于后续比较/入库/导出
+    full_events = []
+    for i, areas in enumerate(area_data):
+        rows = []
+        for area in areas:
+            for kind, items in (('联赛', area['leagues']), ('杯赛', area['cups'])):
+                for event in items:
+                    rows.append({
+                        '区域': area['area']['name_zh'], '区域级别': i, '赛事ID': event['id'],
+                        '赛事简休名': event['name_zh'], '赛事繁体名': event['name_zht'],
+                        '赛事英文名': event['name_en'], '赛事类型': kind, '类型编码': event['type'],
+                        '访问链接': S1.DataFetcher.generate_event_url(kind, event['id'], event['type']),
+                        'URL有效': True
+                    })
+        full_events.append((area_names[i][0], rows))
+    all_events = [row for _, rows in full_events for row in rows]
+
+    with timer.stage('compare_events_data', len(all_events)):
+        # 模拟数据库现有数据：约 5% 的赛事名称发生变化
+        existing = [{
+            'event_id': e['赛事ID'], 'name_zh': e['赛事简休名'] + ('*' if e['赛事ID'] % 20 == 0 else ''),
+            'name_zht': e['赛事繁体名'], 'name_en': e['赛事英文名'], 'event_type': e['赛事类型'],
+            'type_code': e['类型编码'], 'levelid': e['区域级别'], 'access_url': e['访问链接'], 'url_status': 1
+        } for e in all_events]
+        S1.DBManager.compare_events_data(all_events, existing)
+
+    if args.db:
+        try:
+            prepare_bench_db(args.db_name)
+        except Exception as e:
+            timer.skip('save_areas_to_db', f"数据库不可用: {e}")
+            timer.skip('save_events_to_db', f"数据库不可用: {e}")
+        else:
+            with timer.stage('save_areas_to_db', len(area_names)):
+                S1.DBManager.save_areas_to_db(area_names)
+            with timer.stage('save_events_to_db', len(all_events)):
+                for _, rows in full_events:
+                    S1.DBManager.save_events_to_db(rows)
+    else:
+        timer.skip('save_events_to_db', '未指定 --db')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with timer.stage('export_to_excel', len(all_events)):
+            S1.ExcelExporter.export_to_excel(full_events, os.path.join(tmp_dir, 'events.xlsx'))
+
+    season_fetcher = S2.LeagueSeasonFetcher()
+    event_ids = [e['赛事ID'] for e in all_events][:args.verify_limit]
+    with timer.stage('season_parse', len(event_ids)):
+        for event_id in event_ids:
+            season_fetcher.extract_seasons(season_js(event_id))
+
+    with timer.stage('match_parse') as r:
+        content = StubHandler.match_data
+        parsed = 0
+        for _ in range(scale):
+            S3.MatchResultFetcher.extract_teams(content)
+            rounds = S3.MatchResultFetcher.extract_rounds(content)
+            parsed += sum(len([S3.MatchResultFetcher.convert_match(row) for row in rows])
+                          for rows in rounds.values())
+        r['items'] = parsed
+
+    return timer.results
+
+
+# ---------- 启动耗时 ----------
+def measure_import(module, base_url, budget):
+    """在子进程中用 -X importtime 导入入口脚本，返回结果记录（seconds 为累计导入耗时）"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, 'Global_cfg.py'), 'w', encoding='utf-8') as f:
+            f.write(f"SOURCE_URL = {base_url!r}\nAREAS_URL = {base_url + 'jsData/leftData/leftData.js'!r}\n")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            [tmp_dir, BASE_DIR, os.path.join(BASE_DIR, 'sql'), os.path.join(BASE_DIR, 'utils')]))
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              cwd=tmp_dir, env=env, capture_output=True, text=True)
+
+    record = {'scale': 0, 'stage': f'import_{module}', 'items': None, 'seconds': None, 'status': 'ok'}
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$', line)
+        if not match:
+            continue
+        name = match.group(3)
+        loaded.add(name.split('.')[0])
+        if name == module:
+            record['seconds'] = int(match.group(1)) / 1e6
+    heavy = sorted(loaded & HEAVY_MODULES)
+    record['items'] = len(loaded)
+    if proc.returncode != 0:
+        record['status'] = f"error: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}"
+    elif heavy:
+        record['status'] = f"fail: 导入时加载了 {', '.join(heavy)}"
+    elif record['seconds'] is not None and record['seconds'] > budget:
+        record['status'] = f"fail: 超出启动预算 {budget:.3f}s"
+    seconds = '-' if record['seconds'] is None else f"{record['seconds']:.4f}s"
+    print(f"  {record['stage']:<34}{seconds:>10}  modules={record['items']}  {record['status']}")
+    return record
+
+
+def run_import_budget(base_url, budget):
+    print(f"\n=== 启动耗时（预算 {budget:.3f}s）===")
+    return [measure_import(module, base_url, budget) for module in ENTRY_MODULES]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline_file, threshold):
+    """与历史结果对比，耗时增长超过 threshold 的阶段视为回退"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['scale'], r['stage']): r['seconds'] for r in baseline['results'] if r['seconds']}
+    regressions = []
+    print(f"\n=== 与 {baseline_file}（{baseline.get('commit')}）对比 ===")
+    for r in current:
+        old = previous.get((r['scale'], r['stage']))
+        if not old or not r['seconds']:
+            continue
+        ratio = r['seconds'] / old
+        flag = '  <-- 回退' if ratio > 1 + threshold else ''
+        print(f"  x{r['scale']:<5}{r['stage']:<22}{old:>10.4f}s -> {r['seconds']:>10.4f}s  {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='S1/S2/S3 数据流程离线基准测试')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10], help='数据规模倍数')
+    parser.add_argument('--verify-limit', type=int, default=200, help='URL验证阶段最多请求的赛事数')
+    parser.add_argument('--db', action='store_true', help='包含数据库阶段（使用独立的基准数据库）')
+    parser.add_argument('--db-name', default='qt_bench', help='基准数据库名，会被清空')
+    parser.add_argument('--output', help='结果输出JSON文件')
+    parser.add_argument('--compare', help='与历史结果JSON对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='回退判定阈值（耗时增长比例）')
+    parser.add_argument('--verbose', action='store_true', help='显示各阶段原有的控制台输出')
+    parser.add_argument('--import-budget', type=float, default=0.2, help='入口脚本导入耗时预算（秒）')
+    parser.add_argument('--skip-import', action='store_true', help='跳过启动耗时检查')
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    install_global_cfg(base_url)
+    StubHandler.match_data = match_js()
+
+    sys.path.insert(0, BASE_DIR)
+    sys.path.insert(0, os.path.join(BASE_DIR, 'sql'))
+    import S1_Areas
+    import S2_GetAll_LeagueSeasons
+    import S3_GetMatchResults
+    from metrics import Metrics
+    from http_client import HttpClient
+    HttpClient.configure(interval=0)    # 本地桩服务不需要限速
+    modules = (S1_Areas, S2_GetAll_LeagueSeasons, S3_GetMatchResults)
+
+    results = [] if args.skip_import else run_import_budget(base_url, args.import_budget)
+    try:
+        for scale in args.scale:
+            results.extend(run_scale(scale, base_url, args, modules))
+    finally:
+        server.shutdown()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'verify_limit': args.verify_limit,
+        'results': results,
+        'metrics': Metrics.snapshot()
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"\n结果已保存到: {args.output}")
+
+    over_budget = [r for r in results if r['stage'].startswith('import_') and r['status'] != 'ok']
+    regressions = compare_results(results, args.compare, args.threshold) if args.compare else []
+    if regressions or over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
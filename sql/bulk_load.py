@@ -0,0 +1,210 @@
+''' 批量导入（空库首次导入）
+    - 数据先写入临时TSV文件，再用 LOAD DATA LOCAL INFILE 一次装载（装入暂存表后 upsert，已有行原地更新）；
+      服务器或驱动未开启 local_infile 时退回多行 INSERT（executemany 按批合并为一条语句）。
+    - 父级ID通过暂存表 + INSERT ... SELECT JOIN 一次解析，不再逐行查询。
+    - 同一个 BulkLoader 内的操作使用同一个连接、同一个事务，结束时统一提交。
+    用法：
+        with BulkLoader() as loader:
+            loader.load('areas', ['level', 'name_zh', 'name_zht', 'name_en'], rows,
+                        set_sql='sys_update_time = NOW()')
+'''
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import mysql.connector
+from db_utils import DBUtils, DatabaseUnavailableError
+
+# 运行指标
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils'))
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# 服务器/客户端禁止 LOAD DATA LOCAL 时的错误码
+LOCAL_INFILE_ERRNOS = {1148, 2068, 3948}
+
+
+class Config:
+    """批量导入配置
+    属性说明：
+        BATCH_SIZE: 退回多行 INSERT 时每条语句的行数
+        USE_LOCAL_INFILE: 是否尝试 LOAD DATA LOCAL INFILE
+    """
+    BATCH_SIZE = 1000
+    USE_LOCAL_INFILE = True
+
+
+class BulkLoader:
+    def __init__(self, use_local_infile=None):
+        self.use_local_infile = Config.USE_LOCAL_INFILE if use_local_infile is None else use_local_infile
+        self.connection = None
+
+    def __enter__(self):
+        if not DBUtils.breaker.allow():
+            raise DatabaseUnavailableError("数据库不可用（熔断中），已跳过批量导入")
+        self.connection = DBUtils.get_connection(allow_local_infile=self.use_local_infile)
+        self.connection.autocommit = False
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
+            self.connection = None
+        return False
+
+    # ---------- 装载 ----------
+    @staticmethod
+    def _tsv_value(value):
+        """转换为 LOAD DATA 默认格式：\\N 表示 NULL，转义反斜杠、制表符、换行"""
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            value = int(value)
+        return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+    def load(self, table, columns, rows, set_sql=None, update=True):
+        """批量写入数据
+        Args:
+            table: 表名
+            columns: 列名列表，与每行数据顺序一致
+            rows: 行数据（元组或列表）
+            set_sql: 额外赋值（逗号分隔的简单赋值），如 'sys_update_time = NOW()'
+            update: 主键/唯一键冲突时更新已有行（ON DUPLICATE KEY UPDATE，不删除行，外键不受影响）；
+                    False 时跳过冲突行
+        Returns:
+            int: 写入的行数
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        method = 'insert'
+        if self.use_local_infile:
+            try:
+                if update:
+                    # LOAD DATA 只能 REPLACE(先删后插)，因此先装入暂存表再 upsert
+                    stage = self._create_stage(table, columns)
+                    self._load_infile(stage, columns, rows)
+                    self._upsert_from(table, columns, stage, columns, set_sql)
+                    self.execute(f"DROP TEMPORARY TABLE {stage}")
+                else:
+                    self._load_infile(table, columns, rows, set_sql)
+                method = 'infile'
+            except mysql.connector.Error as e:
+                if e.errno not in LOCAL_INFILE_ERRNOS:
+                    raise
+                logger.info("服务器未开启 LOAD DATA LOCAL（%s），改用多行INSERT", e.errno)
+                self.use_local_infile = False
+        if method == 'insert':
+            self._insert_many(table, columns, rows, set_sql, update)
+        Metrics.inc('db_rows_total', len(rows), op='bulk')
+        Metrics.observe('db_bulk_seconds', time.perf_counter() - start, table=table, method=method)
+        logger.info("批量写入 %s: %s 行（%s）", table, len(rows), method)
+        return len(rows)
+
+    @staticmethod
+    def _split_set_sql(set_sql):
+        """'a = NOW(), b = 1' -> (['a', 'b'], ['NOW()', '1'])"""
+        set_columns = []
+        set_values = []
+        if set_sql:
+            for assignment in set_sql.split(','):
+                column, value = assignment.split('=', 1)
+                set_columns.append(column.strip())
+                set_values.append(value.strip())
+        return set_columns, set_values
+
+    @staticmethod
+    def _update_clause(columns):
+        return " ON DUPLICATE KEY UPDATE " + ', '.join(f"{column} = VALUES({column})" for column in columns)
+
+    def _create_stage(self, table, columns, key_column=None):
+        """创建与目标表列类型一致的临时暂存表（临时表的建删不会提交当前事务）"""
+        stage = f"{table}_stage"
+        select = ', '.join(columns)
+        if key_column:
+            select += f", CAST(NULL AS SIGNED) AS {key_column}"
+        self.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+        self.execute(f"CREATE TEMPORARY TABLE {stage} SELECT {select} FROM {table} LIMIT 0")
+        return stage
+
+    def _load_infile(self, table, columns, rows, set_sql=None):
+        fd, path = tempfile.mkstemp(suffix='.tsv', prefix=f'{table}_')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for row in rows:
+                    f.write('\t'.join(BulkLoader._tsv_value(v) for v in row))
+                    f.write('\n')
+            sql = (f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table} "
+                   f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                   f"({', '.join(columns)})")
+            if set_sql:
+                sql += f" SET {set_sql}"
+            self.execute(sql, (path,))
+        finally:
+            os.remove(path)
+
+    def _upsert_from(self, table, columns, stage, select_columns, set_sql=None, join_sql=''):
+        """INSERT ... SELECT 暂存表 ... ON DUPLICATE KEY UPDATE"""
+        set_columns, set_values = BulkLoader._split_set_sql(set_sql)
+        target_columns = list(columns) + set_columns
+        sql = (f"INSERT INTO {table} ({', '.join(target_columns)}) "
+               f"SELECT {', '.join(list(select_columns) + set_values)} FROM {stage} s {join_sql}"
+               + BulkLoader._update_clause(target_columns))
+        return self.execute(sql)
+
+    def _insert_many(self, table, columns, rows, set_sql, update):
+        set_columns, set_values = BulkLoader._split_set_sql(set_sql)
+        placeholders = ', '.join(['%s'] * len(columns) + set_values)
+        sql = (f"INSERT {'' if update else 'IGNORE '}INTO {table} ({', '.join(list(columns) + set_columns)}) "
+               f"VALUES ({placeholders})")
+        if update:
+            sql += BulkLoader._update_clause(list(columns) + set_columns)
+        cursor = self.connection.cursor()
+        try:
+            for i in range(0, len(rows), Config.BATCH_SIZE):
+                cursor.executemany(sql, rows[i:i + Config.BATCH_SIZE])
+        finally:
+            cursor.close()
+
+    def execute(self, sql, params=None):
+        """在同一事务中执行语句，返回影响行数"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql, params or ())
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    # ---------- 父级ID解析 ----------
+    def load_with_parent(self, table, columns, rows, parent_table, parent_key, parent_column,
+                         key_column='parent_key', parent_id='id'):
+        """写入子表并一次性解析父级ID（冲突时更新）
+        Args:
+            table: 子表，如 'competition'
+            columns: 子表列名（不含父级ID列）
+            rows: 行数据，每行最后一个值为父表的业务键（如原始区域ID）
+            parent_table / parent_key: 父表及其业务键列，如 'area' / 'area_id'
+            parent_column: 子表中保存父级ID的列，如 'area_id'
+            parent_id: 父表主键列
+        流程：批量装入临时暂存表 -> INSERT ... SELECT JOIN 父表 -> 删除暂存表
+        Returns:
+            int: 解析到父级并写入的行数（rowcount，更新的行计为2）
+        """
+        stage = self._create_stage(table, columns, key_column)
+        self.load(stage, list(columns) + [key_column], rows, update=False)
+        count = self._upsert_from(
+            table, list(columns) + [parent_column], stage,
+            [f"s.{column}" for column in columns] + [f"p.{parent_id}"],
+            join_sql=f"JOIN {parent_table} p ON p.{parent_key} = s.{key_column}")
+        self.execute(f"DROP TEMPORARY TABLE {stage}")
+        return count
@@ -0,0 +1,176 @@
+''' 区域/赛事目录缓存（进程内，读穿透）
+    - 首次查询时一次读入 areas、events 两表，在内存中按 赛事ID、区域级别、类型编码 建索引，之后的查询不访问数据库。
+    - 版本：两表的 CHECKSUM TABLE（按内容计算，任何写入都会改变；两表只有几百~几千行，代价很小）。
+      距上次检查超过 MAX_AGE 秒时比较版本，变化时（其他进程写入、删除）整体重新加载。
+      不使用 记录数 + MAX(sys_update_time)：时间只精确到秒，同一秒内的原地更新无法发现。
+    - 本进程写入区域/赛事后调用 CatalogueCache.invalidate()（S1 的 DBManager 保存路径已调用），下次查询时重新加载。
+    - 返回的行为缓存中的字典，调用方只读、不修改。
+    - 数据库错误（断路器打开、连接/查询失败）在加载时统一转换为 RuntimeError；已加载过时重新加载失败继续使用旧数据。
+    用法：
+        catalogue = CatalogueCache.get()
+        catalogue.event(36)                      # {'event_id', 'levelid', 'name_zh', ..., 'area_name'}
+        catalogue.events_by_level(1)             # 按 event_id 排序
+        catalogue.events_by_type(1)
+        catalogue.levels()
+'''
+import logging
+import os
+import sys
+import threading
+import time
+
+import mysql.connector
+
+from db_utils import DBUtils, DatabaseUnavailableError
+
+# 运行指标
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils'))
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """目录缓存配置
+    属性说明：
+        MAX_AGE: 两次版本检查的最小间隔(秒)，期间查询直接使用内存数据；0 表示每次查询都检查版本
+    """
+    MAX_AGE = float(os.environ.get('QT_CATALOGUE_MAX_AGE', 30))
+
+
+VERSION_SQL = "CHECKSUM TABLE areas, events"
+AREAS_SQL = "SELECT level, name_zh, name_zht, name_en, sys_update_time FROM areas ORDER BY level"
+EVENTS_SQL = """
+    SELECT event_id, levelid, name_zh, name_zht, name_en,
+           event_type, type_code, access_url, url_status, sys_update_time
+    FROM events
+    ORDER BY event_id
+"""
+
+
+class CatalogueCache:
+    """区域、赛事目录（进程内单例）"""
+    _instance = None
+
+    def __init__(self, max_age=None):
+        self.max_age = Config.MAX_AGE if max_age is None else max_age
+        self.areas = {}          # 区域级别 -> 区域
+        self.events = {}         # 赛事ID -> 赛事
+        self.by_level = {}       # 区域级别 -> [赛事]
+        self.by_type = {}        # 类型编码 -> [赛事]
+        self.version = None
+        self.checked_at = None   # 上次加载/检查版本的时间(monotonic)，None 表示需要重新加载
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        """本进程写入区域/赛事后调用，下次查询时重新加载"""
+        if cls._instance is not None:
+            cls._instance.checked_at = None
+
+    # ---------- 加载 ----------
+    @staticmethod
+    def query_version():
+        rows = DBUtils.execute_query(VERSION_SQL)
+        if not rows:
+            return None
+        return tuple((row['Table'], row['Checksum']) for row in rows)
+
+    def load(self):
+        """读入两表并重建索引（先查版本，加载期间的写入会在下次检查时发现）
+        Raises:
+            RuntimeError: 数据库不可用或读取失败
+        """
+        start = time.perf_counter()
+        try:
+            version = self.query_version()
+            areas = DBUtils.execute_query(AREAS_SQL)
+            if areas is None or version is None:
+                raise RuntimeError("目录缓存加载失败：无法读取区域数据")
+            areas = {row['level']: row for row in areas}
+            events, by_level, by_type = {}, {}, {}
+            for row in DBUtils.stream_query(EVENTS_SQL, named=True):
+                event = row.as_dict()
+                area = areas.get(event['levelid'])
+                if area is None:
+                    continue    # 与 S2 的 JOIN 一致：没有对应区域的赛事不计入
+                event['area_name'] = area['name_zh']
+                events[event['event_id']] = event
+                by_level.setdefault(event['levelid'], []).append(event)
+                by_type.setdefault(event['type_code'], []).append(event)
+        except (DatabaseUnavailableError, mysql.connector.Error) as e:
+            raise RuntimeError(f"目录缓存加载失败: {e}") from e
+        self.areas, self.events, self.by_level, self.by_type = areas, events, by_level, by_type
+        self.version = version
+        self.checked_at = time.monotonic()
+        Metrics.inc('catalogue_cache_loads_total')
+        logger.info("目录缓存已加载：区域 %s 条，赛事 %s 条（%.3f 秒）",
+                    len(areas), len(events), time.perf_counter() - start)
+
+    def refresh(self):
+        """缓存失效或超过 MAX_AGE 时检查版本，有变化时重新加载"""
+        if self.checked_at is not None and time.monotonic() - self.checked_at < self.max_age:
+            return
+        with self._lock:
+            if self.checked_at is None:
+                try:
+                    self.load()
+                except RuntimeError as e:
+                    if self.version is None:
+                        raise           # 从未加载成功，没有可用的数据
+                    logger.warning("%s，继续使用缓存数据", e)
+                    self.checked_at = time.monotonic()
+                return
+            if time.monotonic() - self.checked_at < self.max_age:
+                return
+            Metrics.inc('catalogue_cache_checks_total')
+            try:
+                version = self.query_version()
+            except DatabaseUnavailableError:
+                version = None
+            if version is None:
+                # 数据库暂时不可用时继续使用已加载的数据，下个周期再检查
+                logger.warning("目录版本检查失败，继续使用缓存数据")
+                self.checked_at = time.monotonic()
+            elif version != self.version:
+                logger.info("目录数据有变化，重新加载")
+                try:
+                    self.load()
+                except RuntimeError as e:
+                    logger.warning("%s，继续使用缓存数据", e)
+                    self.checked_at = time.monotonic()
+            else:
+                self.checked_at = time.monotonic()
+
+    # ---------- 查询 ----------
+    def event(self, event_id):
+        """按赛事ID查询，不存在时返回 None"""
+        self.refresh()
+        return self.events.get(int(event_id))
+
+    def events_by_level(self, level):
+        self.refresh()
+        return self.by_level.get(int(level), [])
+
+    def events_by_type(self, type_code):
+        self.refresh()
+        return self.by_type.get(int(type_code), [])
+
+    def all_events(self):
+        self.refresh()
+        return list(self.events.values())
+
+    def area(self, level):
+        self.refresh()
+        return self.areas.get(int(level))
+
+    def levels(self):
+        """有赛事的区域级别（升序）"""
+        self.refresh()
+        return sorted(self.by_level)
@@ -5,4 +5,13 @@ DB_CONFIG = {
     'password': 'root',
     'database': 'test',
     'charset': 'utf8mb4'
-}
\ No newline at end of file
+}
+
+# 数据库重试与熔断配置
+RETRY_CONFIG = {
+    'max_retries': 3,           # 瞬时错误最多重试次数
+    'base_delay': 0.2,          # 首次重试等待(秒)，之后指数增长并加随机抖动
+    'max_delay': 5.0,           # 单次等待上限(秒)
+    'breaker_threshold': 5,     # 连续连接失败次数达到后打开熔断器
+    'breaker_cooldown': 30.0,   # 熔断器打开后多久允许试探请求(秒)
+}
@@ -1,99 +1,357 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
 import mysql.connector
-from db_config import DB_CONFIG
+from db_config import DB_CONFIG, RETRY_CONFIG
+
+# 运行指标
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils'))
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# 每个线程一个长连接及其预处理语句缓存（SQL文本 -> 预处理游标）
+_session = threading.local()
+
+# 瞬时错误：锁等待超时、死锁、连接断开/无法连接、连接数已满、服务器正在关闭
+TRANSIENT_ERRNOS = {1205, 1213, 2006, 2013, 2003, 2055, 1040, 1053}
+# 连接类错误：计入熔断器
+CONNECTION_ERRNOS = {2006, 2013, 2003, 2055, 1040, 1053}
+
+
+class DatabaseUnavailableError(Exception):
+    """熔断器打开期间拒绝数据库操作（数据库不可用）"""
+
+
+class CircuitBreaker:
+    """熔断器
+    - 连续 threshold 次连接失败后打开，cooldown 秒内所有操作直接失败，不再连接数据库。
+    - 冷却结束后放行一次试探请求：成功则关闭，失败则重新计时。
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.opened_at = time.monotonic()   # 半开：放行一次，其余继续等待冷却
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.error("数据库连续 %s 次连接失败，熔断 %s 秒", self.failures, self.cooldown)
+                    Metrics.inc('db_circuit_open_total')
+                self.opened_at = time.monotonic()
+
+
+class Row(tuple):
+    """元组行，支持按列名访问，不为每行构造字典"""
+    __slots__ = ()
+    _index = {}
+
+    @classmethod
+    def bind(cls, columns):
+        """按游标列名生成行类型"""
+        return type('Row', (cls,), {'__slots__': (), '_index': {name: i for i, name in enumerate(columns)}})
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._index[key]
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def as_dict(self):
+        return dict(zip(self._index, self))
+
 
 class DBUtils:
+    breaker = CircuitBreaker(RETRY_CONFIG['breaker_threshold'], RETRY_CONFIG['breaker_cooldown'])
+
     @staticmethod
-    def get_connection():
-        """获取数据库连接"""
+    def get_connection(**options):
+        """获取数据库连接（options 透传给 mysql.connector.connect）"""
         try:
             connection = mysql.connector.connect(
                 host=DB_CONFIG['host'],
                 user=DB_CONFIG['user'],
                 password=DB_CONFIG['password'],
                 database=DB_CONFIG['database'],
-                charset=DB_CONFIG['charset']
+                charset=DB_CONFIG['charset'],
+                **options
             )
             return connection
         except mysql.connector.Error as e:
-            print(f"数据库连接失败: {str(e)}")
+            logger.warning("数据库连接失败: %s", e)
             raise
 
     @staticmethod
-    def execute_query(sql, params=None):
-        """执行查询操作"""
-        connection = None
-        try:
+    def session():
+        """当前线程的长连接（预处理语句缓存在连接上，需复用连接）"""
+        connection = getattr(_session, 'connection', None)
+        if connection is None:
             connection = DBUtils.get_connection()
+            _session.connection = connection
+            _session.statements = {}
+        return connection
+
+    @staticmethod
+    def close_session():
+        """关闭当前线程的长连接，并丢弃其预处理语句"""
+        connection = getattr(_session, 'connection', None)
+        _session.connection = None
+        _session.statements = {}
+        if connection is not None:
+            try:
+                connection.close()
+            except mysql.connector.Error:
+                pass
+
+    @staticmethod
+    def prepared_cursor(sql):
+        """按SQL文本获取当前线程长连接上的预处理游标，首次使用时在服务端预处理
+        Returns:
+            (游标, SQL)：SQL为缓存中的同一字符串对象，游标据此判断无需重新预处理
+        """
+        statement = _session.statements.get(sql)
+        if statement is None:
+            statement = _session.statements[sql] = (_session.connection.cursor(prepared=True), sql)
+            Metrics.inc('db_prepared_total')
+        return statement
+
+    @staticmethod
+    def is_transient(error):
+        """是否为可重试的瞬时错误"""
+        return getattr(error, 'errno', None) in TRANSIENT_ERRNOS
+
+    @staticmethod
+    def retry_delay(attempt):
+        """第 attempt 次重试前的等待时间：指数退避 + 随机抖动"""
+        delay = min(RETRY_CONFIG['max_delay'], RETRY_CONFIG['base_delay'] * 2 ** attempt)
+        return delay * random.uniform(0.5, 1)
+
+    @staticmethod
+    def run(op, work, keep_open=False, persistent=False, **options):
+        """在新连接上执行 work(connection)
+        - keep_open=True 时成功后不关闭连接，由调用方负责关闭（用于流式读取）；
+        - persistent=True 时使用当前线程的长连接，连接类错误后重建；
+        - 瞬时错误（死锁、锁等待超时、连接断开）回滚后按指数退避重试，最多 max_retries 次；
+        - 其他错误直接抛出；
+        - 连接类错误计入熔断器，熔断期间抛出 DatabaseUnavailableError。
+        注意：重试会重新执行整条语句，只适用于幂等操作（查询、ON DUPLICATE KEY UPDATE）。
+        """
+        attempt = 0
+        while True:
+            if not DBUtils.breaker.allow():
+                Metrics.inc('db_rejected_total', op=op)
+                raise DatabaseUnavailableError("数据库不可用（熔断中），已跳过本次操作")
+            connection = None
+            close = True
+            try:
+                connection = DBUtils.session() if persistent else DBUtils.get_connection(**options)
+                result = work(connection)
+                DBUtils.breaker.record_success()
+                close = not (keep_open or persistent)
+                return result
+            except mysql.connector.Error as e:
+                if e.errno in CONNECTION_ERRNOS:
+                    DBUtils.breaker.record_failure()
+                if persistent:
+                    close = False
+                    if e.errno in CONNECTION_ERRNOS:
+                        DBUtils.close_session()
+                        connection = None
+                if connection:
+                    try:
+                        connection.rollback()
+                    except mysql.connector.Error:
+                        pass
+                if not DBUtils.is_transient(e) or attempt >= RETRY_CONFIG['max_retries']:
+                    raise
+                delay = DBUtils.retry_delay(attempt)
+                attempt += 1
+                Metrics.inc('db_retries_total', op=op, errno=e.errno)
+                logger.warning("数据库瞬时错误(%s)，%.2f秒后第%s次重试: %s", e.errno, delay, attempt, e)
+                time.sleep(delay)
+            finally:
+                if connection and close:
+                    if persistent:
+                        DBUtils.close_session()
+                    else:
+                        try:
+                            connection.close()
+                        except mysql.connector.Error:
+                            pass
+
+    @staticmethod
+    def execute_query(sql, params=None):
+        """执行查询操作，查询失败返回 None（瞬时错误已重试）
+        Raises:
+            DatabaseUnavailableError: 熔断器打开（数据库不可用）时直接抛出，不返回 None，
+                便于调用方区分“查询失败”与“数据库整体不可用”（常驻模式据此跳过本周期）
+        """
+        def work(connection):
             cursor = connection.cursor(dictionary=True)  # 使用字典游标
-            
-            if params:
-                cursor.execute(sql, params)
-            else:
-                cursor.execute(sql)
-            
-            result = cursor.fetchall()
+            try:
+                if params:
+                    cursor.execute(sql, params)
+                else:
+                    cursor.execute(sql)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+        start = time.perf_counter()
+        try:
+            result = DBUtils.run('query', work)
+            Metrics.inc('db_rows_total', len(result), op='query')
             return result
-            
+
         except mysql.connector.Error as e:
-            print(f"查询执行失败: {str(e)}")
-            print(f"SQL: {sql}")
+            Metrics.inc('db_errors_total', op='query')
+            logger.error("查询执行失败: %s", e)
+            logger.error("SQL: %s", sql)
             if params:
-                print(f"参数: {params}")
+                logger.error("参数: %s", params)
             return None
-            
+
         finally:
-            if connection:
-                connection.close()
+            Metrics.observe('db_seconds', time.perf_counter() - start, op='query')
 
     @staticmethod
-    def execute_update(sql, params=None):
-        """执行更新操作"""
-        connection = None
-        cursor = None
-        try:
-            connection = DBUtils.get_connection()
-            cursor = connection.cursor()
-            
+    def stream_query(sql, params=None, batch_size=1000, named=False):
+        """流式查询：非缓冲游标 + fetchmany 分批读取，内存占用与结果集大小无关
+        Args:
+            batch_size: 每批从服务器读取的行数
+            named: False 返回元组；True 返回 Row（元组，可按列名访问，与字典行用法相同）
+        Yields:
+            每一行数据
+        说明：执行语句前的瞬时错误会重试；读取过程中出错直接抛出，不返回 None。
+        """
+        def work(connection):
+            cursor = connection.cursor(buffered=False)
             if params:
-                print("\n=== 执行更新操作 ===")
-                print(f"SQL: {sql}")
-                print(f"参数: {params}")
                 cursor.execute(sql, params)
             else:
                 cursor.execute(sql)
-            
-            affected_rows = cursor.rowcount
-            connection.commit()
-            print(f"更新成功，影响行数: {affected_rows}")
+            return connection, cursor
+
+        start = time.perf_counter()
+        count = 0
+        # consume_results: 提前结束迭代时自动丢弃未读取的结果
+        connection, cursor = DBUtils.run('stream', work, keep_open=True, consume_results=True)
+        try:
+            row_type = Row.bind(cursor.column_names) if named else None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                count += len(rows)
+                if row_type is None:
+                    yield from rows
+                else:
+                    yield from map(row_type, rows)
+        except mysql.connector.Error as e:
+            Metrics.inc('db_errors_total', op='stream')
+            logger.error("流式查询失败: %s", e)
+            logger.error("SQL: %s", sql)
+            raise
+        finally:
+            for resource in (cursor, connection):
+                try:
+                    resource.close()
+                except mysql.connector.Error:
+                    pass
+            Metrics.inc('db_rows_total', count, op='stream')
+            Metrics.observe('db_seconds', time.perf_counter() - start, op='stream')
+
+    @staticmethod
+    def execute_update(sql, params=None, prepared=False):
+        """执行更新操作，失败返回 False（瞬时错误已重试）
+        Args:
+            prepared: True 时在当前线程的长连接上使用服务端预处理语句（按SQL文本缓存），
+                      重复执行同一条语句时只发送参数（二进制协议），适用于逐行 upsert
+        """
+        def work(connection):
+            if prepared:
+                cursor, statement = DBUtils.prepared_cursor(sql)
+                logger.debug("执行预处理更新 SQL: %s 参数: %s", sql, params)
+                cursor.execute(statement, params or ())
+                affected_rows = cursor.rowcount
+                connection.commit()
+                return affected_rows
+
+            cursor = connection.cursor()
+            try:
+                if params:
+                    logger.debug("执行更新操作 SQL: %s 参数: %s", sql, params)
+                    cursor.execute(sql, params)
+                else:
+                    cursor.execute(sql)
+                affected_rows = cursor.rowcount
+                connection.commit()
+                return affected_rows
+            finally:
+                cursor.close()
+
+        start = time.perf_counter()
+        try:
+            affected_rows = DBUtils.run('update', work, persistent=prepared)
+            Metrics.inc('db_rows_total', max(affected_rows, 0), op='update')
+            logger.debug("更新成功，影响行数: %s", affected_rows)
             return True
-            
+
         except mysql.connector.Error as e:
-            if connection:
-                connection.rollback()
+            Metrics.inc('db_errors_total', op='update')
             error_msg = str(e)
-            print("\n=== 数据库更新错误 ===")
-            print(f"错误信息: {error_msg}")
-            print(f"SQL: {sql}")
+            logger.error("=== 数据库更新错误 ===")
+            logger.error("错误信息: %s", error_msg)
+            logger.error("SQL: %s", sql)
             if params:
-                print(f"参数: {params}")
-            
+                logger.error("参数: %s", params)
+
             if "Duplicate entry" in error_msg:
-                print("错误类型: 主键冲突")
+                logger.error("错误类型: 主键冲突")
             elif "foreign key constraint fails" in error_msg:
-                print("错误类型: 外键约束失败")
+                logger.error("错误类型: 外键约束失败")
             elif "Data too long" in error_msg:
-                print("错误类型: 数据超出字段长度限制")
-            
+                logger.error("错误类型: 数据超出字段长度限制")
+
             return False
-            
+
+        except DatabaseUnavailableError:
+            raise
+
         except Exception as e:
-            print(f"\n=== 非数据库错误 ===")
-            print(f"错误类型: {type(e)}")
-            print(f"错误信息: {str(e)}")
+            logger.error("=== 非数据库错误 ===")
+            logger.error("错误类型: %s", type(e))
+            logger.error("错误信息: %s", e)
             return False
-            
+
         finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
\ No newline at end of file
+            Metrics.observe('db_seconds', time.perf_counter() - start, op='update')
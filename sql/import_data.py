@@ -1,5 +1,15 @@
-import json
+import logging
+import os
+import sys
+
+import mysql.connector
 from db_utils import DBUtils
+from bulk_load import BulkLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils'))
+from log_utils import setup_logging
+
+logger = logging.getLogger(__name__)
 
 def parse_js_array():
     """解析 left.js 文件中的数组数据"""
@@ -12,91 +22,137 @@ def parse_js_array():
         areas = eval(content)
     return areas
 
+def area_key(group_id, index):
+    """原始区域ID：left.js 中的区域没有独立ID，以 分组ID*1000+组内序号 作为唯一键"""
+    return group_id * 1000 + index
+
+def import_areas_bulk(areas):
+    """批量导入区域和赛事（空库首次导入）
+    - 区域、赛事各一次批量写入，赛事的 area_id 通过与 area 表 JOIN 一次解析
+    - 全部在一个事务中完成，重复执行时按唯一键更新
+    """
+    logger.info("开始批量导入区域数据...")
+    area_rows = []
+    competition_rows = []
+    for group_id, group_data in enumerate(areas):
+        for index, area in enumerate(group_data or []):
+            key = area_key(group_id, index)
+            area_rows.append((key, area[0], area[1], area[2], area[3], None, index))
+            for item in (area[4] or []) + (area[5] or []):
+                # 联赛和杯赛：[赛事ID, 简体名, 繁体名, 英文名, 赛事类型]，最后一列为所属区域的原始ID
+                competition_rows.append((item[0], item[1], item[2], item[3], item[4], 2, group_id, key))
+
+    with BulkLoader() as loader:
+        loader.load('area', ['area_id', 'name_zh', 'name_zht', 'name_en', 'level', 'parent_id', 'sort_order'],
+                    area_rows)
+        loader.load_with_parent(
+            'competition',
+            ['competition_id', 'name_zh', 'name_zht', 'name_en', 'competition_type', 'level', 'original_group_id'],
+            competition_rows, parent_table='area', parent_key='area_id', parent_column='area_id')
+    logger.info("批量导入完成：区域 %s 条，赛事 %s 条", len(area_rows), len(competition_rows))
+
+# 区域和赛事按唯一键 upsert，重复导入只更新名称等字段
+AREA_SQL = """
+    INSERT INTO area (area_id, name_zh, name_zht, name_en, level, parent_id, sort_order)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    name_zh = VALUES(name_zh),
+    name_zht = VALUES(name_zht),
+    name_en = VALUES(name_en),
+    level = VALUES(level),
+    sort_order = VALUES(sort_order)
+"""
+COMPETITION_SQL = """
+    INSERT INTO competition (
+        competition_id, name_zh, name_zht, name_en,
+        area_id, competition_type, level, original_group_id
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    name_zh = VALUES(name_zh),
+    name_zht = VALUES(name_zht),
+    name_en = VALUES(name_en),
+    area_id = VALUES(area_id),
+    competition_type = VALUES(competition_type),
+    level = VALUES(level),
+    original_group_id = VALUES(original_group_id)
+"""
+
+def import_group(group_id, group_data):
+    """导入一个分组：区域一批、ID映射一次查询、赛事一批，在同一事务中提交
+    Returns:
+        tuple: (区域数, 赛事数)
+    """
+    area_rows = [
+        (area_key(group_id, index), area[0], area[1], area[2], area[3], None, index)
+        for index, area in enumerate(group_data)
+    ]
+
+    def work(connection):
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(AREA_SQL, area_rows)
+
+            # 一次查询取回本组所有区域的自增ID
+            keys = [row[0] for row in area_rows]
+            cursor.execute(
+                f"SELECT area_id, id FROM area WHERE area_id IN ({', '.join(['%s'] * len(keys))})", keys)
+            id_map = dict(cursor.fetchall())
+
+            competition_rows = [
+                (
+                    item[0],                              # competition_id
+                    item[1],                              # name_zh
+                    item[2],                              # name_zht
+                    item[3],                              # name_en
+                    id_map[area_key(group_id, index)],    # area_id
+                    item[4],                              # competition_type
+                    2,                                    # level
+                    group_id                              # original_group_id
+                )
+                for index, area in enumerate(group_data)
+                for item in (area[4] or []) + (area[5] or [])   # 联赛 + 杯赛
+            ]
+            if competition_rows:
+                cursor.executemany(COMPETITION_SQL, competition_rows)
+            connection.commit()
+            return len(area_rows), len(competition_rows)
+        finally:
+            cursor.close()
+
+    # 整组为一个事务，瞬时错误时整组重试（upsert 可重复执行）
+    return DBUtils.run('import', work)
+
 def import_areas(areas):
-    """导入区域数据"""
-    print("开始导入区域数据...")
-    
+    """导入区域数据（每个分组一个事务，可重复执行）"""
+    logger.info("开始导入区域数据...")
+    total_areas = total_competitions = 0
+
     for group_id, group_data in enumerate(areas):
         if not group_data:
             continue
-            
-        for area in group_data:
-            # 插入洲际级别区域
-            area_sql = """
-                INSERT INTO area (area_id, name_zh, name_zht, name_en, level, parent_id, sort_order)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            area_data = (
-                group_id,  # area_id
-                area[0],   # name_zh
-                area[1],   # name_zht
-                area[2],   # name_en
-                area[3],   # level
-                None,      # parent_id
-                0         # sort_order
-            )
-            
-            if DBUtils.execute_update(area_sql, area_data):
-                print(f"成功导入区域: {area[0]}")
-                
-                # 获取插入的区域ID
-                parent_id_sql = "SELECT id FROM area WHERE area_id = %s"
-                result = DBUtils.execute_query(parent_id_sql, (group_id,))
-                if result:
-                    parent_id = result[0]['id']
-                    
-                    # 处理联赛数据
-                    if area[4]:  # 联赛数组
-                        for league in area[4]:
-                            competition_sql = """
-                                INSERT INTO competition (
-                                    competition_id, name_zh, name_zht, name_en,
-                                    area_id, competition_type, level, original_group_id
-                                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                            """
-                            competition_data = (
-                                league[0],  # competition_id
-                                league[1],  # name_zh
-                                league[2],  # name_zht
-                                league[3],  # name_en
-                                parent_id,  # area_id
-                                league[4],  # competition_type
-                                2,         # level
-                                group_id   # original_group_id
-                            )
-                            if DBUtils.execute_update(competition_sql, competition_data):
-                                print(f"  成功导入联赛: {league[1]}")
-                    
-                    # 处理杯赛数据
-                    if area[5]:  # 杯赛数组
-                        for cup in area[5]:
-                            competition_sql = """
-                                INSERT INTO competition (
-                                    competition_id, name_zh, name_zht, name_en,
-                                    area_id, competition_type, level, original_group_id
-                                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                            """
-                            competition_data = (
-                                cup[0],    # competition_id
-                                cup[1],    # name_zh
-                                cup[2],    # name_zht
-                                cup[3],    # name_en
-                                parent_id, # area_id
-                                cup[4],    # competition_type
-                                2,        # level
-                                group_id  # original_group_id
-                            )
-                            if DBUtils.execute_update(competition_sql, competition_data):
-                                print(f"  成功导入杯赛: {cup[1]}")
+        try:
+            area_count, competition_count = import_group(group_id, group_data)
+        except mysql.connector.Error as e:
+            logger.error("分组 %s 导入失败: %s", group_id, e)
+            continue
+        total_areas += area_count
+        total_competitions += competition_count
+        logger.info("分组 %s: 导入区域 %s 条，赛事 %s 条", group_id, area_count, competition_count)
+
+    logger.info("共导入区域 %s 条，赛事 %s 条", total_areas, total_competitions)
 
 def main():
+    setup_logging()
     try:
-        print("开始数据导入...")
+        logger.info("开始数据导入...")
         areas = parse_js_array()
-        import_areas(areas)
-        print("数据导入完成！")
+        if '--bulk' in sys.argv:
+            import_areas_bulk(areas)
+        else:
+            import_areas(areas)
+        logger.info("数据导入完成！")
     except Exception as e:
-        print(f"导入过程中出错: {str(e)}")
+        logger.exception("导入过程中出错: %s", e)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,6 @@
 from db_utils import DBUtils
 import os
+import sys
 
 def show_database_structure():
     """显示数据库表结构"""
@@ -43,11 +44,10 @@ def show_database_structure():
                 print(f"{index['Key_name']:<20}{index['Column_name']:<20}{is_unique}")
 
 
-# 清空终端输出
-os.system('cls' if os.name == 'nt' else 'clear')
-
-
 if __name__ == "__main__":
+    # 清空终端输出（只在直接运行时执行）
+    if sys.stdout.isatty():
+        os.system('cls' if os.name == 'nt' else 'clear')
     print("开始测试数据库连接...")
     connection = DBUtils.get_connection()
     if connection:
@@ -0,0 +1,218 @@
+''' 数据变更流（只追加的变更日志）
+    - 区域、赛事写入数据库、比赛数据保存后，把新增/更新/删除逐条追加到 JSONL 文件，每条带递增序号 seq：
+      {'seq', 'time', 'table', 'op': insert/update/delete, 'key', 'before', 'after'}
+      before/after 为变更前后的整行数据（新增时 before 为 None，删除时 after 为 None）。
+    - 下游按序号增量读取，无需反复全表扫描或比较 Excel；记录自己处理到的 seq，下次从该位置继续。
+    - 删除只是记录（源数据中已不存在，数据库中的行保留），已写入的删除记在 {变更日志}_deleted.json 中，
+      不会每次运行重复写入；该主键重新出现时写入一条新增并移出删除记录。
+    - 多个进程同时写入时用文件锁（fcntl，非 POSIX 系统不加锁）保证序号连续。
+    用法：
+        ChangeFeed.get().emit([change('events', 'update', event_id, before, after), ...])
+        for record in ChangeFeed.get().read(after=120): ...
+        for record in ChangeFeed.get().tail(after=120): ...      # 持续跟随新记录
+    命令行：
+        python utils/change_feed.py --after 120 --table events --follow
+'''
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from file_utils import write_json
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """变更流配置
+    属性说明：
+        FEED_FILE: 变更日志文件
+        POLL_INTERVAL: tail 跟随时检查新记录的间隔(秒)
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    FEED_FILE = os.environ.get('QT_CHANGE_FEED', os.path.join(BASE_DIR, 'LocalOutputFiles', 'changes.jsonl'))
+    POLL_INTERVAL = 1.0
+
+
+OPS = ('insert', 'update', 'delete')
+
+
+def change(table, op, key, before=None, after=None):
+    """构造一条变更（seq 和 time 在写入时填充）"""
+    if op not in OPS:
+        raise ValueError(f"未知的变更类型: {op}")
+    return {'table': table, 'op': op, 'key': str(key), 'before': before, 'after': after}
+
+
+def _last_seq(f):
+    """读取已打开文件最后一条完整记录的序号，空文件返回 0"""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    block = 4096
+    while True:
+        start = max(0, end - block)
+        f.seek(start)
+        lines = f.read(end - start).splitlines()
+        # 从末尾找第一条能解析的记录（末行可能因写入中途崩溃而不完整）
+        for line in reversed(lines[1:] if start else lines):
+            try:
+                return json.loads(line)['seq']
+            except (ValueError, KeyError, TypeError):
+                continue
+        if not start:
+            return 0
+        block *= 4
+
+
+class ChangeFeed:
+    """变更日志（进程内单例）"""
+    _instance = None
+
+    def __init__(self, feed_file=None):
+        self.feed_file = feed_file or Config.FEED_FILE
+        self.deleted_file = os.path.splitext(self.feed_file)[0] + '_deleted.json'
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def load_deleted(self):
+        """已写入删除的主键 {表: {主键: seq}}"""
+        if not os.path.exists(self.deleted_file):
+            return {}
+        try:
+            with open(self.deleted_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("删除记录读取失败，已忽略: %s", e)
+            return {}
+
+    def deleted_keys(self, table):
+        """已作为删除写入变更流、之后未重新出现的主键"""
+        return set(self.load_deleted().get(table, {}))
+
+    def emit(self, changes):
+        """追加变更并分配序号，写入后 fsync（已写入过的删除跳过）
+        Returns:
+            int: 最后一条记录的序号；没有变更时返回 None
+        """
+        changes = list(changes)
+        if not changes:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(self.feed_file)), exist_ok=True)
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock, open(self.feed_file, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            deleted = self.load_deleted()
+            seq = _last_seq(f)
+            lines = []
+            deleted_changed = False
+            for item in changes:
+                keys = deleted.setdefault(item['table'], {})
+                if item['op'] == 'delete' and item['key'] in keys:
+                    continue
+                seq += 1
+                record = {'seq': seq, 'time': now, **item}
+                lines.append(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                if item['op'] == 'delete':
+                    keys[item['key']] = seq
+                    deleted_changed = True
+                elif keys.pop(item['key'], None) is not None:
+                    deleted_changed = True
+            if not lines:
+                return None
+            f.write(''.join(lines).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            if deleted_changed:
+                write_json(self.deleted_file, {table: keys for table, keys in deleted.items() if keys}, indent=None)
+        logger.info("变更流: 追加 %s 条记录（至 seq %s）", len(lines), seq)
+        return seq
+
+    def last_seq(self):
+        if not os.path.exists(self.feed_file):
+            return 0
+        with open(self.feed_file, 'rb') as f:
+            return _last_seq(f)
+
+    def _records(self, f, after, table):
+        """从文件当前位置读取完整的行；不完整的末行留到下次读取"""
+        while True:
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                return
+            if not line.endswith(b'\n'):
+                f.seek(position)
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("跳过无法解析的变更记录: %s", line[:80])
+                continue
+            if record['seq'] > after and (table is None or record['table'] == table):
+                yield record
+
+    def read(self, after=0, table=None, limit=None):
+        """读取序号大于 after 的记录
+        Args:
+            table: 只返回指定表的变更
+            limit: 最多返回的条数
+        """
+        records = []
+        if not os.path.exists(self.feed_file):
+            return records
+        with open(self.feed_file, 'rb') as f:
+            for record in self._records(f, after, table):
+                records.append(record)
+                if limit and len(records) >= limit:
+                    break
+        return records
+
+    def tail(self, after=0, table=None, stop_event=None, poll_interval=None):
+        """先返回序号大于 after 的已有记录，然后持续等待新记录（stop_event 置位时结束）"""
+        poll_interval = poll_interval or Config.POLL_INTERVAL
+        stop_event = stop_event or threading.Event()
+        while not os.path.exists(self.feed_file):
+            if stop_event.wait(poll_interval):
+                return
+        with open(self.feed_file, 'rb') as f:
+            while not stop_event.is_set():
+                for record in self._records(f, after, table):
+                    after = record['seq']
+                    yield record
+                stop_event.wait(poll_interval)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='读取数据变更流')
+    parser.add_argument('--after', type=int, default=0, help='只输出序号大于该值的记录')
+    parser.add_argument('--table', help='只输出指定表(areas/events/matches)的变更')
+    parser.add_argument('--limit', type=int, help='最多输出的条数')
+    parser.add_argument('--follow', action='store_true', help='持续输出新记录（Ctrl+C 退出）')
+    args = parser.parse_args()
+
+    feed = ChangeFeed.get()
+    records = feed.tail(args.after, args.table) if args.follow else feed.read(args.after, args.table, args.limit)
+    try:
+        for record in records:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+''' 失效URL缓存（负缓存）
+    - 确定失效的URL（404、页面无有效数据）单独记录连续失败次数和下次复查时间，保存在本地JSON文件中，
+      复查时间之前不再请求。
+    - 复查间隔随连续失败次数增长：1小时、6小时、1天、1周（之后保持1周）。
+    - 请求成功后移除记录；网络错误、超时等不确定的失败不记录。
+    - 强制复查：环境变量 QT_RECHECK_DEAD_URLS=1，或设置 DeadUrlCache.get().force = True。
+'''
+import json
+import logging
+import os
+import threading
+import time
+
+from file_utils import write_json
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """失效URL缓存配置
+    属性说明：
+        STATE_FILE: 记录文件（URL -> 连续失败次数、最后检查时间、下次复查时间）
+        INTERVALS: 第N次连续失败后的复查间隔(秒)，超过长度时使用最后一个
+        FORCE: 忽略复查时间，全部重新请求
+        DEFINITE_STATUSES: 可确定URL失效的状态码（200 表示页面返回但无有效数据），其余状态码视为临时错误
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    STATE_FILE = os.path.join(BASE_DIR, 'LocalOutputFiles', 'dead_urls.json')
+    INTERVALS = (3600, 6 * 3600, 24 * 3600, 7 * 24 * 3600)
+    FORCE = os.environ.get('QT_RECHECK_DEAD_URLS', '') not in ('', '0')
+    DEFINITE_STATUSES = {200, 404, 410}
+
+
+class DeadUrlCache:
+    """失效URL记录（进程内单例）
+
+    用法：
+        dead = DeadUrlCache.get()
+        if dead.should_skip(url):
+            return False
+        ...请求...
+        dead.record_failure(url) / dead.record_success(url)
+        dead.save()
+    """
+    _instance = None
+
+    def __init__(self, state_file=None, force=None):
+        self.state_file = state_file or Config.STATE_FILE
+        self.force = Config.FORCE if force is None else force
+        self.entries = {}    # URL -> {'failures': 次数, 'checked': 时间戳, 'next_check': 时间戳}
+        self.dirty = False
+        self._lock = threading.Lock()   # 多线程验证URL时保护记录
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("失效URL记录读取失败，已忽略: %s", e)
+
+    @classmethod
+    def get(cls):
+        """返回进程内单例，首次调用时加载记录"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def interval(failures):
+        """连续失败 failures 次后的复查间隔(秒)"""
+        return Config.INTERVALS[min(failures, len(Config.INTERVALS)) - 1]
+
+    def should_skip(self, url, now=None):
+        """URL已确定失效且未到复查时间时返回 True"""
+        entry = self.entries.get(url)
+        if entry is None or self.force:
+            return False
+        if (now or time.time()) < entry['next_check']:
+            Metrics.inc('dead_url_skips_total')
+            return True
+        return False
+
+    def record(self, url, is_valid, status):
+        """根据请求结果更新记录：有效时移除；确定失效时计一次失败；临时错误不记录"""
+        if is_valid:
+            self.record_success(url)
+        elif status in Config.DEFINITE_STATUSES:
+            self.record_failure(url)
+
+    def record_failure(self, url, now=None):
+        now = now or time.time()
+        with self._lock:
+            failures = self.entries.get(url, {}).get('failures', 0) + 1
+            self.entries[url] = {'failures': failures, 'checked': now,
+                                 'next_check': now + DeadUrlCache.interval(failures)}
+            self.dirty = True
+        logger.debug("URL连续失效 %s 次，%s 秒后复查: %s", failures, DeadUrlCache.interval(failures), url)
+
+    def record_success(self, url):
+        with self._lock:
+            removed = self.entries.pop(url, None) is not None
+            if removed:
+                self.dirty = True
+        if removed:
+            logger.info("失效URL已恢复: %s", url)
+
+    def save(self):
+        """有变化时保存记录"""
+        with self._lock:
+            if not self.dirty:
+                return
+            write_json(self.state_file, self.entries, indent=None)
+            self.dirty = False
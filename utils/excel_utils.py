@@ -0,0 +1,220 @@
+''' Excel 导出工具
+    - 写入时优先使用 xlsxwriter（未安装时使用 openpyxl）。
+    - 分文件模式：每个区域一个文件，由进程池并行构建 DataFrame 并写入，另生成一个索引工作簿（区域、文件、行数）；
+      上次导出过、本次已不存在的区域文件会被删除（只删除指纹记录中的文件，目录中的其他文件不受影响）。
+    - 写入前检查 Excel 锁文件（~$文件名）：目标文件未被占用时视为残留并删除；被占用时放弃写入。
+    - 先写临时文件再原子替换；按工作表数据指纹增量更新，数据未变化的工作表(文件)不重写。
+    - pandas / 写入引擎在实际导出时才导入，导入本模块不加载 pandas。
+'''
+import importlib
+import logging
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from file_utils import FingerprintStore, atomic_path, fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """Excel 导出配置
+    属性说明：
+        ENGINES: 写入引擎优先级
+        MAX_WORKERS: 分文件模式并行写入的最大进程数
+        SHEET_NAME_MAX: Excel 工作表名称最大长度
+        INDEX_FILE: 分文件模式下的索引工作簿文件名
+    """
+    ENGINES = ('xlsxwriter', 'openpyxl')
+    MAX_WORKERS = min(8, os.cpu_count() or 1)
+    SHEET_NAME_MAX = 31
+    INDEX_FILE = '_index.xlsx'
+
+
+class FileLockedError(Exception):
+    """目标 Excel 文件正被其他程序（如 Excel）打开"""
+
+
+_engine = None
+
+
+def excel_engine():
+    """返回可用的最快写入引擎（首次调用时探测）"""
+    global _engine
+    if _engine is None:
+        for name in Config.ENGINES:
+            try:
+                importlib.import_module(name)
+                _engine = name
+                break
+            except ImportError:
+                continue
+    return _engine
+
+
+def _write_frame(args):
+    """进程池任务：由行数据构建 DataFrame 并原子写入独立文件"""
+    import pandas as pd
+
+    rows, sheet_name, path = args
+    frame = pd.DataFrame(rows)
+    ExcelExport.guard_lock_file(path)
+    with atomic_path(path) as tmp:
+        with pd.ExcelWriter(tmp, engine=excel_engine()) as writer:
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    return path
+
+
+class ExcelExport:
+    """多工作表 Excel 导出
+
+    用法：
+        ExcelExport.write_workbook([(区域名, 行字典列表), ...], output_file)
+        ExcelExport.write_split([(区域名, 行字典列表), ...], output_dir)
+    """
+
+    @staticmethod
+    def lock_file(path):
+        directory, name = os.path.split(os.path.abspath(path))
+        return os.path.join(directory, '~$' + name)
+
+    @staticmethod
+    def guard_lock_file(path):
+        """检查 Excel 锁文件：目标文件可写时删除残留锁文件，否则抛出 FileLockedError"""
+        lock = ExcelExport.lock_file(path)
+        if not os.path.exists(lock):
+            return
+        if os.path.exists(path):
+            try:
+                # Windows 下被 Excel 打开的文件无法以写方式打开
+                with open(path, 'r+b'):
+                    pass
+            except PermissionError:
+                raise FileLockedError(f"文件正被占用，请先关闭: {path}")
+        try:
+            os.remove(lock)
+            logger.warning("已删除残留的Excel锁文件: %s", lock)
+        except OSError as e:
+            logger.warning("无法删除Excel锁文件 %s: %s", lock, e)
+
+    @staticmethod
+    def sheet_name(name, used):
+        """生成合法且不重复的工作表名称（去除非法字符，最长31个字符）"""
+        base = re.sub(r'[\[\]:*?/\\]', '_', str(name)).strip("'")[:Config.SHEET_NAME_MAX] or 'Sheet'
+        candidate = base
+        index = 2
+        while candidate.lower() in used:
+            suffix = f"_{index}"
+            candidate = base[:Config.SHEET_NAME_MAX - len(suffix)] + suffix
+            index += 1
+        used.add(candidate.lower())
+        return candidate
+
+    @staticmethod
+    def prepare(data_list):
+        """跳过空数据，生成工作表名称与数据指纹
+        Returns:
+            list: [(工作表名, 行数据, 指纹), ...]
+        """
+        used = set()
+        return [
+            (ExcelExport.sheet_name(name, used), rows, fingerprint(rows))
+            for name, rows in data_list if rows
+        ]
+
+    @staticmethod
+    def build_frames(items):
+        """构建 DataFrame，items 为 [(工作表名, 行数据, ...), ...]，返回 {工作表名: DataFrame}
+        由行字典构建 DataFrame 时持有 GIL，线程并行没有收益，按顺序构建
+        """
+        if not items:
+            return {}
+        import pandas as pd
+
+        return {item[0]: pd.DataFrame(item[1]) for item in items}
+
+    @staticmethod
+    def write_workbook(data_list, output_file, incremental=True):
+        """导出为一个工作簿，每个区域一个工作表
+        Args:
+            incremental: 只重写数据指纹变化的工作表（工作簿需已存在且有指纹记录，需要 openpyxl）
+        Returns:
+            list: 实际写入的工作表名称（无变化时为空列表）
+        """
+        import pandas as pd
+
+        ExcelExport.guard_lock_file(output_file)
+        items = ExcelExport.prepare(data_list)
+        fingerprints = {name: fp for name, _, fp in items}
+        store = FingerprintStore(output_file)
+        exists = os.path.exists(output_file) and bool(store.data)
+
+        changed = store.changed(fingerprints) if exists and incremental else list(fingerprints)
+        removed = store.removed(fingerprints) if exists and incremental else []
+        if exists and incremental and not changed and not removed:
+            logger.info("Excel数据无变化，跳过写入: %s", output_file)
+            return []
+
+        partial = exists and incremental and len(changed) < len(items)
+        frames = ExcelExport.build_frames([item for item in items if item[0] in changed])
+        with atomic_path(output_file) as tmp:
+            if partial:
+                # 在现有工作簿上替换变化的工作表，其余工作表保持原样
+                shutil.copyfile(output_file, tmp)
+                with pd.ExcelWriter(tmp, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                    for name in removed:
+                        if name in writer.book.sheetnames:
+                            del writer.book[name]
+                    for name, frame in frames.items():
+                        frame.to_excel(writer, sheet_name=name, index=False)
+            else:
+                with pd.ExcelWriter(tmp, engine=excel_engine()) as writer:
+                    for name, frame in frames.items():
+                        frame.to_excel(writer, sheet_name=name, index=False)
+        store.save(fingerprints)
+        logger.debug("Excel写入工作表: %s", changed)
+        return changed
+
+    @staticmethod
+    def write_split(data_list, output_dir, max_workers=None, incremental=True):
+        """每个区域导出为独立文件（进程池中并行构建并写入，数据未变化的文件不重写），并生成索引工作簿；
+        删除已不存在的区域上次导出的文件
+        Returns:
+            str: 索引工作簿路径
+        """
+        import pandas as pd
+
+        os.makedirs(output_dir, exist_ok=True)
+        items = ExcelExport.prepare(data_list)
+        fingerprints = {name: fp for name, _, fp in items}
+        index_file = os.path.join(output_dir, Config.INDEX_FILE)
+        store = FingerprintStore(index_file)
+        paths = {name: os.path.join(output_dir, f"{name}.xlsx") for name, _, _ in items}
+
+        changed = [name for name in (store.changed(fingerprints) if incremental else fingerprints)
+                   if name in fingerprints]
+        changed += [name for name in fingerprints if name not in changed and not os.path.exists(paths[name])]
+        tasks = [(rows, name, paths[name]) for name, rows, _ in items if name in changed]
+        if tasks:
+            with ProcessPoolExecutor(max_workers=max_workers or Config.MAX_WORKERS) as executor:
+                list(executor.map(_write_frame, tasks))
+        for name in store.removed(fingerprints):
+            path = os.path.join(output_dir, f"{name}.xlsx")
+            if not os.path.exists(path):
+                continue
+            ExcelExport.guard_lock_file(path)
+            os.remove(path)
+            logger.info("已删除不再存在的区域文件: %s", path)
+
+        index = pd.DataFrame({
+            '区域': [name for name, _, _ in items],
+            '文件': [os.path.basename(paths[name]) for name, _, _ in items],
+            '行数': [len(rows) for _, rows, _ in items]
+        })
+        ExcelExport.guard_lock_file(index_file)
+        with atomic_path(index_file) as tmp:
+            with pd.ExcelWriter(tmp, engine=excel_engine()) as writer:
+                index.to_excel(writer, sheet_name='索引', index=False)
+        store.save(fingerprints)
+        return index_file
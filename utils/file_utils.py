@@ -0,0 +1,130 @@
+''' 输出文件工具
+    - 原子写入：先写入同目录下的临时文件并 fsync，再 os.replace 覆盖目标文件；
+      写入过程中崩溃只会留下临时文件，目标文件保持上一次的完整内容。
+    - 数据指纹：内容的 SHA-256，保存在旁路文件(*.fingerprints.json)中，数据未变化时跳过重写。
+    - JSONL：逐行追加记录，只需写入新增/变化的行；读取时跳过崩溃留下的不完整末行。
+'''
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def temp_path(path):
+    """目标文件同目录下的临时文件路径（保留扩展名，便于按扩展名识别格式的库读写）"""
+    directory, name = os.path.split(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp' + os.path.splitext(name)[1], dir=directory)
+    os.close(fd)
+    return tmp
+
+
+def replace_file(tmp, path):
+    """fsync 临时文件后原子替换目标文件"""
+    with open(tmp, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def atomic_path(path):
+    """提供临时文件路径，代码块正常结束后原子替换目标文件，异常时删除临时文件"""
+    tmp = temp_path(path)
+    try:
+        yield tmp
+        replace_file(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding='utf-8'):
+    """原子写入文件对象，用法与 open() 相同"""
+    with atomic_path(path) as tmp:
+        with open(tmp, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+
+
+def write_json(path, data, **kwargs):
+    """原子写入JSON（默认 ensure_ascii=False, indent=4）"""
+    kwargs.setdefault('ensure_ascii', False)
+    kwargs.setdefault('indent', 4)
+    with atomic_write(path) as f:
+        json.dump(data, f, **kwargs)
+
+
+def fingerprint(data):
+    """数据指纹：按键排序序列化后的 SHA-256"""
+    content = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def append_jsonl(path, records):
+    """追加记录到JSONL文件（每行一个JSON），写入后 fsync
+    Returns:
+        int: 追加的行数
+    """
+    lines = [json.dumps(record, ensure_ascii=False) + '\n' for record in records]
+    if not lines:
+        return 0
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(lines)
+
+
+def read_jsonl(path):
+    """读取JSONL文件的全部记录；不完整的末行（写入中途崩溃）被忽略"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("跳过无法解析的JSONL行 %s:%s", path, line_no)
+    return records
+
+
+def write_jsonl(path, records):
+    """原子重写整个JSONL文件（用于压缩追加产生的重复记录）"""
+    with atomic_write(path) as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class FingerprintStore:
+    """输出文件的分块指纹（如 Excel 每个工作表），保存在 {输出文件}.fingerprints.json"""
+
+    def __init__(self, output_file):
+        self.path = output_file + '.fingerprints.json'
+        self.data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.data = {}
+
+    def changed(self, fingerprints):
+        """返回与已保存指纹不同的键（新增或变化）"""
+        return [key for key, value in fingerprints.items() if self.data.get(key) != value]
+
+    def removed(self, fingerprints):
+        """返回已保存但本次不存在的键"""
+        return [key for key in self.data if key not in fingerprints]
+
+    def save(self, fingerprints):
+        self.data = dict(fingerprints)
+        write_json(self.path, self.data)
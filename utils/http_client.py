@@ -0,0 +1,439 @@
+''' HTTP 请求层（录制 / 回放 / 故障注入）
+    - live（默认）：直接请求数据源。
+    - record：请求数据源，同时把响应（URL、状态码、响应头、正文、耗时）写入 gzip 压缩的 JSONL 存档。
+    - replay：只从存档返回响应，不访问网络；存档中没有的URL按连接错误处理。
+    - 任何模式下都可注入延迟和随机错误（固定随机种子，结果可复现），用于离线调优并发和重试。
+    - 同时覆盖 requests（HttpClient.get）和 aiohttp（HttpClient.aget，异步上下文管理器）。
+    - requests 请求共用一个 Session（连接池 + keep-alive，连接错误和 502/503/504 自动重试）；
+      HttpClient.map 用线程池并发执行同步请求，调用方无需改为 asyncio。
+    - 限速：同一主机的请求之间至少间隔 MIN_INTERVAL~MAX_INTERVAL 秒（随机），由所有线程/协程共用，
+      并发请求时总请求速率与逐个请求时相同；回放模式不限速。
+    - 正文解码：每个接口（主机 + 去掉数字的路径）只判断一次编码并缓存，之后直接按该编码解码字节；
+      判断顺序为 配置覆盖 -> BOM -> 响应头 charset -> UTF-8/GB18030 严格解码 -> 字符集检测（只在前面都失败时执行一次）。
+      声明为 gb2312/gbk 的按其超集 gb18030 解码（这类页面常含 GBK 扩展字符）。
+    环境变量：
+        QT_HTTP_MODE:        live / record / replay
+        QT_HTTP_ARCHIVE:     存档文件（默认 LocalOutputFiles/http_archive.jsonl.gz）
+        QT_HTTP_LATENCY:     每个请求额外延迟的秒数；recorded 表示回放时按录制时的耗时等待
+        QT_HTTP_ERROR_RATE:  注入连接错误的概率（0~1）
+        QT_HTTP_SEED:        故障注入的随机种子
+        QT_HTTP_ENCODING:    所有接口统一使用的编码（如 utf-8 / gbk），覆盖自动判断
+        QT_HTTP_MIN_INTERVAL / QT_HTTP_MAX_INTERVAL: 同一主机两次请求之间的最小/最大间隔(秒)，0 表示不限速
+'''
+import atexit
+import base64
+import codecs
+import gzip
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """HTTP 请求层配置
+    属性说明：
+        MODE: live / record / replay
+        ARCHIVE: 录制/回放存档文件
+        LATENCY: 注入延迟（秒），'recorded' 表示按录制耗时
+        ERROR_RATE: 注入连接错误的概率
+        SEED: 故障注入随机种子
+        RECORD_HEADERS: 录制时保存的响应头（影响编码判断的头）
+        POOL_SIZE: 每个主机保持的连接数（应不小于 MAX_WORKERS）
+        MAX_RETRIES: 连接错误、502/503/504 的重试次数（指数退避，BACKOFF_FACTOR 为基数）
+        MAX_WORKERS: HttpClient.map 的默认并发线程数
+        ENCODING: 所有接口统一使用的编码（为空时自动判断）
+        ENCODINGS: 按主机或URL前缀指定编码，如 {'www.example.com': 'gbk'}
+        FALLBACK_ENCODINGS: 未声明编码时依次严格解码尝试的编码（数据源为中文站点）
+        ENCODING_SUPERSETS: 按超集解码的编码（声明/检测为 gb2312、gbk 时使用 gb18030）
+        MIN_INTERVAL, MAX_INTERVAL: 同一主机两次请求开始之间的随机间隔范围(秒)，所有线程共用
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    MODE = os.environ.get('QT_HTTP_MODE', 'live').lower()
+    ARCHIVE = os.environ.get('QT_HTTP_ARCHIVE') or os.path.join(BASE_DIR, 'LocalOutputFiles', 'http_archive.jsonl.gz')
+    LATENCY = os.environ.get('QT_HTTP_LATENCY', '0')
+    ERROR_RATE = float(os.environ.get('QT_HTTP_ERROR_RATE', '0'))
+    SEED = int(os.environ.get('QT_HTTP_SEED', '0'))
+    RECORD_HEADERS = ('Content-Type', 'Content-Encoding', 'Last-Modified', 'ETag')
+    POOL_SIZE = 16
+    MAX_RETRIES = 2
+    BACKOFF_FACTOR = 0.3
+    MAX_WORKERS = 8
+    ENCODING = os.environ.get('QT_HTTP_ENCODING')
+    ENCODINGS = {}
+    FALLBACK_ENCODINGS = ('utf-8', 'gb18030')
+    ENCODING_SUPERSETS = {'gb2312': 'gb18030', 'gbk': 'gb18030'}
+    MIN_INTERVAL = float(os.environ.get('QT_HTTP_MIN_INTERVAL', 0.5))
+    MAX_INTERVAL = float(os.environ.get('QT_HTTP_MAX_INTERVAL', 2 * MIN_INTERVAL))
+
+
+class ReplayResponse:
+    """回放的 aiohttp 响应（status / text() / read()）"""
+
+    def __init__(self, entry):
+        self.status = entry['status']
+        self.headers = CaseInsensitiveDict(entry['headers'])
+        self.url = entry['url']
+        self._body = base64.b64decode(entry['body'])
+
+    async def read(self):
+        return self._body
+
+    async def text(self, encoding=None):
+        return HttpClient.decode(self.url, self._body, self.headers.get('Content-Type'), encoding)
+
+
+class HttpClient:
+    """统一的 HTTP 请求入口
+
+    用法：
+        response = HttpClient.get(url, headers=headers, timeout=10)        # requests.Response
+        results = HttpClient.map(fetch, urls)                              # 线程池并发
+        content = HttpClient.text(response)                                # 按接口缓存的编码解码
+        async with HttpClient.aget(session, url, headers=headers, timeout=10) as response:
+            content = await HttpClient.atext(response)
+    """
+    mode = Config.MODE
+    archive = Config.ARCHIVE
+    error_rate = Config.ERROR_RATE
+    latency = Config.LATENCY
+    _random = random.Random(Config.SEED)
+    _lock = threading.Lock()
+    _replay = None          # URL -> 最近一次录制的条目
+    _pending = []           # 待写入存档的录制条目
+    _atexit = False
+    _session = None         # 共用的 requests.Session
+    _encodings = {}         # 接口 -> 编码
+    _validators = {}        # URL -> 上次响应的 ETag / Last-Modified（条件请求）
+    interval = (Config.MIN_INTERVAL, max(Config.MIN_INTERVAL, Config.MAX_INTERVAL))
+    _next_request = {}      # 主机 -> 下一次请求最早的开始时间(monotonic)
+    _rate_lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, mode=None, archive=None, latency=None, error_rate=None, seed=None, interval=None):
+        """修改运行模式（未指定的参数保持不变），切换存档时清空已加载的回放数据
+        Args:
+            interval: 同一主机的请求间隔(秒)，数值或 (最小, 最大)；0 表示不限速
+        """
+        cls.flush()
+        if interval is not None:
+            cls.interval = tuple(interval) if isinstance(interval, (tuple, list)) else (interval, interval)
+            cls._next_request = {}
+        if mode is not None:
+            cls.mode = mode
+        if archive is not None:
+            cls.archive = archive
+            cls._replay = None
+        if latency is not None:
+            cls.latency = latency
+        if error_rate is not None:
+            cls.error_rate = error_rate
+        if seed is not None:
+            cls._random = random.Random(seed)
+
+    # ---------- 存档 ----------
+    @classmethod
+    def load_archive(cls):
+        """加载回放存档（同一URL多次录制时以最后一次为准）"""
+        if cls._replay is None:
+            entries = {}
+            if os.path.exists(cls.archive):
+                with gzip.open(cls.archive, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries[entry['url']] = entry
+            cls._replay = entries
+            logger.info("已加载HTTP回放存档: %s（%s 个URL）", cls.archive, len(entries))
+        return cls._replay
+
+    @classmethod
+    def record(cls, url, status, headers, body, elapsed):
+        entry = {
+            'url': url,
+            'status': status,
+            'headers': {k: headers[k] for k in Config.RECORD_HEADERS if k in headers},
+            'body': base64.b64encode(body).decode('ascii'),
+            'elapsed': round(elapsed, 4)
+        }
+        with cls._lock:
+            cls._pending.append(entry)
+            if not cls._atexit:
+                atexit.register(cls.flush)
+                cls._atexit = True
+
+    @classmethod
+    def flush(cls):
+        """把录制的响应追加到存档（每次追加一个 gzip 成员，读取时自动拼接）"""
+        with cls._lock:
+            pending, cls._pending = cls._pending, []
+        if not pending:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(cls.archive)), exist_ok=True)
+        with gzip.open(cls.archive, 'at', encoding='utf-8') as f:
+            for entry in pending:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        if cls._replay is not None:
+            cls._replay.update((entry['url'], entry) for entry in pending)
+        logger.info("已录制 %s 个HTTP响应到: %s", len(pending), cls.archive)
+
+    @classmethod
+    def replay_entry(cls, url):
+        entry = cls.load_archive().get(url)
+        if entry is None:
+            Metrics.inc('http_replay_misses_total')
+        return entry
+
+    # ---------- 编码 ----------
+    @staticmethod
+    def endpoint(url):
+        """编码缓存的键：主机 + 去掉数字的路径（sea36.js、sea39.js 属于同一接口）"""
+        parts = urlsplit(str(url))
+        return parts.netloc + re.sub(r'\d+', '', parts.path)
+
+    @staticmethod
+    def configured_encoding(url):
+        if Config.ENCODING:
+            return Config.ENCODING
+        url = str(url)
+        for prefix, encoding in Config.ENCODINGS.items():
+            if urlsplit(url).netloc == prefix or url.startswith(prefix):
+                return encoding
+        return None
+
+    @staticmethod
+    def header_charset(content_type):
+        """响应头中明确声明的 charset（不使用 text/* 的 ISO-8859-1 默认值）"""
+        match = re.search(r'charset=["\']?([\w.:-]+)', content_type or '', re.I)
+        return match.group(1).lower() if match else None
+
+    @staticmethod
+    def superset_encoding(encoding):
+        """编码名称规范化，gb2312/gbk（含 cp936 等别名）替换为 gb18030"""
+        try:
+            name = codecs.lookup(encoding).name
+        except LookupError:
+            return encoding
+        return Config.ENCODING_SUPERSETS.get(name, encoding)
+
+    @classmethod
+    def detect_encoding(cls, url, body, content_type=None):
+        """判断接口编码并缓存"""
+        key = cls.endpoint(url)
+        encoding = cls._encodings.get(key)
+        if encoding:
+            return encoding
+        encoding = cls.configured_encoding(url)
+        if not encoding:
+            if body.startswith(b'\xef\xbb\xbf'):
+                encoding = 'utf-8-sig'
+            elif body.startswith((b'\xff\xfe', b'\xfe\xff')):
+                encoding = 'utf-16'
+            else:
+                encoding = cls.header_charset(content_type)
+        declared = bool(encoding)
+        for candidate in ([] if encoding else Config.FALLBACK_ENCODINGS):
+            try:
+                body.decode(candidate)
+                encoding = candidate
+                break
+            except UnicodeDecodeError:
+                continue
+        if not encoding:
+            encoding = chardet.detect(body)['encoding'] or 'utf-8'
+            Metrics.inc('http_encoding_detections_total')
+        encoding = cls.superset_encoding(encoding)
+        if not body or not declared and body.isascii():
+            return encoding     # 空正文或纯ASCII正文无法区分编码，不缓存
+        cls._encodings[key] = encoding
+        logger.debug("接口编码: %s -> %s", key, encoding)
+        return encoding
+
+    @classmethod
+    def decode(cls, url, body, content_type=None, encoding=None):
+        """按接口编码解码正文
+        缓存的编码无法解码时移除缓存并重新判断；仍无法解码的字节替换为 U+FFFD
+        """
+        if encoding:
+            return body.decode(cls.superset_encoding(encoding), errors='replace')
+        encoding = cls.detect_encoding(url, body, content_type)
+        try:
+            return body.decode(encoding)
+        except UnicodeDecodeError:
+            key = cls.endpoint(url)
+            if cls._encodings.pop(key, None) is None:
+                return body.decode(encoding, errors='replace')
+            logger.debug("接口编码 %s 无法解码 %s，重新判断", encoding, url)
+            Metrics.inc('http_encoding_evictions_total')
+            return body.decode(cls.detect_encoding(url, body, content_type), errors='replace')
+
+    @classmethod
+    def text(cls, response):
+        """requests 响应正文，代替 response.text / apparent_encoding（不对整个正文做字符集检测）"""
+        return cls.decode(response.url, response.content, response.headers.get('Content-Type'))
+
+    @classmethod
+    async def atext(cls, response):
+        """aiohttp 响应正文，代替 await response.text()"""
+        return cls.decode(response.url, await response.read(), response.headers.get('Content-Type'))
+
+    # ---------- 限速 ----------
+    @classmethod
+    def throttle(cls, url):
+        """为本次请求预约同一主机的下一个请求时间，返回需要等待的秒数（回放模式和不限速时为 0）"""
+        low, high = cls.interval
+        if cls.mode == 'replay' or high <= 0:
+            return 0
+        host = urlsplit(url).netloc
+        with cls._rate_lock:
+            now = time.monotonic()
+            start = max(now, cls._next_request.get(host, now))
+            cls._next_request[host] = start + random.uniform(low, high)
+        if start > now:
+            Metrics.inc('http_throttled_total')
+        return start - now
+
+    # ---------- 故障注入 ----------
+    @classmethod
+    def delay(cls, entry=None):
+        """本次请求需要额外等待的秒数"""
+        if cls.latency == 'recorded':
+            return entry['elapsed'] if entry else 0
+        return float(cls.latency or 0)
+
+    @classmethod
+    def inject_error(cls):
+        if cls.error_rate and cls._random.random() < cls.error_rate:
+            Metrics.inc('http_injected_errors_total')
+            return True
+        return False
+
+    # ---------- requests ----------
+    @classmethod
+    def session(cls):
+        """共用的 requests.Session（首次使用时创建，连接在请求之间保持）"""
+        if cls._session is None:
+            with cls._lock:
+                if cls._session is None:
+                    retry = Retry(total=Config.MAX_RETRIES, connect=Config.MAX_RETRIES, read=Config.MAX_RETRIES,
+                                  backoff_factor=Config.BACKOFF_FACTOR, status_forcelist=(502, 503, 504),
+                                  allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False)
+                    adapter = HTTPAdapter(pool_connections=Config.POOL_SIZE, pool_maxsize=Config.POOL_SIZE,
+                                          max_retries=retry)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def close(cls):
+        """关闭共用 Session 的连接池"""
+        with cls._lock:
+            session, cls._session = cls._session, None
+        if session is not None:
+            session.close()
+
+    @staticmethod
+    def map(func, items, max_workers=None):
+        """线程池并发执行 func(item)，按输入顺序返回结果列表（func 中的异常原样抛出）"""
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(max_workers or Config.MAX_WORKERS, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    def build_response(entry):
+        """由存档条目构造 requests.Response"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = base64.b64decode(entry['body'])
+        response.url = entry['url']
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.reason = 'Replayed'
+        return response
+
+    @classmethod
+    def get(cls, url, **kwargs):
+        """GET 请求，返回 requests.Response；连接失败（含注入错误、回放缺失）抛出 requests.ConnectionError"""
+        entry = cls.replay_entry(url) if cls.mode == 'replay' else None
+        delay = cls.delay(entry) + cls.throttle(url)
+        if delay:
+            time.sleep(delay)
+        if cls.inject_error():
+            raise requests.ConnectionError(f"注入的连接错误: {url}")
+
+        if cls.mode == 'replay':
+            if entry is None:
+                raise requests.ConnectionError(f"回放存档中没有该URL: {url}")
+            return cls.build_response(entry)
+
+        start = time.perf_counter()
+        response = cls.session().get(url, **kwargs)
+        if cls.mode == 'record':
+            cls.record(url, response.status_code, response.headers, response.content,
+                       time.perf_counter() - start)
+        return response
+
+    @classmethod
+    def get_if_changed(cls, url, headers=None, **kwargs):
+        """条件请求：带上上次响应的 ETag / Last-Modified，服务器返回 304（未变化）时返回 None"""
+        headers = dict(headers or {})
+        validators = cls._validators.get(url, {})
+        if 'ETag' in validators:
+            headers['If-None-Match'] = validators['ETag']
+        if 'Last-Modified' in validators:
+            headers['If-Modified-Since'] = validators['Last-Modified']
+        response = cls.get(url, headers=headers, **kwargs)
+        if response.status_code == 304:
+            Metrics.inc('http_not_modified_total')
+            return None
+        if response.status_code == 200:
+            cls._validators[url] = {k: response.headers[k] for k in ('ETag', 'Last-Modified') if k in response.headers}
+        return response
+
+    # ---------- aiohttp ----------
+    @classmethod
+    @asynccontextmanager
+    async def aget(cls, session, url, **kwargs):
+        """aiohttp GET，用法与 session.get() 相同（async with）"""
+        import asyncio
+        import aiohttp
+
+        entry = cls.replay_entry(url) if cls.mode == 'replay' else None
+        delay = cls.delay(entry) + cls.throttle(url)
+        if delay:
+            await asyncio.sleep(delay)
+        if cls.inject_error():
+            raise aiohttp.ClientConnectionError(f"注入的连接错误: {url}")
+
+        if cls.mode == 'replay':
+            if entry is None:
+                raise aiohttp.ClientConnectionError(f"回放存档中没有该URL: {url}")
+            yield ReplayResponse(entry)
+            return
+
+        start = time.perf_counter()
+        async with session.get(url, **kwargs) as response:
+            if cls.mode == 'record':
+                body = await response.read()   # 正文缓存在响应上，调用方仍可 text()
+                cls.record(url, response.status, response.headers, body, time.perf_counter() - start)
+            yield response
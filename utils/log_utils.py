@@ -0,0 +1,97 @@
+''' 日志配置
+    - 各模块使用 logging.getLogger(__name__)，消息使用 %s 延迟格式化（只有通过级别检查才会拼接字符串）。
+    - 入口脚本调用 setup_logging()：处理器挂在队列上(QueueHandler)，由后台线程(QueueListener)写控制台/文件，
+      异步任务和工作线程写日志时不会阻塞在终端输出上。
+    - 非DEBUG级别时调用 logging.disable(DEBUG)，debug() 调用在第一次整数比较后即返回。
+    环境变量：
+        QT_LOG_LEVEL: DEBUG / INFO(默认) / WARNING / ERROR
+        QT_LOG_FILE:  额外写入的日志文件（包含时间、级别、模块名）
+'''
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+
+class Config:
+    """日志配置
+    属性说明：
+        LEVEL: 默认日志级别
+        LOG_FILE: 日志文件路径，为空时只输出到控制台
+        CONSOLE_FORMAT: 控制台格式（INFO保持与原 print 输出一致，只输出消息）
+        FILE_FORMAT: 文件格式
+    """
+    LEVEL = os.environ.get('QT_LOG_LEVEL', 'INFO').upper()
+    LOG_FILE = os.environ.get('QT_LOG_FILE')
+    CONSOLE_FORMAT = '%(message)s'
+    FILE_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+_listener = None
+
+
+class ConsoleFormatter(logging.Formatter):
+    """INFO 只输出消息，其余级别带级别前缀"""
+
+    def format(self, record):
+        message = super().format(record)
+        if record.levelno == logging.INFO:
+            return message
+        return f"[{record.levelname}] {message}"
+
+
+def setup_logging(level=None, log_file=None):
+    """配置根日志（重复调用时只调整级别）
+    Args:
+        level: 日志级别名称或数值，默认读取 QT_LOG_LEVEL
+        log_file: 日志文件，默认读取 QT_LOG_FILE
+    """
+    global _listener
+    level = level or Config.LEVEL
+    level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    # 生产模式下整体屏蔽DEBUG，debug() 调用几乎零开销
+    logging.disable(logging.NOTSET if level <= logging.DEBUG else logging.DEBUG)
+
+    if _listener is not None:
+        return root
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(ConsoleFormatter(Config.CONSOLE_FORMAT))
+    handlers = [console]
+    log_file = log_file or Config.LOG_FILE
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter(Config.FILE_FORMAT))
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """停止后台写日志线程并输出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def clear_console():
+    """清空终端输出（只在交互式终端的入口 main() 中调用，不在导入时执行；非Windows使用ANSI转义，不启动子进程）"""
+    if not sys.stdout.isatty():
+        return
+    if os.name == 'nt':
+        os.system('cls')
+    else:
+        sys.stdout.write('\033[2J\033[H')
+        sys.stdout.flush()
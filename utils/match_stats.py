@@ -0,0 +1,339 @@
+''' 比赛数据统计（向量化）
+    - 比分字符串（全场比分、半场比分）与盘口（让球、总进球）只解析一次，转换为整数/浮点数组。
+    - 积分榜、近期战绩、大小球结果、让球结果全部使用 NumPy/pandas 向量化计算。
+    - 支持同时计算多个联赛赛季（按 联赛ID + 赛季 分组），输入为现有的 *_Matches.json 结构或列式存储。
+    - 球队以整数ID(qtid)参与分组计算，名称只在输出结果时通过球队字典解析。
+    - 从 JSON 直接汇总（MatchStats.summary）时按比赛数选择实现：少于 LOOP_MAX_MATCHES 场时逐行循环更快
+      （展开 DataFrame 与 pandas 分组有固定开销），更多时使用向量化实现。
+      阈值来自 benchmarks/bench_match_stats.py：端到端约 2.5 万场时两者持平。
+'''
+import json
+
+import numpy as np
+import pandas as pd
+
+from match_store import MatchStore, season_from_filename
+from team_registry import TeamRegistry
+
+
+class Config:
+    """统计配置
+    属性说明：
+        FINISHED_STATE: 已结束比赛的状态返回值
+        WIN/DRAW_POINTS: 胜/平积分
+        RESULT_LABELS: 赛果数值 -> 显示标签（1=赢, 0.5=赢半, 0=走, -0.5=输半, -1=输）
+        LOOP_MAX_MATCHES: summary() 使用逐行循环实现的最大比赛数，超过时使用向量化实现
+    """
+    FINISHED_STATE = -1
+    WIN_POINTS = 3
+    DRAW_POINTS = 1
+    RESULT_LABELS = {1.0: '赢', 0.5: '赢半', 0.0: '走', -0.5: '输半', -1.0: '输'}
+    LOOP_MAX_MATCHES = 25000
+
+
+class MatchStats:
+    """比赛统计
+
+    用法：
+        df = MatchStats.load_json(['LocalOutputFiles/2024-2025EngLand_Matches.json'])
+        table = MatchStats.standings(df)
+        ou = MatchStats.over_under(df)
+        points, ou_results, handicap_results = MatchStats.summary(sources)   # 按数据量选择实现
+    """
+
+    # *_Matches.json 字段 -> DataFrame 列
+    JSON_COLUMNS = {
+        '比赛ID': 'match_id', '联赛ID': 'league_id', '状态返回值': 'state', '比赛时间': 'match_time',
+        '主队': 'home_id', '客队': 'away_id', '全场比分': 'score', '半场比分': 'half_score',
+        '让球': 'handicap', '总进球': 'goal_line'
+    }
+
+    # ---------- 数据加载 ----------
+    @staticmethod
+    def iter_sources(sources):
+        """文件路径列表、{赛季: 已加载的JSON字典} 或 [(赛季, JSON字典)] -> (赛季, JSON字典)"""
+        items = sources.items() if isinstance(sources, dict) else (
+            (season_from_filename(item), item) if isinstance(item, str) else item for item in sources
+        )
+        for season, data in items:
+            if isinstance(data, str):
+                with open(data, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            yield season, data
+
+    @staticmethod
+    def load_json(sources):
+        """加载 *_Matches.json
+        Args:
+            sources: 文件路径列表、{赛季: 已加载的JSON字典} 或 [(赛季, JSON字典)]
+        Returns:
+            DataFrame: 每场比赛一行，比分和盘口已解析为数值列
+        """
+        matches, seasons, rounds = [], [], []
+        for season, data in MatchStats.iter_sources(sources):
+            for group in data.values():
+                for round_name, round_matches in group.items():
+                    matches.extend(round_matches)
+                    seasons.append((season, len(round_matches)))
+                    rounds.append((int(round_name.split('_')[1]), len(round_matches)))
+        # 按列构建：字典列表一次转换为 DataFrame，赛季/轮次按每组比赛数展开
+        counts = [count for _, count in seasons]
+        frame = pd.DataFrame(matches, columns=list(MatchStats.JSON_COLUMNS) + ['主队ID', '客队ID'])
+        df = frame[list(MatchStats.JSON_COLUMNS)].rename(columns=MatchStats.JSON_COLUMNS)
+        df.insert(2, 'season', np.repeat(np.array([season for season, _ in seasons], dtype=object), counts))
+        df.insert(3, 'round', np.repeat(np.array([round_no for round_no, _ in rounds], dtype='int64'), counts))
+        # 有 主队ID/客队ID 时使用ID，否则使用名称（旧格式）
+        for column, id_field in (('home_id', '主队ID'), ('away_id', '客队ID')):
+            df[column] = frame[id_field].where(frame[id_field].notna(), df[column])
+        df = df.drop_duplicates('match_id', keep='last').reset_index(drop=True)
+        # 名称 -> 整数球队ID（已是ID的保持不变）
+        registry = TeamRegistry.get()
+        for column in ('home_id', 'away_id'):
+            values = df[column].to_numpy(dtype=object)
+            is_name = np.array([isinstance(v, str) for v in values], dtype=bool) | pd.isna(values)
+            ids = np.zeros(len(values), dtype='int32')
+            ids[is_name] = registry.ids_of(values[is_name])
+            ids[~is_name] = values[~is_name].astype('int32')
+            df[column] = ids
+        return MatchStats.parse(df)
+
+    @staticmethod
+    def load_store(store=None):
+        """从列式存储加载，字典编码列只需解析字典本身"""
+        store = store or MatchStore.refresh()
+        cols = store.columns
+        dicts = store.dictionaries
+
+        def decode(name, dict_name):
+            values = np.asarray(dicts.get(dict_name, []) + [None], dtype=object)
+            return values[np.asarray(cols[name])]      # 编码 -1 映射到末尾的 None
+
+        df = pd.DataFrame({
+            'match_id': np.asarray(cols['match_id']),
+            'league_id': np.asarray(cols['league_id']),
+            'season': decode('season', 'season'),
+            'round': np.asarray(cols['round']),
+            'state': np.asarray(cols['state']),
+            'match_time': np.asarray(cols['match_time']).astype('datetime64[m]'),
+            'home_id': np.asarray(cols['home'], dtype='int32'),
+            'away_id': np.asarray(cols['away'], dtype='int32'),
+            'score': decode('score', 'score'),
+            'half_score': decode('half_score', 'score'),
+            'handicap': np.asarray(cols['handicap'], dtype='float64'),
+            'goal_line': decode('goal_line', 'goal_line')
+        })
+        df.loc[np.asarray(cols['match_time']) < 0, 'match_time'] = pd.NaT
+        return MatchStats.parse(df)
+
+    # ---------- 解析 ----------
+    @staticmethod
+    def parse_scores(scores):
+        """'2-1' 字符串数组 -> (主队进球, 客队进球) 整数数组，缺失为 -1
+        相同比分只解析一次（先 factorize 再按编码取值）
+        """
+        codes, uniques = pd.factorize(pd.Series(scores, dtype=object))
+        parsed = pd.Series(uniques, dtype=object).str.extract(r'^\s*(\d+)\s*-\s*(\d+)\s*$')
+        parsed = parsed.fillna(-1).astype('int16').to_numpy()
+        parsed = np.vstack([parsed, [[-1, -1]]])        # 编码 -1（缺失）取最后一行
+        return parsed[codes, 0], parsed[codes, 1]
+
+    @staticmethod
+    def parse_goal_lines(lines):
+        """'3/3.5' -> 3.25, '2.5' -> 2.5，缺失为 NaN"""
+        codes, uniques = pd.factorize(pd.Series(lines, dtype=object))
+        values = np.array([
+            np.mean([float(part) for part in str(value).split('/')]) for value in uniques
+        ] + [np.nan])
+        return values[codes]
+
+    @staticmethod
+    def parse(df):
+        """为 DataFrame 添加数值列：home_goals, away_goals, home_ht, away_ht, line, finished"""
+        df = df.copy()
+        df['home_goals'], df['away_goals'] = MatchStats.parse_scores(df['score'].to_numpy())
+        df['home_ht'], df['away_ht'] = MatchStats.parse_scores(df['half_score'].to_numpy())
+        df['handicap'] = pd.to_numeric(df['handicap'], errors='coerce').astype('float64')
+        df['line'] = MatchStats.parse_goal_lines(df['goal_line'].to_numpy())
+        df['match_time'] = pd.to_datetime(df['match_time'])
+        df['finished'] = (df['state'].to_numpy() == Config.FINISHED_STATE) & (df['home_goals'].to_numpy() >= 0)
+        return df
+
+    # ---------- 统计 ----------
+    @staticmethod
+    def with_names(df, id_columns):
+        """为结果添加球队名称列（team_id -> team, home_id -> home ...）"""
+        registry = TeamRegistry.get()
+        for column in id_columns:
+            df[column[:-3]] = registry.names_of(df[column].to_numpy())
+        return df
+
+    @staticmethod
+    def team_rows(df):
+        """已结束比赛展开为球队视角（每场两行）"""
+        done = df[df['finished']]
+        keys = ['league_id', 'season', 'match_id', 'match_time']
+        home = done[keys].assign(team_id=done['home_id'].to_numpy(), gf=done['home_goals'].to_numpy(),
+                                 ga=done['away_goals'].to_numpy(), venue='home')
+        away = done[keys].assign(team_id=done['away_id'].to_numpy(), gf=done['away_goals'].to_numpy(),
+                                 ga=done['home_goals'].to_numpy(), venue='away')
+        rows = pd.concat([home, away], ignore_index=True)
+        diff = rows['gf'].to_numpy() - rows['ga'].to_numpy()
+        rows['won'] = diff > 0
+        rows['drawn'] = diff == 0
+        rows['lost'] = diff < 0
+        return rows
+
+    @staticmethod
+    def standings(df):
+        """积分榜（按 联赛ID + 赛季 分组），排序：积分 > 净胜球 > 进球"""
+        rows = MatchStats.team_rows(df)
+        table = rows.groupby(['league_id', 'season', 'team_id'], sort=False).agg(
+            played=('gf', 'size'), won=('won', 'sum'), drawn=('drawn', 'sum'),
+            lost=('lost', 'sum'), gf=('gf', 'sum'), ga=('ga', 'sum')
+        ).reset_index()
+        table['gd'] = table['gf'] - table['ga']
+        table['points'] = table['won'] * Config.WIN_POINTS + table['drawn'] * Config.DRAW_POINTS
+        table = table.sort_values(
+            ['league_id', 'season', 'points', 'gd', 'gf', 'team_id'],
+            ascending=[True, True, False, False, False, True]
+        ).reset_index(drop=True)
+        table.insert(3, 'rank', table.groupby(['league_id', 'season']).cumcount() + 1)
+        table.insert(5, 'team', TeamRegistry.get().names_of(table['team_id'].to_numpy()))
+        return table
+
+    @staticmethod
+    def form(df, n=5):
+        """各球队最近 n 场战绩，如 'WWDLW'（按时间先后排列）"""
+        rows = MatchStats.team_rows(df).sort_values(['match_time', 'match_id'], kind='stable')
+        rows['result'] = np.select([rows['won'], rows['drawn']], ['W', 'D'], default='L')
+        recent = rows.groupby(['league_id', 'season', 'team_id'], sort=False).tail(n)
+        form = recent.groupby(['league_id', 'season', 'team_id'])['result'].agg(''.join).rename('form').reset_index()
+        return MatchStats.with_names(form, ['team_id'])
+
+    @staticmethod
+    def split_line_result(margin, line):
+        """盘口结算：四分之一盘拆成两半分别结算
+        Returns:
+            ndarray: 1=赢, 0.5=赢半, 0=走, -0.5=输半, -1=输；无盘口为 NaN
+        """
+        quarter = np.isclose(np.mod(line * 4, 2), 1)
+        low = np.where(quarter, line - 0.25, line)
+        high = np.where(quarter, line + 0.25, line)
+        return (np.sign(margin - low) + np.sign(margin - high)) / 2
+
+    @staticmethod
+    def over_under(df):
+        """大小球结果：1=大, 0.5=大半, 0=走, -0.5=小半, -1=小"""
+        done = df[df['finished']]
+        total = (done['home_goals'] + done['away_goals']).to_numpy(dtype='float64')
+        result = MatchStats.split_line_result(total, done['line'].to_numpy())
+        result = done[['match_id', 'league_id', 'season', 'home_id', 'away_id', 'goal_line']].assign(
+            total_goals=total.astype(int), ou_result=result
+        ).reset_index(drop=True)
+        return MatchStats.with_names(result, ['home_id', 'away_id'])
+
+    @staticmethod
+    def handicap_results(df):
+        """让球结果（主队视角，让球为主队让出的球数）：1=赢, 0.5=赢半, 0=走, -0.5=输半, -1=输"""
+        done = df[df['finished']]
+        margin = (done['home_goals'] - done['away_goals']).to_numpy(dtype='float64')
+        result = MatchStats.split_line_result(margin, done['handicap'].to_numpy())
+        result = done[['match_id', 'league_id', 'season', 'home_id', 'away_id', 'handicap']].assign(
+            margin=margin.astype(int), handicap_result=result
+        ).reset_index(drop=True)
+        return MatchStats.with_names(result, ['home_id', 'away_id'])
+
+    @staticmethod
+    def label(results):
+        """赛果数值 -> 中文标签"""
+        return pd.Series(results).map(Config.RESULT_LABELS)
+
+    # ---------- 汇总（按数据量选择实现） ----------
+    @staticmethod
+    def summary(sources, vectorized=None):
+        """积分、大小球结果、让球结果
+        Args:
+            sources: 同 load_json
+            vectorized: None 时按比赛数自动选择；True/False 强制使用向量化/逐行循环实现
+        Returns:
+            tuple: ({(联赛ID, 赛季, 球队ID): 积分}, {比赛ID: 大小球结果}, {比赛ID: 让球结果})，
+                   结果数值同 over_under / handicap_results，无盘口的比赛不包含在内
+        """
+        sources = list(MatchStats.iter_sources(sources))
+        if vectorized is None:
+            count = sum(len(matches) for _, data in sources for group in data.values() for matches in group.values())
+            vectorized = count > Config.LOOP_MAX_MATCHES
+        if vectorized:
+            return MatchStats.frame_summary(MatchStats.load_json(sources))
+        return MatchStats.loop_summary(sources)
+
+    @staticmethod
+    def frame_summary(df):
+        """在已解析的 DataFrame 上汇总（向量化，可重复调用）"""
+        table = MatchStats.standings(df)
+        points = dict(zip(zip(table['league_id'].tolist(), table['season'], table['team_id'].tolist()),
+                          table['points'].tolist()))
+        results = []
+        for frame, column in ((MatchStats.over_under(df), 'ou_result'),
+                              (MatchStats.handicap_results(df), 'handicap_result')):
+            frame = frame[frame[column].notna()]
+            results.append(dict(zip(frame['match_id'].tolist(), frame[column].tolist())))
+        return points, results[0], results[1]
+
+    @staticmethod
+    def loop_summary(sources):
+        """逐行循环汇总（数据量小时比向量化实现快）"""
+        registry = TeamRegistry.get()
+
+        def line_result(margin, line):
+            low, high = (line - 0.25, line + 0.25) if (line * 4) % 2 == 1 else (line, line)
+            return (((margin > low) - (margin < low)) + ((margin > high) - (margin < high))) / 2
+
+        def team_id(match, id_field, name_field):
+            qtid = match.get(id_field)
+            return int(qtid) if qtid is not None else registry.id_of(match.get(name_field))
+
+        latest = {}
+        for season, data in MatchStats.iter_sources(sources):
+            for group in data.values():
+                for matches in group.values():
+                    for match in matches:
+                        latest[match['比赛ID']] = (season, match)
+
+        table, ou_results, handicap_results = {}, {}, {}
+        for match_id, (season, match) in latest.items():
+            score = match.get('全场比分')
+            if match['状态返回值'] != Config.FINISHED_STATE or not score:
+                continue
+            home_goals, away_goals = (int(x) for x in score.split('-'))
+            league = match['联赛ID']
+            for qtid, gf, ga in ((team_id(match, '主队ID', '主队'), home_goals, away_goals),
+                                 (team_id(match, '客队ID', '客队'), away_goals, home_goals)):
+                key = (league, season, qtid)
+                table[key] = table.get(key, 0) + (Config.WIN_POINTS if gf > ga else
+                                                  Config.DRAW_POINTS if gf == ga else 0)
+            if match.get('总进球'):
+                parts = [float(part) for part in str(match['总进球']).split('/')]
+                ou_results[match_id] = line_result(home_goals + away_goals, sum(parts) / len(parts))
+            if match.get('让球') is not None:
+                handicap_results[match_id] = line_result(home_goals - away_goals, float(match['让球']))
+        return table, ou_results, handicap_results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='比赛统计：积分榜、近期战绩')
+    parser.add_argument('files', nargs='*', help='*_Matches.json 文件，默认使用列式存储')
+    parser.add_argument('--form', type=int, default=5, help='近期战绩场数')
+    args = parser.parse_args()
+
+    df = MatchStats.load_json(args.files) if args.files else MatchStats.load_store()
+    table = MatchStats.standings(df).merge(
+        MatchStats.form(df, args.form).drop(columns='team'), on=['league_id', 'season', 'team_id'], how='left'
+    )
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(table)
+
+
+if __name__ == '__main__':
+    main()
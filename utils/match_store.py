@@ -0,0 +1,384 @@
+''' 列式比赛数据存储
+    - 将 *_Matches.json（按轮次分组的嵌套结构）转换为按列存储的 NumPy 数组，主键为比赛ID。
+    - 球队列保存整数球队ID(qtid，通过 team_registry 解析名称)；比分、排名、盘口列做字典编码。
+    - 二级索引：联赛ID、主队/客队、比赛时间，均为排序后的行号数组，查询使用二分查找。
+    - 所有数组以 .npy 保存，加载时使用内存映射(mmap)，无需反序列化JSON即可查询多个赛季。
+'''
+import glob
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+from team_registry import TeamRegistry
+from log_utils import setup_logging
+from file_utils import atomic_write, read_jsonl, write_json
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """列式存储配置
+    属性说明：
+        MATCHES_DIRS: 扫描 *_Matches.json 的目录
+        STORE_DIR: 列式存储输出目录
+        COLUMNS: JSON字段 -> (列名, 类型)，类型为 NumPy dtype、'team'(球队ID) 或 'dict:字典名'
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    MATCHES_DIRS = [
+        os.path.join(BASE_DIR, 'LocalOutputFiles'),
+        os.path.join(BASE_DIR, 'LocalOutputFiles', 'Matches')
+    ]
+    STORE_DIR = os.path.join(BASE_DIR, 'LocalOutputFiles', 'MatchStore')
+
+    COLUMNS = {
+        '比赛ID': ('match_id', 'int64'),
+        '联赛ID': ('league_id', 'int32'),
+        '状态返回值': ('state', 'int16'),
+        '比赛时间': ('match_time', 'int64'),        # 距1970-01-01的分钟数，缺失为 -1
+        '主队': ('home', 'team'),              # 优先使用 主队ID 字段，否则按名称查球队字典
+        '客队': ('away', 'team'),
+        '全场比分': ('score', 'dict:score'),
+        '半场比分': ('half_score', 'dict:score'),
+        '主队排名': ('home_rank', 'dict:rank'),
+        '客队排名': ('away_rank', 'dict:rank'),
+        '让球': ('handicap', 'float32'),            # 缺失为 NaN
+        '总进球': ('goal_line', 'dict:goal_line'),
+        '主队排名显示': ('home_rank_display', 'dict:rank'),
+        '客队排名显示': ('away_rank_display', 'dict:rank')
+    }
+    # 另有 season（字典编码，来源于文件名）、round（来源于 Round_N 分组）两列
+
+
+def parse_time(value):
+    """'2024-08-17 03:00' -> 分钟数，缺失返回 -1"""
+    if not value:
+        return -1
+    return int(np.datetime64(value.replace(' ', 'T'), 'm').astype('int64'))
+
+
+def season_from_filename(path):
+    """从文件名中提取赛季，如 2024-2025EngLand_Matches.json -> 2024-2025"""
+    match = re.match(r'(\d{4}(?:-\d{4})?)', os.path.basename(path))
+    return match.group(1) if match else ''
+
+
+class MatchStore:
+    """列式比赛存储
+
+    用法：
+        MatchStore.build(json_files, store_dir)                # 从JSON构建
+        store = MatchStore.load(store_dir)                     # 以内存映射方式加载
+        rows = store.query(team='阿森纳', start='2024-09-01')   # 行号数组
+        store.records(rows)                                    # 转换为与JSON一致的字典列表
+    """
+
+    def __init__(self, columns, dictionaries, meta, store_dir=None):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.meta = meta
+        self.store_dir = store_dir
+        # 字典反查：字典名 -> {字符串: 编码}
+        self._codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in dictionaries.items() if isinstance(values, list)
+        }
+        self.registry = TeamRegistry.get()
+
+    def __len__(self):
+        return len(self.columns['match_id'])
+
+    # ---------- 构建 ----------
+    @staticmethod
+    def find_json_files(dirs=None):
+        files = []
+        for directory in dirs or Config.MATCHES_DIRS:
+            files.extend(sorted(glob.glob(os.path.join(directory, '*_Matches.json'))))
+            files.extend(sorted(glob.glob(os.path.join(directory, '*_Matches.jsonl'))))
+        return files
+
+    @staticmethod
+    def iter_matches(json_files):
+        """遍历JSON文件中的比赛，返回 (比赛, 赛季, 轮次)；同一比赛ID以后出现的为准
+        JSONL 文件每行一场比赛（含 轮次 字段），同一比赛的追加记录按出现顺序覆盖
+        """
+        for path in json_files:
+            season = season_from_filename(path)
+            if path.endswith('.jsonl'):
+                for record in read_jsonl(path):
+                    match = dict(record)
+                    yield match, season, int(match.pop('轮次'))
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                grouped = json.load(f)
+            for group in grouped.values():
+                for round_name, matches in group.items():
+                    round_no = int(round_name.split('_')[1])
+                    for match in matches:
+                        yield match, season, round_no
+
+    @staticmethod
+    def build(json_files=None, store_dir=Config.STORE_DIR):
+        """从 *_Matches.json 构建列式存储并写入 store_dir"""
+        json_files = json_files if json_files is not None else MatchStore.find_json_files()
+
+        latest = {}
+        for match, season, round_no in MatchStore.iter_matches(json_files):
+            latest[match['比赛ID']] = (match, season, round_no)
+        items = [latest[match_id] for match_id in sorted(latest)]   # 按主键排序存放
+
+        dictionaries = {}
+        codes = {}
+
+        def encode(dict_name, value):
+            if value is None:
+                return -1
+            value = str(value)
+            table = codes.setdefault(dict_name, {})
+            if value not in table:
+                table[value] = len(table)
+                dictionaries.setdefault(dict_name, []).append(value)
+            return table[value]
+
+        registry = TeamRegistry.get()
+        columns = {}
+        for field, (name, kind) in Config.COLUMNS.items():
+            if kind == 'team':
+                values = [
+                    match[f"{field}ID"] if match.get(f"{field}ID") is not None else registry.id_of(match.get(field))
+                    for match, _, _ in items
+                ]
+                dtype = 'int32'
+            elif kind.startswith('dict:'):
+                values = [encode(kind[5:], match.get(field)) for match, _, _ in items]
+                dtype = 'int32'
+            elif field == '比赛时间':
+                values = [parse_time(match.get(field)) for match, _, _ in items]
+                dtype = kind
+            elif kind.startswith('float'):
+                values = [np.nan if match.get(field) is None else match[field] for match, _, _ in items]
+                dtype = kind
+            else:
+                values = [match.get(field) for match, _, _ in items]
+                dtype = kind
+            columns[name] = np.asarray(values, dtype=dtype)
+        columns['season'] = np.asarray([encode('season', season) for _, season, _ in items], dtype='int32')
+        columns['round'] = np.asarray([round_no for _, _, round_no in items], dtype='int16')
+        # 不在球队文件中的名称使用临时ID，与存储一起保存
+        dictionaries['team_provisional'] = {str(k): v for k, v in registry.provisional().items()}
+
+        indexes = MatchStore.build_indexes(columns)
+        meta = {
+            'rows': len(items),
+            'columns': {name: str(array.dtype) for name, array in columns.items()},
+            'sources': {path: os.path.getmtime(path) for path in json_files}
+        }
+
+        # 每个文件原子替换，meta.json 最后写入：中途失败时 is_stale 会触发重建
+        os.makedirs(store_dir, exist_ok=True)
+        for name, array in list(columns.items()) + list(indexes.items()):
+            with atomic_write(os.path.join(store_dir, f"{name}.npy"), 'wb') as f:
+                np.save(f, array)
+        write_json(os.path.join(store_dir, 'dictionaries.json'), dictionaries, indent=None)
+        write_json(os.path.join(store_dir, 'meta.json'), meta)
+
+        logger.info("列式存储已保存到: %s，比赛数: %s", store_dir, len(items))
+        return MatchStore(dict(columns, **indexes), dictionaries, meta, store_dir)
+
+    @staticmethod
+    def build_indexes(columns):
+        """二级索引：排序后的键数组 + 对应的行号数组"""
+        home, away = columns['home'], columns['away']
+        team_rows = np.concatenate([np.arange(len(home)), np.arange(len(away))])
+        team_keys = np.concatenate([home, away])
+        team_order = np.argsort(team_keys, kind='stable')
+        league_order = np.argsort(columns['league_id'], kind='stable')
+        time_order = np.argsort(columns['match_time'], kind='stable')
+        return {
+            'idx_league_keys': columns['league_id'][league_order],
+            'idx_league_rows': league_order,
+            'idx_time_keys': columns['match_time'][time_order],
+            'idx_time_rows': time_order,
+            'idx_team_keys': team_keys[team_order],
+            'idx_team_rows': team_rows[team_order]
+        }
+
+    @staticmethod
+    def is_stale(store_dir=Config.STORE_DIR, json_files=None):
+        """源JSON文件新增或修改时需要重建"""
+        meta_file = os.path.join(store_dir, 'meta.json')
+        if not os.path.exists(meta_file):
+            return True
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            sources = json.load(f)['sources']
+        json_files = json_files if json_files is not None else MatchStore.find_json_files()
+        return (set(sources) != set(json_files)
+                or any(os.path.getmtime(path) != sources[path] for path in json_files))
+
+    @staticmethod
+    def refresh(store_dir=Config.STORE_DIR, json_files=None):
+        """源文件有变化时重建，否则直接加载"""
+        if MatchStore.is_stale(store_dir, json_files):
+            return MatchStore.build(json_files, store_dir)
+        return MatchStore.load(store_dir)
+
+    # ---------- 加载 ----------
+    @staticmethod
+    def load(store_dir=Config.STORE_DIR, mmap=True):
+        """加载列式存储，mmap=True 时数组以只读内存映射方式打开"""
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(store_dir, 'dictionaries.json'), 'r', encoding='utf-8') as f:
+            dictionaries = json.load(f)
+        registry = TeamRegistry.get()
+        # 临时ID的名称之后可能已出现在球队文件中（或ID已被占用），按实际ID重映射
+        remap = {}
+        provisional = {}
+        for qtid, name in dictionaries.get('team_provisional', {}).items():
+            actual = registry.register_provisional(name, int(qtid))
+            if actual != int(qtid):
+                remap[int(qtid)] = actual
+            if actual < 0:
+                provisional[str(actual)] = name
+        dictionaries['team_provisional'] = provisional
+        columns = {}
+        for path in glob.glob(os.path.join(store_dir, '*.npy')):
+            name = os.path.splitext(os.path.basename(path))[0]
+            columns[name] = np.load(path, mmap_mode='r' if mmap else None)
+        if remap:
+            MatchStore.remap_teams(columns, remap)
+        return MatchStore(columns, dictionaries, meta, store_dir)
+
+    @staticmethod
+    def remap_teams(columns, remap):
+        """球队列中的旧ID替换为新ID（复制到内存），并重建球队索引"""
+        for side in ('home', 'away'):
+            original = np.asarray(columns[side])
+            values = original.copy()
+            for old, new in remap.items():
+                values[original == old] = new
+            columns[side] = values
+        indexes = MatchStore.build_indexes(columns)
+        columns['idx_team_keys'] = indexes['idx_team_keys']
+        columns['idx_team_rows'] = indexes['idx_team_rows']
+        logger.info("列式存储球队临时ID已重映射: %s 个", len(remap))
+
+    # ---------- 查询（均返回行号数组） ----------
+    def code(self, dict_name, value):
+        """字符串 -> 字典编码，不存在时返回 None"""
+        return self._codes.get(dict_name, {}).get(str(value))
+
+    def get(self, match_id):
+        """按比赛ID查询单场比赛，不存在返回 None"""
+        match_ids = self.columns['match_id']
+        pos = int(np.searchsorted(match_ids, match_id))
+        if pos < len(match_ids) and match_ids[pos] == match_id:
+            return self.record(pos)
+        return None
+
+    def by_league(self, league_id):
+        keys = self.columns['idx_league_keys']
+        start, end = np.searchsorted(keys, [league_id, league_id + 1])
+        return np.sort(self.columns['idx_league_rows'][start:end])
+
+    def by_team(self, team, side=None):
+        """按球队查询
+        Args:
+            team: 球队ID(qtid) 或名称
+            side: None=主客场均可, 'home'=仅主队, 'away'=仅客队
+        """
+        code = team if isinstance(team, (int, np.integer)) else self.registry.id_of(team, register=False)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        if side in ('home', 'away'):
+            return np.flatnonzero(self.columns[side] == code)
+        keys = self.columns['idx_team_keys']
+        start, end = np.searchsorted(keys, [code, code + 1])
+        return np.unique(self.columns['idx_team_rows'][start:end])
+
+    def by_season(self, season):
+        code = self.code('season', season)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.columns['season'] == code)
+
+    def between(self, start=None, end=None):
+        """查询比赛时间在 [start, end] 区间内的比赛，参数格式 '2024-08-17' 或 '2024-08-17 03:00'"""
+        keys = self.columns['idx_time_keys']
+        low = parse_time(start) if start else 0
+        high = parse_time(end) if end else np.iinfo(np.int64).max - 1
+        if end and len(end) <= 10:      # 只有日期时包含当天全部比赛
+            high += 24 * 60 - 1
+        lo, hi = np.searchsorted(keys, [low, high + 1])
+        return np.sort(self.columns['idx_time_rows'][lo:hi])
+
+    def query(self, league_id=None, team=None, season=None, start=None, end=None):
+        """组合查询，条件之间为 AND"""
+        rows = None
+        for result in (
+            self.by_league(league_id) if league_id is not None else None,
+            self.by_team(team) if team is not None else None,
+            self.by_season(season) if season is not None else None,
+            self.between(start, end) if start or end else None
+        ):
+            if result is not None:
+                rows = result if rows is None else np.intersect1d(rows, result, assume_unique=True)
+        return rows if rows is not None else np.arange(len(self))
+
+    # ---------- 结果转换 ----------
+    def _decode(self, kind, value):
+        if kind.startswith('dict:'):
+            return None if value < 0 else self.dictionaries[kind[5:]][value]
+        return value
+
+    def record(self, row):
+        """行号 -> 与 *_Matches.json 字段一致的字典"""
+        match = {}
+        for field, (name, kind) in Config.COLUMNS.items():
+            value = self.columns[name][row].item()
+            if kind == 'team':
+                match[f"{field}ID"] = value
+                value = self.registry.name(value)
+            elif name == 'match_time':
+                value = None if value < 0 else str(np.datetime64(value, 'm')).replace('T', ' ')
+            elif kind.startswith('float'):
+                value = None if np.isnan(value) else value
+            else:
+                value = self._decode(kind, value)
+            match[field] = value
+        match['赛季'] = self._decode('dict:season', self.columns['season'][row].item())
+        match['轮次'] = int(self.columns['round'][row])
+        return match
+
+    def records(self, rows):
+        return [self.record(int(row)) for row in rows]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='列式比赛存储：构建与查询')
+    parser.add_argument('--build', action='store_true', help='强制重建列式存储')
+    parser.add_argument('--match', type=int, help='比赛ID')
+    parser.add_argument('--league', type=int, help='联赛ID')
+    parser.add_argument('--team', help='球队名称')
+    parser.add_argument('--season', help='赛季，如 2024-2025')
+    parser.add_argument('--start', help='开始日期')
+    parser.add_argument('--end', help='结束日期')
+    args = parser.parse_args()
+    setup_logging()
+
+    store = MatchStore.build() if args.build else MatchStore.refresh()
+    if args.match is not None:
+        print(json.dumps(store.get(args.match), ensure_ascii=False, indent=4))
+        return
+
+    rows = store.query(args.league, args.team, args.season, args.start, args.end)
+    for match in store.records(rows):
+        print(f"{match['比赛时间']}  {match['主队']} {match['全场比分'] or '-'} {match['客队']}")
+    print(f"\n共 {len(rows)} 场比赛")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+''' 运行指标：计数器、直方图、计时区间(span)
+    - 进程内汇总，线程安全；记录一次只做一次字典查找和加法，不产生控制台输出。
+    - 运行结束后输出汇总报告，可选导出 JSON 或 Prometheus 文本格式（环境变量 QT_METRICS_OUTPUT 指定文件）。
+    常用指标：
+        http_requests_total{status}   http_request_seconds{status}   http_bytes_total
+        url_cache_hits_total          url_cache_misses_total
+        parse_seconds{stage}          db_rows_total{op}               db_seconds{op}
+        db_batch_seconds{table}       export_seconds{target}
+'''
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """指标配置
+    属性说明：
+        OUTPUT_FILE: 导出文件路径，扩展名 .json 输出JSON，其余输出 Prometheus 文本
+        BUCKETS: 直方图默认分桶（秒）
+    """
+    OUTPUT_FILE = os.environ.get('QT_METRICS_OUTPUT')
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, buckets=Config.BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+            'avg': self.sum / self.count if self.count else None,
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class Metrics:
+    """进程内指标注册表
+
+    用法：
+        Metrics.inc('http_requests_total', status=200)
+        Metrics.observe('http_request_seconds', 0.12, status=200)
+        with Metrics.span('parse', stage='load_area_data'):
+            ...
+        Metrics.report()
+    """
+    _lock = threading.Lock()
+    _counters = {}      # (名称, 标签元组) -> 数值
+    _histograms = {}    # (名称, 标签元组) -> Histogram
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    @staticmethod
+    def inc(name, value=1, **labels):
+        key = Metrics._key(name, labels)
+        with Metrics._lock:
+            Metrics._counters[key] = Metrics._counters.get(key, 0) + value
+
+    @staticmethod
+    def observe(name, value, **labels):
+        key = Metrics._key(name, labels)
+        with Metrics._lock:
+            histogram = Metrics._histograms.get(key)
+            if histogram is None:
+                histogram = Metrics._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @staticmethod
+    @contextmanager
+    def span(name, **labels):
+        """计时区间，耗时记录到直方图 {name}_seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Metrics.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def timed(name, **labels):
+        """函数装饰器，耗时记录到直方图 {name}_seconds"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with Metrics.span(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def reset():
+        with Metrics._lock:
+            Metrics._counters.clear()
+            Metrics._histograms.clear()
+
+    # ---------- 输出 ----------
+    @staticmethod
+    def _label_str(labels):
+        return ','.join(f'{k}="{v}"' for k, v in labels)
+
+    @staticmethod
+    def snapshot():
+        with Metrics._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(Metrics._counters.items(), key=str)
+                ],
+                'histograms': [
+                    dict({'name': name, 'labels': dict(labels)}, **histogram.to_dict())
+                    for (name, labels), histogram in sorted(Metrics._histograms.items(), key=str)
+                ]
+            }
+
+    @staticmethod
+    def to_json():
+        return json.dumps(Metrics.snapshot(), ensure_ascii=False, indent=4)
+
+    @staticmethod
+    def to_prometheus():
+        lines = []
+        with Metrics._lock:
+            for (name, labels), value in sorted(Metrics._counters.items(), key=str):
+                label_str = Metrics._label_str(labels)
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+            for (name, labels), histogram in sorted(Metrics._histograms.items(), key=str):
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    label_str = Metrics._label_str(labels + (('le', bound),))
+                    lines.append(f"{name}_bucket{{{label_str}}} {cumulative}")
+                label_str = Metrics._label_str(labels)
+                suffix = f"{{{label_str}}}" if label_str else ''
+                lines.append(f"{name}_sum{suffix} {histogram.sum}")
+                lines.append(f"{name}_count{suffix} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def summary():
+        """可读的汇总报告"""
+        data = Metrics.snapshot()
+        lines = ["\n=== 运行指标汇总 ==="]
+        for item in data['counters']:
+            label_str = ','.join(f"{k}={v}" for k, v in item['labels'].items())
+            lines.append(f"{item['name']:<28}{label_str:<24}{item['value']}")
+        if data['histograms']:
+            lines.append(f"\n{'耗时指标':<28}{'标签':<24}{'次数':>8}{'合计(秒)':>12}{'平均(秒)':>12}{'最大(秒)':>12}")
+            for item in data['histograms']:
+                label_str = ','.join(f"{k}={v}" for k, v in item['labels'].items())
+                lines.append(f"{item['name']:<28}{label_str:<24}{item['count']:>8}"
+                             f"{item['sum']:>12.3f}{item['avg']:>12.4f}{item['max']:>12.4f}")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def write(path):
+        """按扩展名导出：.json -> JSON，其余 -> Prometheus 文本"""
+        content = Metrics.to_json() if path.endswith('.json') else Metrics.to_prometheus()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    @staticmethod
+    def report(output_file=None):
+        """打印汇总报告，并在配置了输出文件时导出"""
+        logger.info("%s", Metrics.summary())
+        output_file = output_file or Config.OUTPUT_FILE
+        if output_file:
+            Metrics.write(output_file)
+            logger.info("指标已导出到: %s", output_file)
@@ -0,0 +1,141 @@
+''' 原始JS快照存储（按内容寻址）
+    - 每份内容以 SHA-256 为键压缩保存一次（objects/ab/abcdef....gz，安装 zstandard 时使用 .zst），
+      相同内容只保存一份。
+    - 索引文件 index.jsonl 记录每个URL的哈希历史（只在内容变化时追加一行：URL、哈希、时间、大小）。
+    - 变化检测只比较哈希，不再复制和比较整个字符串；历史快照可直接读取重新解析，无需重新下载。
+    用法：
+        store = SnapshotStore.get()
+        digest, changed = store.put(url, js_content)
+        store.save()
+        js_content = store.load(url)             # 最新快照
+        store.history(url)                       # [{'url', 'hash', 'time', 'size'}, ...]
+'''
+import gzip
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+from file_utils import append_jsonl, atomic_write, read_jsonl
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """快照存储配置
+    属性说明：
+        STORE_DIR: 存储目录（objects/ 压缩内容，index.jsonl URL哈希历史）
+        CODECS: 压缩格式优先级，未安装 zstandard 时使用 gzip
+        GZIP_LEVEL: gzip 压缩级别
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    STORE_DIR = os.path.join(BASE_DIR, 'QtLocal_SourceJS', 'snapshots')
+    CODECS = ('zstd', 'gzip')
+    GZIP_LEVEL = 6
+
+
+_EXTENSIONS = {'zstd': '.zst', 'gzip': '.gz'}
+
+
+def content_hash(content):
+    """内容哈希（字符串按 UTF-8 编码）"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def _compress(codec, data):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data, compresslevel=Config.GZIP_LEVEL)
+
+
+def _decompress(codec, data):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class SnapshotStore:
+    """URL -> 内容哈希历史，哈希 -> 压缩内容（进程内单例）"""
+    _instance = None
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or Config.STORE_DIR
+        self.index_file = os.path.join(self.store_dir, 'index.jsonl')
+        self.codec = self.available_codec()
+        self.index = {}      # URL -> [历史条目]
+        self.pending = []    # 尚未写入索引的条目
+        self._lock = threading.Lock()   # 多线程请求时保护索引
+        for entry in read_jsonl(self.index_file):
+            self.index.setdefault(entry['url'], []).append(entry)
+
+    @classmethod
+    def get(cls):
+        """返回进程内单例，首次调用时加载索引"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def available_codec():
+        for codec in Config.CODECS:
+            if codec == 'gzip' or importlib.util.find_spec('zstandard'):
+                return codec
+        return 'gzip'
+
+    def object_path(self, digest, codec):
+        return os.path.join(self.store_dir, 'objects', digest[:2], digest + _EXTENSIONS[codec])
+
+    def latest(self, url):
+        """URL最新快照的哈希，没有记录时返回 None"""
+        entries = self.index.get(url)
+        return entries[-1]['hash'] if entries else None
+
+    def history(self, url):
+        return list(self.index.get(url, []))
+
+    def put(self, url, content):
+        """保存快照
+        Returns:
+            tuple: (哈希, 与该URL上一次快照相比是否变化；没有历史时为 True)
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = content_hash(data)
+        if not any(os.path.exists(self.object_path(digest, codec)) for codec in _EXTENSIONS):
+            os.makedirs(os.path.dirname(self.object_path(digest, self.codec)), exist_ok=True)
+            with atomic_write(self.object_path(digest, self.codec), 'wb') as f:
+                f.write(_compress(self.codec, data))
+        with self._lock:
+            if self.latest(url) == digest:
+                return digest, False
+            entry = {'url': url, 'hash': digest, 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'size': len(data)}
+            self.index.setdefault(url, []).append(entry)
+            self.pending.append(entry)
+        logger.debug("新快照: %s -> %s", url, digest[:12])
+        return digest, True
+
+    def read(self, digest):
+        """按哈希读取内容（字符串），不存在时返回 None"""
+        for codec in _EXTENSIONS:
+            path = self.object_path(digest, codec)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return _decompress(codec, f.read()).decode('utf-8')
+        return None
+
+    def load(self, url, digest=None):
+        """读取URL的快照（默认最新），没有记录时返回 None"""
+        digest = digest or self.latest(url)
+        return self.read(digest) if digest else None
+
+    def save(self):
+        """把新增的历史条目追加到索引"""
+        with self._lock:
+            pending, self.pending = self.pending, []
+        if pending:
+            append_jsonl(self.index_file, pending)
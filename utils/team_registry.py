@@ -0,0 +1,140 @@
+''' 球队字典缓存
+    - 以 qtid 为键加载 *_Team.json（qtid、简繁英名称、logo），整个进程只加载一次。
+    - 名称字符串使用 sys.intern 驻留，多赛季重复出现的球队只保留一份字符串。
+    - 比赛数据中只保存整数球队ID，名称通过本字典解析；球队与比赛的关联变为整数运算。
+    - 名称不在球队文件中的球队分配临时ID（负数，从 -2 开始；-1 表示缺失）。
+'''
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+class Config:
+    """球队字典配置
+    属性说明：
+        TEAM_DIRS: 扫描 *_Team.json 的目录
+        NAME_FIELDS: 可用于反查ID的名称字段
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    TEAM_DIRS = [
+        os.path.join(BASE_DIR, 'LocalOutputFiles'),
+        os.path.join(BASE_DIR, 'LocalOutputFiles', 'Matches')
+    ]
+    NAME_FIELDS = ('name_zh', 'name_zht', 'name_en')
+    MISSING_ID = -1
+
+
+class TeamRegistry:
+    """球队字典（进程内单例）
+
+    用法：
+        registry = TeamRegistry.get()
+        team_id = registry.id_of('阿森纳')          # 19
+        registry.name(19)                          # '阿森纳'
+        ids = registry.ids_of(df['主队'])           # 名称数组 -> 整数ID数组
+    """
+    _instance = None
+
+    def __init__(self):
+        self.teams = {}        # qtid -> 球队字典
+        self._ids = {}         # 名称 -> qtid
+        self._files = set()
+        self._next_provisional = Config.MISSING_ID - 1   # 下一个可用的临时ID
+
+    @classmethod
+    def get(cls, dirs=None):
+        """返回已加载的单例，首次调用时扫描球队文件"""
+        if cls._instance is None:
+            registry = cls()
+            for directory in dirs or Config.TEAM_DIRS:
+                for path in sorted(glob.glob(os.path.join(directory, '*_Team.json'))):
+                    registry.load_file(path)
+            cls._instance = registry
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        """清空单例（球队文件更新后调用）"""
+        cls._instance = None
+
+    # ---------- 加载 ----------
+    def load_file(self, path):
+        """加载单个 *_Team.json，已加载过的文件跳过"""
+        path = os.path.abspath(path)
+        if path in self._files:
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            self.add_teams(json.load(f))
+        self._files.add(path)
+
+    def add_teams(self, teams):
+        for team in teams:
+            qtid = int(team['qtid'])
+            record = {
+                key: sys.intern(value) if isinstance(value, str) else value
+                for key, value in team.items()
+            }
+            record['qtid'] = qtid
+            self.teams[qtid] = record
+            for field in Config.NAME_FIELDS:
+                if record.get(field):
+                    self._ids.setdefault(record[field], qtid)
+
+    # ---------- 查询 ----------
+    def __len__(self):
+        return len(self.teams)
+
+    def team(self, qtid):
+        return self.teams.get(qtid)
+
+    def name(self, qtid, field='name_zh'):
+        team = self.teams.get(qtid)
+        return team.get(field) if team else None
+
+    def id_of(self, name, register=True):
+        """名称 -> qtid；未知名称在 register=True 时分配临时ID，否则返回 None"""
+        if name is None:
+            return Config.MISSING_ID
+        qtid = self._ids.get(name)
+        if qtid is None and register:
+            qtid = self.register_provisional(name)
+        return qtid
+
+    def register_provisional(self, name, qtid=None):
+        """为不在球队文件中的名称分配临时ID（负数）
+        Args:
+            qtid: 希望使用的临时ID（如列式存储中保存的ID）；已被其他球队占用时另行分配
+        Returns:
+            int: 实际使用的ID；名称已有ID（包括之后出现在球队文件中）时返回已有ID
+        """
+        if name in self._ids:
+            return self._ids[name]
+        if qtid is None or qtid in self.teams:
+            qtid = self._next_provisional
+        self._next_provisional = min(self._next_provisional, qtid - 1)
+        name = sys.intern(name)
+        self.teams[qtid] = {'qtid': qtid, 'name_zh': name, 'name_zht': name, 'name_en': name}
+        self._ids[name] = qtid
+        return qtid
+
+    def provisional(self):
+        """临时ID -> 名称，用于与比赛数据一起持久化"""
+        return {qtid: team['name_zh'] for qtid, team in self.teams.items() if qtid < 0}
+
+    # ---------- 向量化转换 ----------
+    def ids_of(self, names):
+        """名称数组 -> int32 ID数组（相同名称只查一次）"""
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        lookup = np.array([self.id_of(name) for name in uniques] + [Config.MISSING_ID], dtype='int32')
+        return lookup[codes]
+
+    def names_of(self, ids, field='name_zh'):
+        """ID数组 -> 名称数组（object）"""
+        ids = np.asarray(ids)
+        uniques, inverse = np.unique(ids, return_inverse=True)
+        names = np.array([self.name(int(qtid), field) for qtid in uniques], dtype=object)
+        return names[inverse.reshape(ids.shape)]
@@ -0,0 +1,88 @@
+''' 赛事页面URL路径解析
+    - 记录每个赛事ID实际可访问的路径（League / SubLeague / CupMatch），保存在本地JSON文件中，
+      下次运行时先请求已知可用的路径，联赛不再先请求失效路径再退回备用路径。
+    - 按类型编码统计各路径的命中次数（先验），未见过的赛事按先验从高到低尝试，次数相同时保持默认顺序。
+    - 已知路径失效时按顺序尝试其余路径，并更新记录。
+'''
+import json
+import logging
+import os
+import threading
+
+from file_utils import write_json
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """URL路径解析配置
+    属性说明：
+        STATE_FILE: 路径记录文件（赛事ID -> 路径，类型编码 -> 各路径命中次数）
+    """
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    STATE_FILE = os.path.join(BASE_DIR, 'LocalOutputFiles', 'url_paths.json')
+
+
+class UrlPathResolver:
+    """赛事ID -> 页面路径
+
+    用法：
+        resolver = UrlPathResolver()
+        for path in resolver.candidates(event_id, type_code, ['League', 'SubLeague']):
+            if 请求 path 成功:
+                resolver.record(event_id, type_code, path)
+                break
+        resolver.save()
+    """
+
+    def __init__(self, state_file=None):
+        self.state_file = state_file or Config.STATE_FILE
+        self.paths = {}      # 赛事ID(str) -> 路径
+        self.priors = {}     # 类型编码(str) -> {路径: 命中次数}
+        self.dirty = False
+        self._lock = threading.Lock()   # 多线程验证URL时保护记录
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                self.paths = state.get('paths', {})
+                self.priors = state.get('priors', {})
+            except (OSError, ValueError) as e:
+                logger.warning("URL路径记录读取失败，将重新学习: %s", e)
+
+    def known(self, event_id):
+        """已记录的可用路径，没有时返回 None"""
+        return self.paths.get(str(event_id))
+
+    def candidates(self, event_id, type_code, defaults):
+        """按尝试顺序返回候选路径
+        Args:
+            defaults: 默认顺序（首选路径在前，其余为备用路径）
+        """
+        counts = self.priors.get(str(type_code), {})
+        ordered = sorted(defaults, key=lambda path: (-counts.get(path, 0), defaults.index(path)))
+        known = self.known(event_id)
+        if known in ordered:
+            ordered.remove(known)
+            ordered.insert(0, known)
+        return ordered
+
+    def record(self, event_id, type_code, path):
+        """记录赛事实际可用的路径（新学到或路径变化时才计入先验）"""
+        key = str(event_id)
+        with self._lock:
+            if self.paths.get(key) == path:
+                return
+            self.paths[key] = path
+            counts = self.priors.setdefault(str(type_code), {})
+            counts[path] = counts.get(path, 0) + 1
+            self.dirty = True
+
+    def save(self):
+        """有变化时保存记录"""
+        with self._lock:
+            if not self.dirty:
+                return
+            write_json(self.state_file, {'paths': self.paths, 'priors': self.priors}, indent=None)
+            self.dirty = False
+        logger.debug("URL路径记录已保存: %s（%s 个赛事）", self.state_file, len(self.paths))
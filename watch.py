@@ -0,0 +1,170 @@
+''' 常驻模式：定时轮询数据源，有变化时才执行后续流程（代替 cron 定时启动整个脚本）
+    - 进程常驻：HTTP连接池、数据库长连接、URL缓存/路径记录/失效URL记录都保持在内存中。
+    - 区域数据(AREAS_URL)：条件请求（ETag / Last-Modified），304 或内容哈希未变化时不做任何处理；
+      变化时执行 S1 的完整流程。
+    - 赛季数据(sea{赛事ID}.js)：按数据库中的赛事并发条件请求，内容保存快照；有变化时只把变化的内容交给 S2
+      重新处理（不再逐个验证全部URL），赛季表按区域增量重写。
+    - 每个任务按各自的间隔执行，出错只记录日志，下个周期重试；Ctrl+C / SIGTERM 时在当前任务结束后退出。
+    用法：
+        python watch.py                                   # 区域10分钟、赛季1小时
+        python watch.py --areas-interval 300 --seasons-interval 0   # 0 表示不轮询
+        python watch.py --once                            # 只轮询一次（测试用）
+'''
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(__file__))
+import S1_Areas
+from S2_GetAll_LeagueSeasons import LeagueSeasonFetcher
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'sql'))
+from db_utils import DatabaseUnavailableError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from metrics import Metrics
+from log_utils import setup_logging
+from http_client import HttpClient
+from dead_urls import DeadUrlCache
+from snapshot_store import SnapshotStore, content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class Config:
+    """常驻模式配置
+    属性说明：
+        AREAS_INTERVAL: 区域数据轮询间隔(秒)
+        SEASONS_INTERVAL: 赛季数据轮询间隔(秒)
+        TIMEOUT: 单个请求超时(秒)
+    """
+    AREAS_INTERVAL = int(os.environ.get('QT_WATCH_AREAS_INTERVAL', 600))
+    SEASONS_INTERVAL = int(os.environ.get('QT_WATCH_SEASONS_INTERVAL', 3600))
+    TIMEOUT = 10
+
+
+class Watcher:
+    def __init__(self, areas_interval=Config.AREAS_INTERVAL, seasons_interval=Config.SEASONS_INTERVAL):
+        self.jobs = [(name, interval, job) for name, interval, job in (
+            ('areas', areas_interval, self.poll_areas),
+            ('seasons', seasons_interval, self.poll_seasons)
+        ) if interval > 0]
+        self.next_run = {name: 0 for name, _, _ in self.jobs}
+        self.stop_event = threading.Event()
+        self.season_fetcher = LeagueSeasonFetcher()
+        self.headers = self.season_fetcher.headers
+        self.areas_failed = False
+
+    # ---------- 轮询任务 ----------
+    def fetch_if_changed(self, url):
+        """条件请求 + 内容哈希比较
+        Returns:
+            str: 内容有变化时返回内容；未变化(304 或哈希相同)或请求失败时返回 None
+        """
+        response = HttpClient.get_if_changed(url, headers=self.headers, timeout=Config.TIMEOUT)
+        if response is None or response.status_code != 200:
+            return None
+        content = HttpClient.text(response)
+        if SnapshotStore.get().latest(url) == content_hash(content):
+            Metrics.inc('watch_unchanged_total')
+            return None
+        return content
+
+    def poll_areas(self):
+        if self.areas_failed:
+            # 上次流程中途失败时快照可能已更新，按单次运行的方式重新获取并与数据库核对
+            logger.info("上次S1流程未完成，重新执行...")
+            S1_Areas.main()
+            self.areas_failed = False
+            return
+        content = self.fetch_if_changed(S1_Areas.Config.AREAS_URL)
+        if content is None:
+            logger.info("区域数据无变化")
+            return
+        logger.info("区域数据有变化，执行S1流程...")
+        Metrics.inc('watch_triggers_total', stage='S1')
+        self.areas_failed = True
+        S1_Areas.main(content)
+        self.areas_failed = False
+
+    def poll_seasons(self):
+        events_by_level = self.season_fetcher.get_events_by_level()
+        dead = DeadUrlCache.get()
+        urls = [self.season_fetcher.generate_season_url(event['event_id'])
+                for events in events_by_level.values() for event in events]
+        urls = [url for url in urls if not dead.should_skip(url)]
+        changed = {url: content for url, content in zip(urls, HttpClient.map(self.fetch_season, urls)) if content}
+        if not changed:
+            logger.info("赛季数据无变化（检查 %s 个赛事）", len(urls))
+            return
+        logger.info("%s 个赛事的赛季数据有变化，执行S2流程...", len(changed))
+        Metrics.inc('watch_triggers_total', stage='S2')
+        self.season_fetcher.process_changed(changed)
+
+    def fetch_season(self, url):
+        """内容有变化时保存快照并返回内容（不含赛季数据的内容也保存，下次按哈希比较不再重复处理）"""
+        try:
+            content = self.fetch_if_changed(url)
+        except Exception as e:
+            logger.warning("轮询赛季数据失败 %s: %s", url, e)
+            return None
+        if content:
+            SnapshotStore.get().put(url, content)
+        return content
+
+    # ---------- 调度 ----------
+    def run_job(self, name, job):
+        start = time.perf_counter()
+        try:
+            job()
+        except DatabaseUnavailableError as e:
+            logger.warning("[%s] 数据库不可用，下个周期重试: %s", name, e)
+        except Exception as e:
+            Metrics.inc('watch_errors_total', job=name)
+            logger.exception("[%s] 轮询出错: %s", name, e)
+        finally:
+            Metrics.observe('watch_poll_seconds', time.perf_counter() - start, job=name)
+
+    def run(self, once=False):
+        logger.info("常驻模式启动：%s", ', '.join(f"{name} 每{interval}秒" for name, interval, _ in self.jobs))
+        while not self.stop_event.is_set():
+            for name, interval, job in self.jobs:
+                if time.monotonic() >= self.next_run[name] and not self.stop_event.is_set():
+                    self.run_job(name, job)
+                    self.next_run[name] = time.monotonic() + interval
+            if once or not self.jobs:
+                break
+            self.stop_event.wait(max(0, min(self.next_run.values()) - time.monotonic()))
+        logger.info("常驻模式已退出")
+
+    def stop(self, *args):
+        logger.info("收到退出信号，当前任务结束后退出...")
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻模式：定时轮询数据源，有变化时才执行后续流程')
+    parser.add_argument('--areas-interval', type=int, default=Config.AREAS_INTERVAL, help='区域数据轮询间隔(秒)，0表示不轮询')
+    parser.add_argument('--seasons-interval', type=int, default=Config.SEASONS_INTERVAL, help='赛季数据轮询间隔(秒)，0表示不轮询')
+    parser.add_argument('--once', action='store_true', help='每个任务只执行一次后退出')
+    args = parser.parse_args()
+    setup_logging()
+
+    watcher = Watcher(args.areas_interval, args.seasons_interval)
+    signal.signal(signal.SIGINT, watcher.stop)
+    signal.signal(signal.SIGTERM, watcher.stop)
+    try:
+        watcher.run(once=args.once)
+    finally:
+        SnapshotStore.get().save()
+        DeadUrlCache.get().save()
+        HttpClient.close()
+        Metrics.report()
+
+
+if __name__ == '__main__':
+    main()